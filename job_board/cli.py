@@ -1,19 +1,33 @@
+import contextlib
+import contextvars
 import pdb
 import subprocess
 import sys
+import threading
 import time
 import traceback
+from collections.abc import Iterator
+from concurrent.futures import as_completed
+from concurrent.futures import ThreadPoolExecutor
 
 import click
 
 # Import scheduled jobs to register them globally  # noreorder
 import job_board.schedules  # noqa: F401
 from job_board import config
+from job_board.connection import get_session
 from job_board.init_db import init_db
+from job_board.known_links import known_links
+from job_board.logger import logger
+from job_board.partitions import partition_jobs
 from job_board.portals import PORTALS
 from job_board.portals.models import Portal
+from job_board.reparse import reparse_jobs
 from job_board.scheduler import scheduler
+from job_board.scrapfly_cache import scrapfly_cache
+from job_board.utils import http_clients
 from job_board.utils import log_to_sentry
+from job_board.utils import scrapfly_gateway
 
 
 def debugger_hook(exception_type, value, tb):
@@ -55,7 +69,16 @@ def main():
     multiple=True,
     help="Portals to ignore when fetching jobs, cannot be used with --include-portals",
 )
-def fetch(pdb_flag, include_portals, exclude_portals):
+@click.option(
+    "--concurrency",
+    "-c",
+    "concurrency",
+    type=click.IntRange(min=1),
+    default=config.PORTALS_FETCH_CONCURRENCY,
+    show_default=True,
+    help="Number of portals to fetch jobs from concurrently.",
+)
+def fetch(pdb_flag, include_portals, exclude_portals, concurrency):
     if pdb_flag or config.ENV == "dev":
         sys.excepthook = debugger_hook
 
@@ -67,6 +90,7 @@ def fetch(pdb_flag, include_portals, exclude_portals):
     fetch_jobs(
         include_portals=include_portals,
         exclude_portals=exclude_portals,
+        concurrency=concurrency,
     )
 
 
@@ -74,7 +98,14 @@ def fetch_jobs(
     *,
     include_portals: list[str] | None = None,
     exclude_portals: list[str] | None = None,
+    concurrency: int = config.PORTALS_FETCH_CONCURRENCY,
 ):
+    """
+    Fetch jobs from the given portals, each portal runs in its own worker.
+
+    A failure in one portal doesn't stop the others, all failures are
+    reported together once every portal has finished.
+    """
     init_db()
     click.echo("********Fetching Jobs**********")
 
@@ -89,13 +120,127 @@ def fetch_jobs(
 
     portals = list(map(str.lower, portals))
 
-    for portal in portals:
-        click.echo(f"Fetching jobs from {portal.title()}")
-        Portal.fetch_jobs(portal)
-        click.echo(f"Jobs fetched from {portal.title()}")
+    # loaded once and shared by all portals, only the jobs
+    # stored since the previous run are loaded again.
+    known_links.refresh()
+
+    failures = {}
+    with _shared_clients(), scrapfly_gateway.run() as scrapfly_run:
+        # the portals are fetched within the scrapfly run of this call.
+        context = contextvars.copy_context()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = {
+                executor.submit(context.copy().run, _fetch_portal_jobs, portal): portal
+                for portal in portals
+            }
+            for future in as_completed(futures):
+                portal = futures[future]
+                try:
+                    future.result()
+                except Exception as exc:
+                    logger.exception(f"Failed to fetch jobs from {portal}")
+                    failures[portal] = exc
+                else:
+                    click.echo(f"Jobs fetched from {portal.title()}")
+        scrapfly_run.log_stats()
 
     click.echo("********Fetched jobs**********")
 
+    if failures:
+        click.echo(
+            f"Failed to fetch jobs from: {', '.join(map(str.title, failures))}",
+            err=True,
+        )
+        raise ExceptionGroup(
+            "Failed to fetch jobs from some portals", list(failures.values())
+        )
+
+
+# number of fetch runs in progress, the scheduler runs every
+# portal in its own thread, so the runs can overlap.
+_active_runs = 0
+_active_runs_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def _shared_clients() -> Iterator[None]:
+    """
+    The http clients and the scrapfly cache are shared by all the
+    runs in the process, so they are closed only once the last run finishes.
+    """
+    global _active_runs
+    with _active_runs_lock:
+        _active_runs += 1
+
+    try:
+        yield
+    finally:
+        # the lock is held while closing, so a run that starts
+        # meanwhile waits and then gets new clients.
+        with _active_runs_lock:
+            _active_runs -= 1
+            if not _active_runs:
+                http_clients.log_stats()
+                http_clients.close()
+                scrapfly_cache.log_stats()
+                scrapfly_cache.prune()
+                scrapfly_cache.close()
+
+
+def _fetch_portal_jobs(portal: str) -> None:
+    click.echo(f"Fetching jobs from {portal.title()}")
+    Portal.fetch_jobs(portal, known_links=known_links)
+
+
+@main.command("reparse", help="Reparse the stored jobs of older parser versions")
+@click.option(
+    "--include-portals",
+    "-I",
+    "include_portals",
+    type=str,
+    multiple=True,
+    help="Portals to reparse jobs of. By default, all portals are included.",
+)
+@click.option(
+    "--workers",
+    "-w",
+    "workers",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of processes to parse with. Defaults to the number of CPUs.",
+)
+@click.option(
+    "--batch-size",
+    "-b",
+    "batch_size",
+    type=click.IntRange(min=1),
+    default=config.REPARSE_BATCH_SIZE,
+    show_default=True,
+    help="Number of payloads to read and store together.",
+)
+def reparse(include_portals, workers, batch_size):
+    init_db()
+    portals = list(map(str.lower, include_portals)) or list(PORTALS.keys())
+    if unknown_portals := set(portals) - set(PORTALS):
+        raise click.UsageError(f"Unknown portals: {', '.join(sorted(unknown_portals))}")
+
+    stats = reparse_jobs(portals, workers=workers, batch_size=batch_size)
+    click.echo(f"Reparsed {stats.reparsed} jobs, failed to reparse {stats.failed}.")
+
+
+@main.command(
+    "partition-jobs", help="Partition the job table by the month of posted_on"
+)
+def partition_jobs_command():
+    """
+    Converts the job table in place, so that the purge drops whole
+    months instead of deleting the old jobs row by row.
+    """
+    init_db()
+    with get_session(readonly=False) as session:
+        partition_jobs(session)
+    click.echo("Job table partitioned.")
+
 
 @main.group("scheduler", help="Job scheduler commands")
 def scheduler_group():
@@ -23,25 +23,112 @@ SERVICE_ACCOUNT_KEY_FILE_PATH = os.getenv("SERVICE_ACCOUNT_KEY_FILE", "something
 SERVER_EMAIL = os.getenv("SERVER_EMAIL")
 SQL_DEBUG = os.getenv("SQL_DEBUG", "False").lower() == "true"
 LOG_DIR = os.getenv("LOG_DIR", BASE_DIR / "logs")
+# the caches are kept out of the repository, in the XDG cache directory.
+CACHE_DIR = Path(os.getenv("XDG_CACHE_HOME", Path.home() / ".cache")) / "job-board"
+# and the data, in the XDG data directory.
+DATA_DIR = (
+    Path(os.getenv("XDG_DATA_HOME", Path.home() / ".local" / "share")) / "job-board"
+)
 # days before which we should ignore jobs
 JOB_AGE_LIMIT_DAYS = int(os.getenv("JOB_AGE_LIMIT_DAYS", 90))
 DEFAULT_HTTP_TIMEOUT = int(os.getenv("DEFAULT_HTTP_TIMEOUT", 30))
+# connection pool limits for the clients shared across a run, per host.
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 20))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", 10))
+HTTP_KEEPALIVE_EXPIRY = int(os.getenv("HTTP_KEEPALIVE_EXPIRY", 30))  # seconds
+# longest `Retry-After` honoured when retrying, longer ones are cut short.
+HTTP_MAX_RETRY_AFTER = int(os.getenv("HTTP_MAX_RETRY_AFTER", 60))  # seconds
 DEFAULT_CURRENCY = os.getenv("DEFAULT_CURRENCY", "USD")
 DEFAULT_CURRENCY_FRACTION_DIGITS = int(os.getenv("DEFAULT_CURRENCY_FRACTION_DIGITS", 2))
 DEFAULT_LOCALE = os.getenv("DEFAULT_LOCALE", "en_US")
+EXCHANGE_RATES_FETCH_CONCURRENCY = int(os.getenv("EXCHANGE_RATES_FETCH_CONCURRENCY", 5))
+# most jobs in a tagging request, however small they are.
 BATCH_TAG_FILLING_SIZE = int(os.getenv("BATCH_TAG_FILLING_SIZE", 50))
 
 SCRAPFLY_API_KEY = os.getenv("SCRAPFLY_API_KEY")
 SCRAPFLY_REQUEST_TIMEOUT = int(os.getenv("SCRAPFLY_REQUEST_TIMEOUT", 500))  # seconds
+# detail pages scraped through scrapfly are cached on disk, 0 disables the cache.
+SCRAPFLY_CACHE_TTL = int(os.getenv("SCRAPFLY_CACHE_TTL", 3 * 24 * 60 * 60))  # seconds
+SCRAPFLY_CACHE_DIR = os.getenv("SCRAPFLY_CACHE_DIR", CACHE_DIR / "scrapfly")
+# try the cheaper scrapfly tiers first, moving up to ASP only when blocked,
+# when off, every portal makes its requests with the params it always did.
+SCRAPFLY_ASP_ESCALATION = os.getenv("SCRAPFLY_ASP_ESCALATION", "True").lower() == "true"
+# the current scrapfly plan allows only 5 concurrent requests.
+SCRAPFLY_MAX_CONCURRENCY = int(os.getenv("SCRAPFLY_MAX_CONCURRENCY", 5))
+# share the concurrency limit with other processes through postgres advisory locks.
+SCRAPFLY_ADVISORY_LOCKS = (
+    os.getenv("SCRAPFLY_ADVISORY_LOCKS", "False").lower() == "true"
+)
+# seconds to wait before checking again, when other processes hold every slot.
+SCRAPFLY_SLOT_POLL_INTERVAL = float(os.getenv("SCRAPFLY_SLOT_POLL_INTERVAL", 1))
+# credits a single fetch run can spend, 0 means no limit.
+SCRAPFLY_RUN_CREDIT_BUDGET = int(os.getenv("SCRAPFLY_RUN_CREDIT_BUDGET", 0))
+# credits reserved for a request in flight, until a response of the run has
+# cost more, so that the concurrent requests don't overshoot the budget.
+SCRAPFLY_REQUEST_COST_ESTIMATE = int(os.getenv("SCRAPFLY_REQUEST_COST_ESTIMATE", 25))
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 OPENAI_READ_TIMEOUT = int(os.getenv("OPENAI_READ_TIMEOUT", 100))  # seconds
+# tag the clearly technical and non-technical jobs locally, before the LLM.
+LOCAL_TAGGING = os.getenv("LOCAL_TAGGING", "True").lower() == "true"
+# fewest tags found locally for a job to be tagged without the LLM.
+LOCAL_TAGGING_MIN_TAGS = int(os.getenv("LOCAL_TAGGING_MIN_TAGS", 3))
+# stored tags join the local vocabulary once this many jobs have them.
+LOCAL_TAGGING_MIN_TAG_JOBS = int(os.getenv("LOCAL_TAGGING_MIN_TAG_JOBS", 5))
+# seconds after which the local vocabulary is loaded again, for the new tags.
+LOCAL_TAGGING_VOCABULARY_TTL = int(os.getenv("LOCAL_TAGGING_VOCABULARY_TTL", 3600))
+# number of tagging requests sent to OpenAI at the same time.
+OPENAI_TAGGING_CONCURRENCY = int(os.getenv("OPENAI_TAGGING_CONCURRENCY", 5))
+# rate limits of the OpenAI account, 0 means no limit.
+OPENAI_REQUESTS_PER_MINUTE = int(os.getenv("OPENAI_REQUESTS_PER_MINUTE", 500))
+OPENAI_TOKENS_PER_MINUTE = int(os.getenv("OPENAI_TOKENS_PER_MINUTE", 200_000))
+# times the LLM may fail to tag the same content, before it isn't sent anymore.
+TAGGING_MAX_FAILURES = int(os.getenv("TAGGING_MAX_FAILURES", 3))
+# jobs are packed into a tagging request until its estimated tokens reach this.
+OPENAI_TAGGING_TOKEN_BUDGET = int(os.getenv("OPENAI_TAGGING_TOKEN_BUDGET", 12_000))
+# characters of the description sent for tagging, the rest is cut off.
+OPENAI_TAGGING_DESCRIPTION_LENGTH = int(
+    os.getenv("OPENAI_TAGGING_DESCRIPTION_LENGTH", 4000)
+)
 
 WORK_AT_A_STARTUP_COOKIE = os.getenv("WORK_AT_A_STARTUP_COOKIE")
 WORK_AT_A_STARTUP_CSRF_TOKEN = os.getenv("WORK_AT_A_STARTUP_CSRF_TOKEN")
-# the current scrapfly plan allows only 5 concurrent requests.
+# pages fetched together, the requests are still capped by SCRAPFLY_MAX_CONCURRENCY.
 WELLFOUND_REQUESTS_BATCH_SIZE = int(os.getenv("WELLFOUND_REQUESTS_BATCH_SIZE", 5))
 HIMALAYAS_REQUESTS_BATCH_SIZE = int(os.getenv("HIMALAYAS_REQUESTS_BATCH_SIZE", 10))
+# number of detail pages fetched concurrently per portal.
+PYTHON_DOT_ORG_DETAIL_PAGE_CONCURRENCY = int(
+    os.getenv("PYTHON_DOT_ORG_DETAIL_PAGE_CONCURRENCY", 10)
+)
+WEWORKREMOTELY_DETAIL_PAGE_CONCURRENCY = int(
+    os.getenv("WEWORKREMOTELY_DETAIL_PAGE_CONCURRENCY", 5)
+)
+WELLFOUND_DETAIL_PAGE_CONCURRENCY = int(
+    os.getenv("WELLFOUND_DETAIL_PAGE_CONCURRENCY", 5)
+)
+# number of portals to fetch concurrently, each portal runs in its own worker.
+PORTALS_FETCH_CONCURRENCY = int(os.getenv("PORTALS_FETCH_CONCURRENCY", 4))
+# seconds before the latest known job whose jobs are loaded again on a refresh,
+# the transactions storing jobs can commit in a different order than they began.
+KNOWN_LINKS_REFRESH_OVERLAP = int(os.getenv("KNOWN_LINKS_REFRESH_OVERLAP", 600))
+# seconds after which all the known links are loaded again, dropping the purged.
+KNOWN_LINKS_RELOAD_INTERVAL = int(os.getenv("KNOWN_LINKS_RELOAD_INTERVAL", 86400))
+# attempts of a portal run, resumed from its checkpoint after a failure, before
+# it starts over, so that a page that always fails doesn't pin every later run.
+PORTAL_RUN_MAX_ATTEMPTS = int(os.getenv("PORTAL_RUN_MAX_ATTEMPTS", 3))
+# number of jobs parsed and stored together, while the portal is still fetched.
+INGESTION_BATCH_SIZE = int(os.getenv("INGESTION_BATCH_SIZE", 100))
+# number of old jobs archived per transaction by the purge.
+PURGE_BATCH_SIZE = int(os.getenv("PURGE_BATCH_SIZE", 1000))
+# monthly job partitions created ahead of time, once the table is partitioned.
+JOB_PARTITION_MONTHS_AHEAD = int(os.getenv("JOB_PARTITION_MONTHS_AHEAD", 3))
+# number of stored payloads reparsed together by `job-board reparse`.
+REPARSE_BATCH_SIZE = int(os.getenv("REPARSE_BATCH_SIZE", 500))
+# store the raw payloads compressed on disk, the database keeps only their digests.
+PAYLOAD_OFFLOAD = os.getenv("PAYLOAD_OFFLOAD", "False").lower() == "true"
+PAYLOAD_BLOB_DIR = os.getenv("PAYLOAD_BLOB_DIR", DATA_DIR / "payloads")
+# unreferenced blobs younger than this are kept, they may not be committed yet.
+PAYLOAD_BLOB_GRACE_PERIOD = int(os.getenv("PAYLOAD_BLOB_GRACE_PERIOD", 86400))  # secs
 
 # Sentry configuration
 SENTRY_DSN = os.getenv("SENTRY_DSN")
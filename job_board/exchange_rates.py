@@ -0,0 +1,220 @@
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from datetime import datetime
+from decimal import Decimal
+
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.dialects.postgresql import JSONB
+
+from job_board import config
+from job_board.connection import get_session
+from job_board.logger import logger
+from job_board.models import BaseModel
+from job_board.portals.parser import Job as JobListing
+from job_board.utils import fetch_exchange_rates
+from job_board.utils import utcnow_naive
+
+
+class ExchangeRate(BaseModel):
+    __tablename__ = "exchange_rate"
+
+    date = sa.Column(sa.Date, nullable=False)
+    # the currency against which all the rates are quoted.
+    currency = sa.Column(sa.String, nullable=False)
+    # rates are stored as strings to not lose any precision.
+    rates = sa.Column(JSONB, nullable=False)
+
+    __table_args__ = (
+        sa.UniqueConstraint(
+            "date",
+            "currency",
+            name="uq_exchange_rate_date_currency",
+        ),
+    )
+
+
+class ExchangeRateStore:
+    """
+    Exchange rates, fetched at most once for every (date, currency).
+
+    The rates are looked up in an in-process cache first, then in the
+    database and only then fetched from the API, after which they are
+    saved in both, so that later runs and reparses don't hit the network.
+    """
+
+    def __init__(self):
+        self._rates: dict[tuple[date, str], dict[str, Decimal]] = {}
+        self._lock = threading.Lock()
+        # one lock per key, so that concurrent lookups for the same
+        # date don't fetch the rates more than once.
+        self._key_locks: dict[tuple[date, str], threading.Lock] = defaultdict(
+            threading.Lock
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._rates.clear()
+            self._key_locks.clear()
+
+    def get_rate(
+        self,
+        *,
+        from_currency: str,
+        to_currency: str = config.DEFAULT_CURRENCY,
+        exchange_date: date | datetime | None = None,
+    ) -> Decimal | None:
+        if from_currency.lower() == to_currency.lower():
+            return Decimal("1")
+
+        rates = self.get_rates(currency=to_currency, exchange_date=exchange_date)
+        return rates.get(from_currency.lower())
+
+    def get_rates(
+        self,
+        *,
+        currency: str = config.DEFAULT_CURRENCY,
+        exchange_date: date | datetime | None = None,
+    ) -> dict[str, Decimal]:
+        key = self._get_key(currency=currency, exchange_date=exchange_date)
+        if (rates := self._rates.get(key)) is not None:
+            return rates
+
+        with self._lock:
+            key_lock = self._key_locks[key]
+
+        with key_lock:
+            # another thread might have fetched them while waiting.
+            if (rates := self._rates.get(key)) is None:
+                self._load({key})
+                rates = self._rates[key]
+
+        return rates
+
+    def prefetch(self, keys: set[tuple[date | datetime | None, str]]) -> None:
+        """
+        Resolve the rates for all the (date, currency) pairs in one pass,
+        the stored ones with a single query and the rest concurrently.
+        """
+        keys = {
+            self._get_key(currency=currency, exchange_date=exchange_date)
+            for exchange_date, currency in keys
+        }
+        missing_keys = keys - self._rates.keys()
+        if missing_keys:
+            self._load(missing_keys)
+
+    @staticmethod
+    def _get_key(
+        *, currency: str, exchange_date: date | datetime | None
+    ) -> tuple[date, str]:
+        if exchange_date is None:
+            # some portals might not provide the posted date.
+            exchange_date = utcnow_naive().date()
+        elif isinstance(exchange_date, datetime):
+            exchange_date = exchange_date.date()
+        return exchange_date, currency.lower()
+
+    def _load(self, keys: set[tuple[date, str]]) -> None:
+        with get_session(readonly=True) as session:
+            stored_rates = session.execute(
+                sa.select(
+                    ExchangeRate.date, ExchangeRate.currency, ExchangeRate.rates
+                ).where(sa.tuple_(ExchangeRate.date, ExchangeRate.currency).in_(keys))
+            ).all()
+
+        for exchange_date, currency, rates in stored_rates:
+            self._rates[(exchange_date, currency)] = {
+                rate_currency: Decimal(rate) for rate_currency, rate in rates.items()
+            }
+
+        missing_keys = sorted(keys - self._rates.keys())
+        if not missing_keys:
+            return
+
+        logger.info(f"Fetching exchange rates for {missing_keys}")
+
+        def _fetch(key: tuple[date, str]) -> dict[str, Decimal]:
+            exchange_date, currency = key
+            return fetch_exchange_rates(currency=currency, exchange_date=exchange_date)
+
+        with ThreadPoolExecutor(
+            max_workers=config.EXCHANGE_RATES_FETCH_CONCURRENCY
+        ) as executor:
+            fetched_rates = dict(zip(missing_keys, executor.map(_fetch, missing_keys)))
+
+        with get_session(readonly=False) as session:
+            session.execute(
+                insert(ExchangeRate)
+                .values(
+                    [
+                        {
+                            "date": exchange_date,
+                            "currency": currency,
+                            "rates": {
+                                rate_currency: str(rate)
+                                for rate_currency, rate in rates.items()
+                            },
+                        }
+                        for (exchange_date, currency), rates in fetched_rates.items()
+                    ]
+                )
+                .on_conflict_do_nothing(
+                    index_elements=[ExchangeRate.date, ExchangeRate.currency],
+                )
+            )
+        self._rates.update(fetched_rates)
+
+
+exchange_rates = ExchangeRateStore()
+
+
+def convert_salaries(jobs: list[JobListing]) -> list[JobListing]:
+    """
+    Convert the salaries of the jobs to the default currency.
+
+    The exchange rates for every distinct (date, currency) of the jobs
+    are resolved together, before applying the conversions in bulk.
+    """
+    default_currency = config.DEFAULT_CURRENCY
+    keys = {
+        (job.posted_on, default_currency)
+        for job in jobs
+        if job.salary_currency and job.salary_currency != default_currency
+    }
+    exchange_rates.prefetch(keys)
+
+    converted_jobs = []
+    for job in jobs:
+        if job.min_salary is None and job.max_salary is None:
+            converted_jobs.append(job)
+            continue
+
+        currency = job.salary_currency or default_currency
+        exchange_rate = exchange_rates.get_rate(
+            from_currency=currency,
+            to_currency=default_currency,
+            exchange_date=job.posted_on,
+        )
+        if not exchange_rate:
+            logger.warning(f"No exchange rate found for {currency=}, {job.link=}")
+            exchange_rate = Decimal("1")
+
+        converted_jobs.append(
+            job.model_copy(
+                update={
+                    "min_salary": _convert_amount(job.min_salary, exchange_rate),
+                    "max_salary": _convert_amount(job.max_salary, exchange_rate),
+                    "salary_currency": default_currency,
+                }
+            )
+        )
+    return converted_jobs
+
+
+def _convert_amount(amount: Decimal | None, exchange_rate: Decimal) -> Decimal | None:
+    if not amount:
+        return None
+    return (amount / exchange_rate).quantize(Decimal("0.01"))
@@ -3,6 +3,7 @@ import sqlalchemy as sa
 
 from job_board.connection import get_engine
 from job_board.connection import get_session
+from job_board.exchange_rates import ExchangeRate  # noqa: F401  # register table
 from job_board.logger import logger
 from job_board.models import BaseModel
 
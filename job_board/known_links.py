@@ -0,0 +1,137 @@
+import hashlib
+import threading
+import time
+from collections.abc import Iterable
+from datetime import datetime
+from datetime import timedelta
+
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from job_board import config
+from job_board.connection import get_session
+from job_board.logger import logger
+from job_board.models import Job
+
+REFRESH_BATCH_SIZE = 10_000
+
+
+class KnownLinks:
+    """
+    Index of the links of the stored jobs, to check if a job is already stored.
+
+    Only a digest of the lowercased link is kept, so that even a large
+    number of links takes little memory and each lookup is O(1).
+    The first refresh loads all the links, later ones only load the jobs
+    created since, so the index can be kept around between runs.
+    All the links are loaded again every `KNOWN_LINKS_RELOAD_INTERVAL`,
+    so that the links of the purged jobs are dropped.
+    """
+
+    def __init__(self):
+        self._digests: set[bytes] = set()
+        # when the latest job loaded from the database was created.
+        self._last_created_at: datetime | None = None
+        # when all the links were last loaded.
+        self._reloaded_at: float | None = None
+        self._lock = threading.Lock()
+
+    def __contains__(self, link: str) -> bool:
+        return self._get_digest(link) in self._digests
+
+    def __len__(self) -> int:
+        return len(self._digests)
+
+    @classmethod
+    def for_links(cls, links: list[str]) -> "KnownLinks":
+        """Index of only those links, among the given ones, that are stored."""
+        known_links = cls()
+        known_links.add(find_stored_links(links))
+        return known_links
+
+    def add(self, links: Iterable[str]) -> None:
+        digests = {self._get_digest(link) for link in links}
+        with self._lock:
+            self._digests.update(digests)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._digests.clear()
+            self._last_created_at = None
+            self._reloaded_at = None
+
+    def refresh(self) -> None:
+        """Load the links of the jobs stored since the last refresh."""
+        with self._lock:
+            reload = (
+                self._reloaded_at is None
+                or time.monotonic() - self._reloaded_at
+                > config.KNOWN_LINKS_RELOAD_INTERVAL
+            )
+            statement = sa.select(Job.created_at, Job.link).execution_options(
+                yield_per=REFRESH_BATCH_SIZE
+            )
+            if reload:
+                digests = set()
+                last_created_at = None
+                reloaded_at = time.monotonic()
+            else:
+                digests = self._digests
+                last_created_at = self._last_created_at
+                reloaded_at = self._reloaded_at
+
+            if last_created_at is not None:
+                # a job created a little earlier than the latest one loaded
+                # might have been committed only after that one.
+                overlap = timedelta(seconds=config.KNOWN_LINKS_REFRESH_OVERLAP)
+                statement = statement.where(Job.created_at > last_created_at - overlap)
+
+            loaded = 0
+            with get_session(readonly=True) as session:
+                for created_at, link in session.execute(statement):
+                    digests.add(self._get_digest(link))
+                    if last_created_at is None or created_at > last_created_at:
+                        last_created_at = created_at
+                    loaded += 1
+
+            # swapped at once, the lookups meanwhile use the previous links.
+            self._digests = digests
+            self._last_created_at = last_created_at
+            self._reloaded_at = reloaded_at
+
+        logger.info(f"Loaded {loaded} known links, total: {len(self._digests)}")
+
+    @staticmethod
+    def _get_digest(link: str) -> bytes:
+        return hashlib.blake2b(link.lower().encode(), digest_size=16).digest()
+
+
+known_links = KnownLinks()
+
+
+def find_stored_links(links: list[str]) -> set[str]:
+    """
+    Find the (lowercased) links that are already stored.
+
+    The links are sent as a single array and joined against,
+    rather than an `IN` clause with a parameter for every link.
+    """
+    if not links:
+        return set()
+
+    candidates = (
+        sa.func.unnest(
+            sa.bindparam(
+                "links",
+                value=list({link.lower() for link in links}),
+                type_=ARRAY(sa.String),
+            )
+        )
+        .table_valued("link")
+        .render_derived(name="candidate")
+    )
+    statement = sa.select(candidates.c.link).join(
+        Job, sa.func.lower(Job.link) == candidates.c.link
+    )
+    with get_session(readonly=True) as session:
+        return set(session.execute(statement).scalars())
@@ -0,0 +1,37 @@
+"""Add blob digest and size columns to payload
+
+Revision ID: 4e8b2f6a9c13
+Revises: 9a4d1e7f3c21
+Create Date: 2026-10-17 13:20:44.816390
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "4e8b2f6a9c13"
+down_revision: Union[str, Sequence[str], None] = "9a4d1e7f3c21"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.alter_column("payload", "payload", existing_type=sa.String(), nullable=True)
+    op.add_column("payload", sa.Column("payload_digest", sa.String(), nullable=True))
+    op.add_column("payload", sa.Column("payload_size", sa.Integer(), nullable=True))
+    op.add_column("payload", sa.Column("extra_info_digest", sa.String(), nullable=True))
+    op.add_column("payload", sa.Column("extra_info_size", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("payload", "extra_info_size")
+    op.drop_column("payload", "extra_info_digest")
+    op.drop_column("payload", "payload_size")
+    op.drop_column("payload", "payload_digest")
+    op.alter_column("payload", "payload", existing_type=sa.String(), nullable=False)
@@ -0,0 +1,35 @@
+"""Add run checkpoint columns to portal
+
+Revision ID: 7c2e4a1b9d05
+Revises: 3f6b2c9d1a7e
+Create Date: 2026-10-17 11:03:27.518204
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "7c2e4a1b9d05"
+down_revision: Union[str, Sequence[str], None] = "3f6b2c9d1a7e"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("portal", sa.Column("run_id", sa.String(), nullable=True))
+    op.add_column(
+        "portal",
+        sa.Column("checkpoint", postgresql.JSONB(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("portal", "checkpoint")
+    op.drop_column("portal", "run_id")
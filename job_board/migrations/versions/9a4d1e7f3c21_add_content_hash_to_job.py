@@ -0,0 +1,29 @@
+"""Add content hash to job
+
+Revision ID: 9a4d1e7f3c21
+Revises: 7c2e4a1b9d05
+Create Date: 2026-10-17 12:41:09.302517
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9a4d1e7f3c21"
+down_revision: Union[str, Sequence[str], None] = "7c2e4a1b9d05"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("job", sa.Column("content_hash", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("job", "content_hash")
@@ -0,0 +1,40 @@
+"""Add run start and attempts to portal
+
+Revision ID: a7d3e9c1f5b2
+Revises: f4b9d2e7a1c8
+Create Date: 2026-10-17 19:12:41.583210
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a7d3e9c1f5b2"
+down_revision: Union[str, Sequence[str], None] = "f4b9d2e7a1c8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("portal", sa.Column("run_started_at", sa.DateTime(), nullable=True))
+    op.add_column(
+        "portal",
+        sa.Column("run_attempts", sa.Integer(), server_default="0", nullable=False),
+    )
+    # the start of a run in progress isn't known, the end of the previous
+    # run, or the first run of the portal, is early enough not to miss jobs.
+    op.execute(
+        "UPDATE portal SET run_started_at = COALESCE(last_run_at, created_at), "
+        "run_attempts = 1 WHERE run_id IS NOT NULL"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("portal", "run_attempts")
+    op.drop_column("portal", "run_started_at")
@@ -0,0 +1,29 @@
+"""Add parser version to job
+
+Revision ID: b5f0c3d8e2a7
+Revises: 4e8b2f6a9c13
+Create Date: 2026-10-17 14:02:51.117043
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b5f0c3d8e2a7"
+down_revision: Union[str, Sequence[str], None] = "4e8b2f6a9c13"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("job", sa.Column("parser_version", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("job", "parser_version")
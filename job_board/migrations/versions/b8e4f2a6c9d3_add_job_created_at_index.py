@@ -0,0 +1,28 @@
+"""Add job created_at index
+
+Revision ID: b8e4f2a6c9d3
+Revises: a7d3e9c1f5b2
+Create Date: 2026-10-17 21:05:13.402871
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b8e4f2a6c9d3"
+down_revision: Union[str, Sequence[str], None] = "a7d3e9c1f5b2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("ix_job_created_at", "job", ["created_at"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_job_created_at", table_name="job")
@@ -0,0 +1,68 @@
+"""Add job archive
+
+Revision ID: d2c7a9e4b6f1
+Revises: b5f0c3d8e2a7
+Create Date: 2026-10-17 15:10:36.604118
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d2c7a9e4b6f1"
+down_revision: Union[str, Sequence[str], None] = "b5f0c3d8e2a7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "job_archive",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column(
+            "edited_at",
+            sa.DateTime(),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column("job_id", sa.Integer(), nullable=False),
+        sa.Column("link", sa.String(), nullable=False),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("company_name", sa.String(), nullable=True),
+        sa.Column("min_salary", sa.Numeric(), nullable=True),
+        sa.Column("max_salary", sa.Numeric(), nullable=True),
+        sa.Column("is_remote", sa.Boolean(), nullable=True),
+        sa.Column("locations", sa.ARRAY(sa.String()), nullable=True),
+        sa.Column("posted_on", sa.DateTime(), nullable=False),
+        sa.Column("tags", sa.ARRAY(sa.String()), server_default="{}", nullable=False),
+        sa.Column("payload_digest", sa.String(), nullable=True),
+        sa.Column("extra_info_digest", sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_job_archive_job_id"), "job_archive", ["job_id"], unique=False
+    )
+    op.create_index(
+        "ix_job_archive_link_lower",
+        "job_archive",
+        [sa.literal_column("lower(link)")],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_job_archive_link_lower", table_name="job_archive")
+    op.drop_index(op.f("ix_job_archive_job_id"), table_name="job_archive")
+    op.drop_table("job_archive")
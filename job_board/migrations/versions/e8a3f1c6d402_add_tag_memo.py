@@ -0,0 +1,48 @@
+"""Add tag memo
+
+Revision ID: e8a3f1c6d402
+Revises: d2c7a9e4b6f1
+Create Date: 2026-10-17 16:02:11.482903
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e8a3f1c6d402"
+down_revision: Union[str, Sequence[str], None] = "d2c7a9e4b6f1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "tag_memo",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column(
+            "edited_at",
+            sa.DateTime(),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column("content_hash", sa.String(), nullable=False),
+        sa.Column("tags", sa.ARRAY(sa.String()), server_default="{}", nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("content_hash"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("tag_memo")
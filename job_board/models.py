@@ -1,12 +1,19 @@
 from __future__ import annotations
 
+import csv
+import io
 import itertools
+import time
+from collections import defaultdict
+from collections.abc import Iterable
+from datetime import datetime
 from datetime import timedelta
+from datetime import timezone
+from typing import BinaryIO
 
 import pycountry
 import sqlalchemy as sa
-from requests.structures import CaseInsensitiveDict
-from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.orm import Mapped
@@ -17,9 +24,13 @@ from sqlalchemy.sql import expression
 from job_board import config
 from job_board.connection import get_session
 from job_board.logger import logger
-from job_board.portals.parser import extract_job_tags_using_llm
+from job_board.payload_store import payload_store
 from job_board.portals.parser import Job as JobListing
+from job_board.tagging import pack_batches
+from job_board.tagging import TaggingEngine
+from job_board.tagging import TaggingFailure
 from job_board.utils import add_missing_countries
+from job_board.utils import http_clients
 from job_board.utils import utcnow_naive
 
 # TODO: move this to a separate place, this is not the right place for it.
@@ -139,6 +150,11 @@ class Job(BaseModel):
     # TODO: make this required in future, can't backfill it now
     # for all existing jobs.
     company_name = sa.Column(sa.String, nullable=True)
+    # digest of the stored fields, a job is updated only when it changes.
+    content_hash = sa.Column(sa.String, nullable=True)
+    # version of the parser that extracted the job, the jobs
+    # from older versions are reparsed from their payloads.
+    parser_version = sa.Column(sa.Integer, nullable=True)
 
     __table_args__ = (
         sa.Index(
@@ -150,6 +166,8 @@ class Job(BaseModel):
             "ix_job_title_lower",
             sa.func.lower(title),
         ),
+        # the known links are refreshed with the jobs created since.
+        sa.Index("ix_job_created_at", "created_at"),
         sa.CheckConstraint(
             "min_salary IS NULL OR min_salary >= 0",
             name="check_min_salary_non_negative",
@@ -219,20 +237,81 @@ class Job(BaseModel):
 
         logger.info(f"Found {len(job_listings)} jobs without tags")
 
-        for batch in itertools.batched(job_listings, config.BATCH_TAG_FILLING_SIZE):
-            listings_with_tags = extract_job_tags_using_llm(batch)
+        with get_session(readonly=False) as session:
+            memo_links = fill_tags_from_memo(session=session, job_listings=job_listings)
+        logger.info(f"Filled the tags of {len(memo_links)} jobs from the memo")
+
+        job_listings = [
+            listing
+            for listing in job_listings
+            if listing.link.lower() not in memo_links
+        ]
+        if config.LOCAL_TAGGING:
+            # imported here to avoid a circular import.
+            from job_board.tag_extractor import tag_extractor
+
+            job_listings = tag_extractor.fill_tags(job_listings)
+            with get_session(readonly=False) as session:
+                store_tags(
+                    session=session,
+                    job_listings=[listing for listing in job_listings if listing.tags],
+                )
+
+        # only one job per content is sent to the LLM, its copies share the tags.
+        listings_by_hash = defaultdict(list)
+        for listing in job_listings:
+            if not listing.tags:
+                listings_by_hash[listing.tagging_hash].append(listing)
+
+        with get_session(readonly=True) as session:
+            dead_hashes = find_dead_letter_hashes(
+                session=session, content_hashes=list(listings_by_hash)
+            )
+        if dead_hashes:
+            logger.info(f"Skipping {len(dead_hashes)} dead-lettered job contents")
+            for content_hash in dead_hashes:
+                del listings_by_hash[content_hash]
+
+        if not listings_by_hash:
+            return
+
+        copies = {listings[0].link: listings for listings in listings_by_hash.values()}
+        engine = TaggingEngine()
+        batches = pack_batches(listings[0] for listings in copies.values())
+        # every batch is committed as soon as it is tagged, so that the
+        # tags of the finished batches survive a failure of the rest.
+        for listings_with_tags in http_clients.iterate(engine.tag(batches)):
+            listings_with_tags = [
+                copy.model_copy(update={"tags": listing.tags})
+                for listing in listings_with_tags
+                for copy in copies[listing.link]
+            ]
             with get_session(readonly=False) as session:
                 store_tags(session=session, job_listings=listings_with_tags)
+                store_tag_memos(session=session, job_listings=listings_with_tags)
+
+            logger.info(f"Processed batch of {len(listings_with_tags)} jobs")
+
+        if engine.failures:
+            with get_session(readonly=False) as session:
+                store_tag_dead_letters(session=session, failures=engine.failures)
 
-            logger.info(f"Processed batch of {len(batch)} jobs")
+        if engine.failed:
+            logger.warning(f"Failed to tag {engine.failed} jobs")
 
 
 class Payload(BaseModel):
     __tablename__ = "payload"
 
     link = sa.Column(sa.String, nullable=False)
-    payload = sa.Column(sa.String, nullable=False)
+    # when offloaded, the bodies are kept in the payload store
+    # and only their digests and sizes are stored here.
+    payload = sa.Column(sa.String, nullable=True)
     extra_info = sa.Column(sa.String, nullable=True)
+    payload_digest = sa.Column(sa.String, nullable=True)
+    payload_size = sa.Column(sa.Integer, nullable=True)
+    extra_info_digest = sa.Column(sa.String, nullable=True)
+    extra_info_size = sa.Column(sa.Integer, nullable=True)
 
     __table_args__ = (
         sa.Index(
@@ -242,124 +321,437 @@ class Payload(BaseModel):
         ),
     )
 
+    def get_payload(self) -> str | None:
+        return self._read(self.payload, self.payload_digest)
+
+    def get_extra_info(self) -> str | None:
+        return self._read(self.extra_info, self.extra_info_digest)
+
+    def open_payload(self) -> BinaryIO | None:
+        return self._open(self.payload, self.payload_digest)
+
+    def open_extra_info(self) -> BinaryIO | None:
+        return self._open(self.extra_info, self.extra_info_digest)
+
+    @staticmethod
+    def _read(content: str | None, digest: str | None) -> str | None:
+        if digest is not None:
+            return payload_store.get(digest)
+        return content
+
+    @staticmethod
+    def _open(content: str | None, digest: str | None) -> BinaryIO | None:
+        if digest is not None:
+            return payload_store.open(digest)
+        if content is not None:
+            return io.BytesIO(content.encode())
+        return None
+
+
+class JobArchive(BaseModel):
+    """Compact copy of a purged job, without its description and payloads."""
+
+    __tablename__ = "job_archive"
+
+    # id of the job, when it was in the job table.
+    job_id = sa.Column(sa.Integer, nullable=False, index=True)
+    link = sa.Column(sa.String, nullable=False)
+    title = sa.Column(sa.String, nullable=False)
+    company_name = sa.Column(sa.String, nullable=True)
+    min_salary = sa.Column(sa.Numeric, nullable=True)
+    max_salary = sa.Column(sa.Numeric, nullable=True)
+    is_remote = sa.Column(sa.Boolean, nullable=True)
+    locations = sa.Column(sa.ARRAY(sa.String), nullable=True)
+    posted_on = sa.Column(sa.DateTime, nullable=False)
+    tags = sa.Column(sa.ARRAY(sa.String), nullable=False, server_default="{}")
+    # the payloads themselves are dropped, only the offloaded ones are kept.
+    payload_digest = sa.Column(sa.String, nullable=True)
+    extra_info_digest = sa.Column(sa.String, nullable=True)
+
+    __table_args__ = (
+        sa.Index(
+            "ix_job_archive_link_lower",
+            sa.func.lower(link),
+        ),
+    )
+
+
+class TagMemo(BaseModel):
+    """
+    Tags extracted by the LLM, by the content they were extracted from,
+    so that a repost or a cross-post of a job isn't sent to it again.
+    """
+
+    __tablename__ = "tag_memo"
+
+    # see `JobListing.tagging_hash`.
+    content_hash = sa.Column(sa.String, nullable=False, unique=True)
+    tags = sa.Column(sa.ARRAY(sa.String), nullable=False, server_default="{}")
+
+
+class TagDeadLetter(BaseModel):
+    """
+    Content the LLM failed to tag even when sent on its own, once it
+    has failed `TAGGING_MAX_FAILURES` times it isn't sent anymore.
+    """
+
+    __tablename__ = "tag_dead_letter"
+
+    # see `JobListing.tagging_hash`, a changed job is tried again.
+    content_hash = sa.Column(sa.String, nullable=False, unique=True)
+    # one of the jobs with the content, to look into the failure.
+    link = sa.Column(sa.String, nullable=False)
+    failures = sa.Column(sa.Integer, nullable=False, server_default="1")
+    error = sa.Column(sa.String, nullable=True)
+
 
 BATCH_JOB_SIZE = 500
 BATCH_PAYLOAD_SIZE = 200
 
 
-def store_jobs(jobs: JobListing):
+def store_jobs(jobs: JobListing, *, with_payloads: bool = True):
     for batch in itertools.batched(jobs, BATCH_JOB_SIZE):
         with get_session(readonly=False) as session:
             _store_jobs(session=session, job_listings=batch)
 
-    store_payloads(jobs)
+    if with_payloads:
+        store_payloads(jobs)
+
+
+JOB_COPY_COLUMNS = (
+    "link",
+    "title",
+    "min_salary",
+    "max_salary",
+    "description",
+    "is_remote",
+    "locations",
+    "company_name",
+    "posted_on",
+    "content_hash",
+    "parser_version",
+)
+# the posting date is left out, it doesn't change for a job
+# and the portals fall back to the time of the run without one.
+JOB_UPDATE_COLUMNS = (
+    "title",
+    "min_salary",
+    "max_salary",
+    "description",
+    "is_remote",
+    "locations",
+    "company_name",
+    "content_hash",
+    "parser_version",
+)
+# serializes the merges into a partitioned job table.
+JOB_MERGE_LOCK_KEY = 7_215_309
+PAYLOAD_COPY_COLUMNS = (
+    "link",
+    "payload",
+    "extra_info",
+    "payload_digest",
+    "payload_size",
+    "extra_info_digest",
+    "extra_info_size",
+)
 
 
 def _store_jobs(session, job_listings: JobListing) -> None:
-    values = []
+    rows = {}
     for listing in job_listings:
-        value = {
-            "link": listing.link,
-            "title": listing.title,
-            "min_salary": listing.min_salary,
-            "max_salary": listing.max_salary,
-            "description": listing.description,
-            "is_remote": listing.is_remote,
-            "locations": listing.locations,
-            "company_name": listing.company_name,
-        }
-        if posted_on := listing.posted_on:
-            value["posted_on"] = posted_on
-        values.append(value)
+        # a row can't be updated twice by the same statement,
+        # the first listing of a link wins like it did on insert.
+        if listing.link.lower() in rows:
+            continue
+
+        posted_on = listing.posted_on or utcnow_naive()
+        if posted_on.tzinfo is not None:
+            posted_on = posted_on.astimezone(timezone.utc).replace(tzinfo=None)
+        rows[listing.link.lower()] = (
+            listing.link,
+            listing.title,
+            listing.min_salary,
+            listing.max_salary,
+            listing.description,
+            listing.is_remote,
+            _to_array_literal(listing.locations),
+            listing.company_name,
+            posted_on,
+            listing.content_hash,
+            listing.parser_version,
+        )
 
-    job_ids = (
+    staging_table = _copy_to_staging(
+        session, table=Job.__table__, columns=JOB_COPY_COLUMNS, rows=rows.values()
+    )
+    if is_job_partitioned(session):
+        inserted, updated = _merge_jobs(session, staging_table=staging_table)
+    else:
+        inserted, updated = _upsert_jobs(session, staging_table=staging_table)
+    logger.info(f"Stored {inserted} new jobs, updated {updated} changed jobs")
+    store_tags(session=session, job_listings=job_listings)
+
+
+def _upsert_jobs(session, *, staging_table: str) -> tuple[int, int]:
+    column_list = ", ".join(JOB_COPY_COLUMNS)
+    updates = ", ".join(
+        f"{column} = EXCLUDED.{column}" for column in JOB_UPDATE_COLUMNS
+    )
+    # a job is rewritten only when its content or the parser version
+    # changed, so storing an unchanged feed again doesn't write anything.
+    # xmax is 0 only for the rows that were inserted.
+    inserted = (
         session.execute(
-            insert(Job)
-            .values(values)
-            .on_conflict_do_nothing(
-                index_elements=[
-                    sa.func.lower(Job.link),
-                ],
-            )
-            .returning(Job.id)
+            sa.text(
+                f"INSERT INTO job ({column_list}, created_at, edited_at) "
+                f"SELECT {column_list}, "
+                "CAST(:now AS TIMESTAMP), CAST(:now AS TIMESTAMP) "
+                f"FROM {staging_table} "
+                "ON CONFLICT (lower(link)) DO UPDATE "
+                f"SET {updates}, edited_at = CASE "
+                "WHEN job.content_hash IS DISTINCT FROM EXCLUDED.content_hash "
+                "THEN EXCLUDED.edited_at ELSE job.edited_at END "
+                "WHERE job.content_hash IS DISTINCT FROM EXCLUDED.content_hash "
+                "OR job.parser_version IS DISTINCT FROM EXCLUDED.parser_version "
+                "RETURNING (xmax = 0) AS inserted"
+            ),
+            {"now": utcnow_naive()},
         )
         .scalars()
         .all()
     )
-    logger.info(f"Stored {len(job_ids)} new jobs")
-    store_tags(session=session, job_listings=job_listings)
+    return inserted.count(True), inserted.count(False)
+
+
+def _merge_jobs(session, *, staging_table: str) -> tuple[int, int]:
+    """
+    Same as `_upsert_jobs`, for a job table partitioned by the posting
+    date, which can't have a unique index on the link alone.
+    """
+    # without the unique index, concurrent merges could store
+    # the same link twice, so they are run one at a time.
+    session.execute(
+        sa.text("SELECT pg_advisory_xact_lock(:key)"), {"key": JOB_MERGE_LOCK_KEY}
+    )
+    column_list = ", ".join(JOB_COPY_COLUMNS)
+    updates = ", ".join(f"{column} = staging.{column}" for column in JOB_UPDATE_COLUMNS)
+    now = utcnow_naive()
+    updated = session.execute(
+        sa.text(
+            f"UPDATE job SET {updates}, edited_at = CASE "
+            "WHEN job.content_hash IS DISTINCT FROM staging.content_hash "
+            "THEN CAST(:now AS TIMESTAMP) ELSE job.edited_at END "
+            f"FROM {staging_table} AS staging "
+            "WHERE lower(job.link) = lower(staging.link) "
+            "AND (job.content_hash IS DISTINCT FROM staging.content_hash "
+            "OR job.parser_version IS DISTINCT FROM staging.parser_version)"
+        ),
+        {"now": now},
+    )
+    inserted = session.execute(
+        sa.text(
+            f"INSERT INTO job ({column_list}, created_at, edited_at) "
+            f"SELECT {column_list}, "
+            "CAST(:now AS TIMESTAMP), CAST(:now AS TIMESTAMP) "
+            f"FROM {staging_table} AS staging "
+            "WHERE NOT EXISTS ("
+            "SELECT 1 FROM job WHERE lower(job.link) = lower(staging.link))"
+        ),
+        {"now": now},
+    )
+    return inserted.rowcount, updated.rowcount
+
+
+def is_job_partitioned(session) -> bool:
+    return session.execute(
+        sa.text(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table "
+            "WHERE partrelid = to_regclass('job'))"
+        )
+    ).scalar_one()
 
 
 def store_tags(*, session, job_listings: list[JobListing]):
     """Store tags and job-tag relationships for jobs with tags"""
-    all_tags = set()
+    links = []
+    tags = []
     for listing in job_listings:
-        if tags := listing.tags:
-            all_tags.update(tags)
+        for tag in listing.tags or []:
+            links.append(listing.link)
+            tags.append(tag)
 
-    if not all_tags:
+    if not tags:
         logger.info("No tags to store")
         return
 
-    session.execute(
-        insert(Tag)
-        .values([{"name": tag} for tag in all_tags])
-        .on_conflict_do_nothing(
-            index_elements=[
-                sa.func.lower(Tag.name),
-            ],
-        )
-    )
+    missing = _store_job_tags(session, links=links, tags=tags)
+    if missing:
+        # committed by a concurrent transaction after the snapshot of the
+        # statement was taken, a new statement sees them.
+        pairs = [
+            (link, tag) for link, tag in zip(links, tags) if tag.lower() in missing
+        ]
+        links, tags = map(list, zip(*pairs))
+        _store_job_tags(session, links=links, tags=tags)
 
-    existing_tags = (
-        session.execute(sa.select(Tag).where(Tag.name.ilike(sa.any_(list(all_tags)))))
-        .scalars()
-        .all()
-    )
+    logger.info(f"Stored tags for {len(job_listings)} jobs")
 
-    tag_map = CaseInsensitiveDict()
-    for tag in existing_tags:
-        tag_map[tag.name] = tag.id
 
-    job_links = [job.link for job in job_listings]
-    jobs = (
-        session.execute(
-            sa.select(Job).where(
-                sa.func.lower(Job.link).in_([link.lower() for link in job_links])
+def _store_job_tags(session, *, links: list[str], tags: list[str]) -> set[str]:
+    """
+    Store the tags and the job tags in a single round trip, returns the
+    lowercased tags that couldn't be resolved.
+    """
+    # the tags and the jobs are resolved through the indexes on lower(name)
+    # and lower(link). The tags inserted by the statement aren't visible to
+    # the rest of it, so they are taken from RETURNING along with the
+    # existing ones, the existing tags are left as they are.
+    result = session.execute(
+        sa.text(
+            """
+            WITH pairs AS (
+                SELECT DISTINCT lower(pair.link) AS link, pair.tag
+                FROM unnest(CAST(:links AS VARCHAR[]), CAST(:tags AS VARCHAR[]))
+                    AS pair(link, tag)
+            ),
+            new_tags AS (
+                INSERT INTO tag (name, created_at, edited_at)
+                SELECT DISTINCT ON (lower(tag)) tag, CAST(:now AS TIMESTAMP), :now
+                FROM pairs
+                ON CONFLICT (lower(name)) DO NOTHING
+                RETURNING id, name
+            ),
+            tags AS (
+                SELECT id, name FROM new_tags
+                UNION ALL
+                SELECT tag.id, tag.name
+                FROM tag
+                WHERE lower(tag.name) IN (SELECT lower(tag) FROM pairs)
+            ),
+            job_tags AS (
+                INSERT INTO job_tag (job_id, tag_id, created_at, edited_at)
+                SELECT DISTINCT job.id, tags.id, CAST(:now AS TIMESTAMP), :now
+                FROM pairs
+                JOIN job ON lower(job.link) = pairs.link
+                JOIN tags ON lower(tags.name) = lower(pairs.tag)
+                ON CONFLICT (job_id, tag_id) DO NOTHING
+            )
+            SELECT DISTINCT lower(pairs.tag)
+            FROM pairs
+            WHERE lower(pairs.tag) NOT IN (SELECT lower(name) FROM tags)
+            """
+        ),
+        {"links": links, "tags": tags, "now": utcnow_naive()},
+    )
+    return set(result.scalars())
+
+
+def fill_tags_from_memo(*, session, job_listings: list[JobListing]) -> set[str]:
+    """
+    Tag the jobs whose content was tagged before, straight from the memo,
+    returns the lowercased links of the jobs that were tagged.
+    """
+    if not job_listings:
+        return set()
+
+    links = session.execute(
+        sa.text(
+            """
+            WITH pending AS (
+                SELECT lower(pair.link) AS link, pair.content_hash
+                FROM unnest(CAST(:links AS VARCHAR[]), CAST(:hashes AS VARCHAR[]))
+                    AS pair(link, content_hash)
+            ),
+            inserted AS (
+                INSERT INTO job_tag (job_id, tag_id, created_at, edited_at)
+                SELECT DISTINCT job.id, tag.id, CAST(:now AS TIMESTAMP), :now
+                FROM pending
+                JOIN tag_memo ON tag_memo.content_hash = pending.content_hash
+                CROSS JOIN LATERAL unnest(tag_memo.tags) AS memo_tag(name)
+                JOIN tag ON lower(tag.name) = lower(memo_tag.name)
+                JOIN job ON lower(job.link) = pending.link
+                ON CONFLICT (job_id, tag_id) DO NOTHING
+                RETURNING job_id
             )
+            SELECT DISTINCT lower(job.link)
+            FROM job
+            WHERE job.id IN (SELECT job_id FROM inserted)
+            """
+        ),
+        {
+            "links": [listing.link for listing in job_listings],
+            "hashes": [listing.tagging_hash for listing in job_listings],
+            "now": utcnow_naive(),
+        },
+    )
+    return set(links.scalars())
+
+
+def store_tag_memos(*, session, job_listings: list[JobListing]) -> None:
+    """Remember the tags of the jobs by their content, see `TagMemo`."""
+    # one row per content, a statement can't update the same row twice.
+    memos = {
+        listing.tagging_hash: listing.tags for listing in job_listings if listing.tags
+    }
+    if not memos:
+        return
+
+    statement = postgresql.insert(TagMemo).values(
+        [
+            {"content_hash": content_hash, "tags": tags}
+            for content_hash, tags in memos.items()
+        ]
+    )
+    session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[TagMemo.content_hash],
+            set_={"tags": statement.excluded.tags, "edited_at": utcnow_naive()},
         )
-        .scalars()
-        .all()
     )
 
-    job_link_map = CaseInsensitiveDict()
-    for job in jobs:
-        job_link_map[job.link] = job.id
 
-    job_tags = []
-    for listing in job_listings:
-        job_id = job_link_map[listing.link]
-        for tag_name in listing.tags:
-            tag_id = tag_map[tag_name]
-            job_tags.append(
-                {
-                    "job_id": job_id,
-                    "tag_id": tag_id,
-                }
+def find_dead_letter_hashes(*, session, content_hashes: list[str]) -> set[str]:
+    """The content hashes, among the given ones, that failed too many times."""
+    if not content_hashes:
+        return set()
+
+    statement = sa.select(TagDeadLetter.content_hash).where(
+        TagDeadLetter.content_hash
+        == sa.func.any(
+            sa.bindparam(
+                "content_hashes", value=content_hashes, type_=sa.ARRAY(sa.String)
             )
+        ),
+        TagDeadLetter.failures >= config.TAGGING_MAX_FAILURES,
+    )
+    return set(session.execute(statement).scalars())
 
+
+def store_tag_dead_letters(*, session, failures: list[TaggingFailure]) -> None:
+    """Count a failure against the content of every job that failed."""
+    # one row per content, a statement can't update the same row twice.
+    rows = {
+        failure.job.tagging_hash: {
+            "content_hash": failure.job.tagging_hash,
+            "link": failure.job.link,
+            "error": failure.error,
+        }
+        for failure in failures
+    }
+    statement = postgresql.insert(TagDeadLetter).values(list(rows.values()))
     session.execute(
-        insert(JobTag)
-        .values(job_tags)
-        .on_conflict_do_nothing(
-            index_elements=[
-                JobTag.job_id,
-                JobTag.tag_id,
-            ],
+        statement.on_conflict_do_update(
+            index_elements=[TagDeadLetter.content_hash],
+            set_={
+                "failures": TagDeadLetter.failures + 1,
+                "link": statement.excluded.link,
+                "error": statement.excluded.error,
+                "edited_at": utcnow_naive(),
+            },
         )
     )
-
-    logger.info(f"Stored tags for {len(job_listings)} jobs")
+    logger.info(f"Dead-lettered the content of {len(rows)} jobs")
 
 
 def store_payloads(job_listings: JobListing) -> None:
@@ -369,47 +761,256 @@ def store_payloads(job_listings: JobListing) -> None:
 
 
 def _store_payloads(session, job_listings: JobListing) -> None:
-    values = []
+    rows = []
     for listing in job_listings:
-        value = {
-            "link": listing.link,
-            "payload": listing.payload,
-            "extra_info": listing.extra_info,
-        }
-        values.append(value)
-
-    payload_ids = (
-        session.execute(
-            insert(Payload)
-            .values(values)
-            .on_conflict_do_nothing(
-                index_elements=[
-                    sa.func.lower(Payload.link),
-                ],
+        payload, extra_info = listing.payload, listing.extra_info
+        payload_blob = extra_info_blob = None
+        if config.PAYLOAD_OFFLOAD:
+            if payload is not None:
+                payload_blob = payload_store.put(payload)
+                payload = None
+            if extra_info is not None:
+                extra_info_blob = payload_store.put(extra_info)
+                extra_info = None
+        rows.append(
+            (
+                listing.link,
+                payload,
+                extra_info,
+                *(payload_blob or (None, None)),
+                *(extra_info_blob or (None, None)),
             )
-            .returning(Payload.id)
         )
-        .scalars()
-        .all()
+    staging_table = _copy_to_staging(
+        session, table=Payload.__table__, columns=PAYLOAD_COPY_COLUMNS, rows=rows
+    )
+    column_list = ", ".join(PAYLOAD_COPY_COLUMNS)
+    result = session.execute(
+        sa.text(
+            f"INSERT INTO payload ({column_list}, created_at, edited_at) "
+            f"SELECT {column_list}, :now, :now FROM {staging_table} "
+            "ON CONFLICT (lower(link)) DO NOTHING"
+        ),
+        {"now": utcnow_naive()},
+    )
+    logger.info(f"Stored {result.rowcount} new payloads")
+
+
+def _copy_to_staging(
+    session, *, table: sa.Table, columns: tuple[str, ...], rows: Iterable[tuple]
+) -> str:
+    """
+    Stream the rows with COPY into a temporary staging table, shaped
+    like the table, so that they can be merged with a single statement.
+
+    Returns the name of the staging table.
+    """
+    staging_table = f"{table.name}_staging"
+    column_list = ", ".join(columns)
+    session.execute(
+        sa.text(
+            f"CREATE TEMPORARY TABLE IF NOT EXISTS {staging_table} "
+            f"ON COMMIT DROP AS SELECT {column_list} FROM {table.name} WITH NO DATA"
+        )
+    )
+    # the staging table outlives a batch when the transaction does.
+    session.execute(sa.text(f"TRUNCATE {staging_table}"))
+
+    buffer = io.StringIO()
+    # None is written unquoted, which COPY reads as NULL,
+    # while an empty string is quoted and stays one.
+    csv.writer(buffer, quoting=csv.QUOTE_NOTNULL).writerows(rows)
+    _copy_from_csv(
+        session,
+        f"COPY {staging_table} ({column_list}) FROM STDIN WITH (FORMAT csv)",
+        buffer.getvalue(),
+    )
+    return staging_table
+
+
+def _copy_from_csv(session, statement: str, data: str) -> None:
+    # COPY isn't exposed by sqlalchemy, it has to go through the driver.
+    cursor = session.connection().connection.cursor()
+    try:
+        if hasattr(cursor, "copy_expert"):
+            # psycopg2
+            cursor.copy_expert(statement, io.StringIO(data))
+        else:
+            # psycopg 3
+            with cursor.copy(statement) as copy:
+                copy.write(data)
+    finally:
+        cursor.close()
+
+
+def _to_array_literal(values: list[str] | None) -> str | None:
+    if values is None:
+        return None
+
+    elements = (
+        '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"' for value in values
     )
-    logger.info(f"Stored {len(payload_ids)} new payloads")
+    return "{" + ",".join(elements) + "}"
 
 
 def purge_old_jobs():
+    # imported here to avoid a circular import.
+    from job_board.partitions import drop_job_partitions
+    from job_board.partitions import ensure_job_partitions
+    from job_board.partitions import purge_detached_job_partitions
+
+    cutoff = utcnow_naive() - timedelta(days=config.JOB_AGE_LIMIT_DAYS)
     with get_session(readonly=False) as session:
-        deleted_jobs = session.execute(
-            sa.delete(Job).where(
-                Job.posted_on
-                < (utcnow_naive() - timedelta(days=config.JOB_AGE_LIMIT_DAYS))
+        if is_job_partitioned(session):
+            # the months that are entirely past the cutoff are dropped whole,
+            # only the month of the cutoff is left to be archived below.
+            drop_job_partitions(session, before=cutoff)
+            ensure_job_partitions(session)
+
+    # also picks up the partitions left over by an interrupted purge.
+    purge_detached_job_partitions()
+    archive_old_jobs(cutoff)
+    purge_orphaned_payloads()
+    collect_payload_blobs()
+
+
+def archive_old_jobs(
+    cutoff: datetime, *, batch_size: int = config.PURGE_BATCH_SIZE
+) -> int:
+    """
+    Move the jobs posted before the cutoff to the archive, along with their
+    tags and payload digests, and delete them with their payloads.
+
+    The jobs are moved in chunks, each in its own short transaction, and
+    the jobs locked by someone else are skipped until the next purge.
+    Returns the number of jobs archived.
+    """
+    archived = 0
+    started_at = time.monotonic()
+    while True:
+        with get_session(readonly=False) as session:
+            job_ids = (
+                session.execute(
+                    sa.text(
+                        """
+                        WITH expired AS (
+                            SELECT id, link FROM job
+                            WHERE posted_on < :cutoff
+                            ORDER BY posted_on
+                            LIMIT :batch_size
+                            FOR UPDATE SKIP LOCKED
+                        ),
+                        archived AS (
+                            INSERT INTO job_archive (
+                                job_id, link, title, company_name, min_salary,
+                                max_salary, is_remote, locations, posted_on, tags,
+                                payload_digest, extra_info_digest,
+                                created_at, edited_at
+                            )
+                            SELECT
+                                job.id, job.link, job.title, job.company_name,
+                                job.min_salary, job.max_salary, job.is_remote,
+                                job.locations, job.posted_on,
+                                ARRAY(
+                                    SELECT tag.name
+                                    FROM job_tag
+                                    JOIN tag ON tag.id = job_tag.tag_id
+                                    WHERE job_tag.job_id = job.id
+                                    ORDER BY tag.name
+                                ),
+                                payload.payload_digest, payload.extra_info_digest,
+                                CAST(:now AS TIMESTAMP), CAST(:now AS TIMESTAMP)
+                            FROM job
+                            JOIN expired ON expired.id = job.id
+                            LEFT JOIN payload
+                                ON lower(payload.link) = lower(job.link)
+                        ),
+                        deleted_tags AS (
+                            DELETE FROM job_tag USING expired
+                            WHERE job_tag.job_id = expired.id
+                        ),
+                        deleted_payloads AS (
+                            DELETE FROM payload USING expired
+                            WHERE lower(payload.link) = lower(expired.link)
+                        )
+                        DELETE FROM job USING expired
+                        WHERE job.id = expired.id
+                        RETURNING job.id
+                        """
+                    ),
+                    {"cutoff": cutoff, "batch_size": batch_size, "now": utcnow_naive()},
+                )
+                .scalars()
+                .all()
             )
-        )
 
-        deleted_payloads = session.execute(
-            sa.delete(Payload).where(
-                ~sa.exists(sa.select(Job.id).where(Job.link == Payload.link))
+        archived += len(job_ids)
+        if len(job_ids) < batch_size:
+            break
+
+    elapsed = time.monotonic() - started_at
+    logger.info(
+        f"Archived {archived} old jobs in {elapsed:.2f}s, "
+        f"{archived / max(elapsed, 1e-6):.0f} rows/s"
+    )
+    return archived
+
+
+def purge_orphaned_payloads(*, batch_size: int = config.PURGE_BATCH_SIZE) -> int:
+    """
+    Delete the payloads left without a job, in chunks like the archiving,
+    returns the number of payloads deleted.
+
+    The jobs that are archived or dropped take their payloads along,
+    so there are only a few left here.
+    """
+    purged = 0
+    while True:
+        with get_session(readonly=False) as session:
+            # compared through lower(), so that the index on it is used.
+            deleted = session.execute(
+                sa.text(
+                    """
+                    DELETE FROM payload
+                    WHERE id IN (
+                        SELECT id FROM payload
+                        WHERE NOT EXISTS (
+                            SELECT 1 FROM job
+                            WHERE lower(job.link) = lower(payload.link)
+                        )
+                        LIMIT :batch_size
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    """
+                ),
+                {"batch_size": batch_size},
+            ).rowcount
+
+        purged += deleted
+        if deleted < batch_size:
+            break
+
+    logger.info(f"Purged {purged} orphaned payloads.")
+    return purged
+
+
+def collect_payload_blobs() -> None:
+    """Remove the blobs of the payloads that were purged."""
+    with get_session(readonly=True) as session:
+        referenced = session.execute(
+            sa.union(
+                *(
+                    sa.select(column).where(column.is_not(None))
+                    for column in (
+                        Payload.payload_digest,
+                        Payload.extra_info_digest,
+                        # the archived jobs keep their payloads.
+                        JobArchive.payload_digest,
+                        JobArchive.extra_info_digest,
+                    )
+                )
             )
-        )
-        logger.info(
-            f"Purged {deleted_jobs.rowcount} old jobs and "
-            f"{deleted_payloads.rowcount} old payloads."
+        ).scalars()
+        payload_store.collect_garbage(
+            referenced, grace_period=config.PAYLOAD_BLOB_GRACE_PERIOD
         )
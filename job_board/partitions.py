@@ -0,0 +1,214 @@
+import re
+from datetime import date
+from datetime import datetime
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+
+from job_board import config
+from job_board.connection import get_session
+from job_board.logger import logger
+from job_board.models import is_job_partitioned
+from job_board.models import Job
+from job_board.utils import utcnow_naive
+
+PARTITION_NAME_REGEX = re.compile(r"^job_p(?P<year>\d{4})_(?P<month>\d{2})$")
+DETACHED_PARTITION_NAME_REGEX = re.compile(r"^job_detached_p\d{4}_\d{2}$")
+# catches the jobs outside of the monthly partitions.
+DEFAULT_PARTITION = "job_default"
+
+
+def partition_jobs(session) -> None:
+    """
+    Convert the job table into one partitioned by the month of the
+    posting date, so that old jobs are purged by dropping partitions.
+
+    A unique index on a partitioned table has to include the posting
+    date, so the link is indexed without being unique and the jobs are
+    merged with NOT EXISTS instead, see `models._merge_jobs`.
+    """
+    if is_job_partitioned(session):
+        logger.info("The job table is already partitioned")
+        return
+
+    session.execute(sa.text("LOCK TABLE job IN ACCESS EXCLUSIVE MODE"))
+    oldest = session.execute(sa.select(sa.func.min(Job.posted_on))).scalar_one()
+    for statement in (
+        # the sequence would be dropped along with the old table otherwise.
+        "ALTER SEQUENCE job_id_seq OWNED BY NONE",
+        # a foreign key can't reference a partitioned table by the id alone,
+        # the tags of the purged jobs are deleted along with them instead,
+        # in chunks for the dropped partitions.
+        "ALTER TABLE job_tag DROP CONSTRAINT IF EXISTS job_tag_job_id_fkey",
+        "CREATE TABLE job_partitioned "
+        "(LIKE job INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        "PARTITION BY RANGE (posted_on)",
+        "ALTER TABLE job_partitioned ADD PRIMARY KEY (id, posted_on)",
+        f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF job_partitioned DEFAULT",
+    ):
+        session.execute(sa.text(statement))
+
+    ensure_job_partitions(session, since=oldest, parent="job_partitioned")
+    for statement in (
+        "INSERT INTO job_partitioned SELECT * FROM job",
+        "DROP TABLE job",
+        "ALTER TABLE job_partitioned RENAME TO job",
+        "ALTER TABLE job RENAME CONSTRAINT job_partitioned_pkey TO job_pkey",
+        "ALTER SEQUENCE job_id_seq OWNED BY job.id",
+    ):
+        session.execute(sa.text(statement))
+
+    for index in Job.__table__.indexes:
+        statement = str(CreateIndex(index).compile(dialect=postgresql.dialect()))
+        session.execute(
+            sa.text(statement.replace("CREATE UNIQUE INDEX", "CREATE INDEX"))
+        )
+
+    logger.info("Partitioned the job table by month of posted_on")
+
+
+def ensure_job_partitions(
+    session,
+    *,
+    since: datetime | None = None,
+    months_ahead: int = config.JOB_PARTITION_MONTHS_AHEAD,
+    parent: str = "job",
+) -> None:
+    """
+    Create the monthly partitions from `since` up to `months_ahead`.
+
+    A partition can't be attached while the default partition holds rows
+    of its month, so those are moved into it before it's attached.
+    """
+    month = _get_month(since or utcnow_naive())
+    last_month = _add_months(_get_month(utcnow_naive()), months_ahead)
+    while month <= last_month:
+        next_month = _add_months(month, 1)
+        partition = f"job_p{month:%Y_%m}"
+        exists = session.execute(
+            sa.text("SELECT to_regclass(:partition) IS NOT NULL"),
+            {"partition": partition},
+        ).scalar_one()
+        if not exists:
+            for statement in (
+                f"CREATE TABLE {partition} "
+                f"(LIKE {parent} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)",
+                f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+                f"WHERE posted_on >= '{month}' AND posted_on < '{next_month}' "
+                f"RETURNING *) INSERT INTO {partition} SELECT * FROM moved",
+                f"ALTER TABLE {parent} ATTACH PARTITION {partition} "
+                f"FOR VALUES FROM ('{month}') TO ('{next_month}')",
+            ):
+                session.execute(sa.text(statement))
+        month = next_month
+
+
+def drop_job_partitions(session, *, before: datetime) -> int:
+    """
+    Detach the monthly partitions entirely before `before` from the job
+    table, returns the number detached.
+
+    Detaching is instant, the jobs of the detached partitions are deleted
+    along with their tags and payloads by `purge_detached_job_partitions`.
+    """
+    partitions = (
+        session.execute(
+            sa.text(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid "
+                "WHERE pg_inherits.inhparent = to_regclass('job')"
+            )
+        )
+        .scalars()
+        .all()
+    )
+
+    dropped = 0
+    for partition in sorted(partitions):
+        if (match := PARTITION_NAME_REGEX.match(partition)) is None:
+            continue
+
+        month = date(int(match["year"]), int(match["month"]), 1)
+        if _add_months(month, 1) > before.date():
+            continue
+
+        for statement in (
+            f"ALTER TABLE job DETACH PARTITION {partition}",
+            # renamed, so that a partition of the same month can be made again.
+            f"ALTER TABLE {partition} RENAME TO job_detached_p{month:%Y_%m}",
+        ):
+            session.execute(sa.text(statement))
+
+        logger.info(f"Detached the job partition {partition}")
+        dropped += 1
+
+    return dropped
+
+
+def purge_detached_job_partitions(*, batch_size: int = config.PURGE_BATCH_SIZE) -> int:
+    """
+    Delete the tags and the payloads of the jobs in the detached partitions
+    in chunks, each in its own short transaction, then drop the partitions.
+
+    Returns the number of partitions dropped.
+    """
+    with get_session(readonly=True) as session:
+        tables = (
+            session.execute(
+                sa.text(
+                    "SELECT relname FROM pg_class "
+                    "WHERE relkind = 'r' AND relname LIKE 'job\\_detached\\_p%'"
+                )
+            )
+            .scalars()
+            .all()
+        )
+
+    dropped = 0
+    for table in sorted(tables):
+        if DETACHED_PARTITION_NAME_REGEX.match(table) is None:
+            continue
+
+        while True:
+            with get_session(readonly=False) as session:
+                deleted = session.execute(
+                    sa.text(
+                        f"""
+                        WITH expired AS (
+                            SELECT id, link FROM {table}
+                            LIMIT :batch_size
+                        ),
+                        deleted_tags AS (
+                            DELETE FROM job_tag USING expired
+                            WHERE job_tag.job_id = expired.id
+                        ),
+                        deleted_payloads AS (
+                            DELETE FROM payload USING expired
+                            WHERE lower(payload.link) = lower(expired.link)
+                        )
+                        DELETE FROM {table} USING expired
+                        WHERE {table}.id = expired.id
+                        """
+                    ),
+                    {"batch_size": batch_size},
+                ).rowcount
+            if deleted < batch_size:
+                break
+
+        with get_session(readonly=False) as session:
+            session.execute(sa.text(f"DROP TABLE {table}"))
+
+        logger.info(f"Dropped the detached job partition {table}")
+        dropped += 1
+
+    return dropped
+
+
+def _get_month(value: datetime) -> date:
+    return date(value.year, value.month, 1)
+
+
+def _add_months(month: date, months: int) -> date:
+    year, month_index = divmod(month.month - 1 + months, 12)
+    return date(month.year + year, month_index + 1, 1)
@@ -0,0 +1,93 @@
+import hashlib
+import mmap
+import os
+import threading
+import time
+from collections.abc import Iterable
+from pathlib import Path
+from typing import BinaryIO
+from typing import NamedTuple
+
+import zstandard
+
+from job_board import config
+from job_board.logger import logger
+
+
+class Blob(NamedTuple):
+    digest: str
+    size: int
+
+
+class PayloadStore:
+    """
+    Content-addressed store for the raw payloads, kept out of the database.
+
+    Every body is compressed with zstd and stored once, in a file named
+    after the sha256 digest of its content, sharded by the first two
+    characters of the digest.
+    """
+
+    def __init__(self, directory: Path | str, level: int = 3):
+        self.directory = Path(directory)
+        self.level = level
+
+    def put(self, content: str) -> Blob:
+        data = content.encode()
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._get_path(digest)
+        try:
+            # a reused blob is touched, so that the garbage collection keeps
+            # it until the payload referencing it is committed.
+            os.utime(path)
+        except FileNotFoundError:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # write to a temporary file first, so that a crash
+            # doesn't leave a partially written blob behind.
+            temp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+            compressor = zstandard.ZstdCompressor(level=self.level)
+            temp_path.write_bytes(compressor.compress(data))
+            temp_path.replace(path)
+        return Blob(digest=digest, size=len(data))
+
+    def get(self, digest: str) -> str:
+        with self.open(digest) as stream:
+            return stream.read().decode()
+
+    def open(self, digest: str) -> BinaryIO:
+        """
+        Stream the decompressed content of a blob, the compressed file is
+        memory mapped instead of being read up front.
+        """
+        with self._get_path(digest).open("rb") as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return zstandard.ZstdDecompressor().stream_reader(mapped, closefd=True)
+
+    def collect_garbage(self, referenced: Iterable[str], *, grace_period: int) -> int:
+        """
+        Remove the blobs that aren't referenced anymore, returns the
+        number of blobs removed.
+
+        The blobs written in the last `grace_period` seconds are kept,
+        they might belong to payloads that aren't committed yet.
+        """
+        if not self.directory.exists():
+            return 0
+
+        referenced = set(referenced)
+        cutoff = time.time() - grace_period
+        removed = 0
+        for path in self.directory.glob("*/*.zst"):
+            if path.stem in referenced or path.stat().st_mtime > cutoff:
+                continue
+            path.unlink(missing_ok=True)
+            removed += 1
+
+        logger.info(f"Removed {removed} unreferenced payload blobs")
+        return removed
+
+    def _get_path(self, digest: str) -> Path:
+        return self.directory / digest[:2] / f"{digest}.zst"
+
+
+payload_store = PayloadStore(directory=config.PAYLOAD_BLOB_DIR)
@@ -1,14 +1,18 @@
 from __future__ import annotations
 
+import contextvars
+import itertools
+from collections.abc import Iterator
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import TYPE_CHECKING
 
-import sqlalchemy as sa
-
-from job_board.connection import get_session
+from job_board import config
 from job_board.logger import logger
 
 if TYPE_CHECKING:
+    from job_board.known_links import KnownLinks
     from job_board.portals.parser import JobParser
     from job_board.portals.parser import Job as JobListing
 
@@ -22,69 +26,137 @@ class BasePortal:
     url: str
     api_data_format: str
     parser_class: type["JobParser"]
+    # maximum number of detail pages(extra info) to fetch concurrently,
+    # portals without detail pages don't need to set this.
+    detail_page_concurrency: int = 0
+    # portals whose feeds carry all the fields of a job parse the known
+    # jobs too, so that the stored ones are updated when they change.
+    refreshes_known_jobs: bool = False
+    # portals that need the detail page to know the posted date fetch the
+    # detail pages of the new jobs concurrently, before checking the date.
+    posted_on_from_detail_page: bool = False
 
     @classmethod
     def __init_subclass__(cls, *args, **kwargs):
         super().__init_subclass__(*args, **kwargs)
         PORTALS[cls.portal_name] = cls
 
-    def __init__(self, last_run_at: None | datetime = None):
+    def __init__(
+        self,
+        last_run_at: None | datetime = None,
+        known_links: None | KnownLinks = None,
+        checkpoint: None | dict = None,
+    ):
         self.last_run_at = last_run_at
+        # links of the stored jobs, shared by all portals during a run.
+        self.known_links = known_links
+        # where a failed run had reached, portals with
+        # more than one page resume from here.
+        self.checkpoint = checkpoint
+        # set by `iter_pages` along with each page, the checkpoint
+        # to resume from once all the jobs of that page are stored.
+        self.page_checkpoint: None | dict = None
 
     def fetch_jobs(self) -> list["JobListing"]:
         """Fetch jobs from the portal."""
-        response = self.make_request()
-        items = self.get_items(response)
-        jobs = []
-        relevant_items = self.filter_items(items)
-        for item in relevant_items:
-            parser = self.parser_class(
+        return list(itertools.chain.from_iterable(self.iter_jobs()))
+
+    def iter_jobs(self) -> Iterator[list["JobListing"]]:
+        """
+        Fetch jobs from the portal in batches, as the pages arrive,
+        so that a batch can be stored before the next one is fetched.
+
+        Once the last batch of a page is yielded, `checkpoint` is where
+        a later run can resume from, if this one fails.
+        """
+        for page in self.iter_pages():
+            page_checkpoint = self.page_checkpoint
+            items = self.get_items(page)
+            # one parser per item, used both to filter and to extract the job.
+            parsers = self.filter_parsers(self.get_parsers(items))
+            batches = list(itertools.batched(parsers, config.INGESTION_BATCH_SIZE))
+            # a page without any new jobs still yields an
+            # empty batch, so that its checkpoint is recorded.
+            batches = batches or [()]
+            for index, batch in enumerate(batches, start=1):
+                self.prefetch_extra_info(batch)
+                if index == len(batches):
+                    self.checkpoint = page_checkpoint
+                yield [parser.get_job() for parser in batch]
+
+    def iter_pages(self) -> Iterator[bytes | dict]:
+        """
+        Yields the responses from the portal, page by page. Portals
+        that fetch more than one page should yield them as they arrive.
+        """
+        yield self.make_request()
+
+    def get_parsers(self, items: list[object]) -> list["JobParser"]:
+        return [
+            self.parser_class(
                 item=item,
                 api_data_format=self.api_data_format,
             )
-            job = parser.get_job()
-            jobs.append(job)
-        return jobs
-
-    def filter_items(self, items: list[object]) -> list[object]:
-        from job_board.models import Job
-
-        recent_items = []
-        recent_links = []
-        for item in items:
-            parser = self.parser_class(
-                item=item,
-                api_data_format=self.api_data_format,
+            for item in items
+        ]
+
+    def prefetch_extra_info(self, parsers: Sequence["JobParser"]) -> None:
+        """
+        Fetch the detail pages for all the parsers concurrently, so that
+        extracting the fields later doesn't block on a request per job.
+        """
+        if not self.detail_page_concurrency or not parsers:
+            return
+
+        # the threads don't inherit the context, which holds the scrapfly run.
+        context = contextvars.copy_context()
+
+        def _prefetch(parser: "JobParser") -> None:
+            # accessing the cached property stores it on the parser.
+            context.copy().run(getattr, parser, "extra_info")
+
+        logger.info(
+            f"[{self.display_name}]: Fetching {len(parsers)} detail pages, "
+            f"concurrency={self.detail_page_concurrency}"
+        )
+        with ThreadPoolExecutor(max_workers=self.detail_page_concurrency) as executor:
+            # consume the results so that the exceptions are raised here.
+            list(executor.map(_prefetch, parsers))
+
+    def filter_parsers(self, parsers: list["JobParser"]) -> list["JobParser"]:
+        from job_board.known_links import KnownLinks
+
+        known_links = self.known_links
+        if known_links is None:
+            # not shared by a run, so only look up the links at hand.
+            known_links = KnownLinks.for_links(
+                [parser.get_link() for parser in parsers]
             )
+
+        new_parsers = []
+        for parser in parsers:
             link = parser.get_link()
-            if not parser.validate_recency():
-                posted_on = parser.get_posted_on()
-                logger.info(f"{link=} {posted_on=} is too old, skipping.")
+            if link in known_links and not self.refreshes_known_jobs:
+                logger.info(f"{link} already exists, skipping.")
                 continue
+            new_parsers.append(parser)
 
-            recent_links.append(link)
-            recent_items.append(item)
+        if self.posted_on_from_detail_page:
+            self.prefetch_extra_info(new_parsers)
 
-        statement = sa.select(Job.link).where(
-            sa.func.lower(Job.link).in_([link.lower() for link in recent_links])
-        )
-        with get_session(readonly=True) as session:
-            existing_links = session.execute(statement).scalars().all()
-
-        relevant_items = []
-        for item in recent_items:
-            parser = self.parser_class(
-                item=item,
-                api_data_format=self.api_data_format,
-            )
-            link = parser.get_link()
-            if link.lower() in existing_links:
-                logger.info(f"{link} already exists, skipping.")
+        relevant_parsers = []
+        for parser in new_parsers:
+            # checked only after the link, since some portals need
+            # to fetch the detail page to know the posted date.
+            if not parser.validate_recency():
+                link = parser.get_link()
+                posted_on = parser.get_posted_on()
+                logger.info(f"{link=} {posted_on=} is too old, skipping.")
                 continue
 
-            relevant_items.append(item)
+            relevant_parsers.append(parser)
 
-        return relevant_items
+        return relevant_parsers
 
     def make_request(self) -> bytes | dict:
         """Makes a request to the portal and returns the response."""
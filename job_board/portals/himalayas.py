@@ -4,7 +4,9 @@ from datetime import timedelta
 from datetime import timezone
 from decimal import Decimal
 from typing import Any
+from typing import AsyncIterator
 from typing import Dict
+from typing import Iterator
 from typing import List
 
 from lxml import html
@@ -15,8 +17,8 @@ from job_board.portals.base import BasePortal
 from job_board.portals.parser import JobParser
 from job_board.portals.parser import Money
 from job_board.portals.parser import SalaryRange
-from job_board.utils import async_http_client
 from job_board.utils import get_iso2
+from job_board.utils import http_clients
 from job_board.utils import retry_on_http_errors
 
 
@@ -63,25 +65,19 @@ class Parser(JobParser):
         currency = self.get_currency()
         max_amount = self.item["maxSalary"]
         if max_amount:
-            max_amount = self.get_amount_in_default_currency(
-                Decimal(str(max_amount)),
-                currency=currency,
-            )
+            max_amount = Decimal(str(max_amount))
 
         min_amount = self.item["minSalary"]
         if min_amount:
-            min_amount = self.get_amount_in_default_currency(
-                Decimal(str(min_amount)),
-                currency=currency,
-            )
+            min_amount = Decimal(str(min_amount))
 
         return SalaryRange(
             min_salary=Money(
-                currency=config.DEFAULT_CURRENCY,
+                currency=currency,
                 amount=min_amount,
             ),
             max_salary=Money(
-                currency=config.DEFAULT_CURRENCY,
+                currency=currency,
                 amount=max_amount,
             ),
         )
@@ -102,8 +98,9 @@ class Himalayas(BasePortal):
     url = "https://himalayas.app/jobs/api"
     api_data_format = "json"
     parser_class = Parser
+    refreshes_known_jobs = True
 
-    def make_request(self) -> list[dict[str, Any]]:
+    def iter_pages(self) -> Iterator[list[dict[str, Any]]]:
         if self.last_run_at:
             cutoff_date = self.last_run_at
         else:
@@ -111,30 +108,34 @@ class Himalayas(BasePortal):
                 config.JOB_AGE_LIMIT_DAYS
             )
 
-        return asyncio.run(self.fetch_all_pages(cutoff_date=cutoff_date))
+        # a failed run resumes from the offset it had reached.
+        offset = (self.checkpoint or {}).get("offset", 0)
+        return http_clients.iterate(
+            self._iter_pages(cutoff_date=cutoff_date, offset=offset)
+        )
 
-    async def fetch_all_pages(self, cutoff_date: datetime) -> List[Dict[str, Any]]:
+    async def _iter_pages(
+        self, cutoff_date: datetime, offset: int = 0
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
         """
-        Fetch all pages of job listings concurrently with proper error handling
+        Fetch the pages of job listings concurrently in batches,
+        yielding the jobs of each page as soon as its batch is done.
         """
-        return await self._fetch_all_pages(cutoff_date)
-
-    async def _fetch_all_pages(self, cutoff_date: datetime) -> List[Dict[str, Any]]:
-        jobs_data = []
-        jobs_fetched = 0
+        jobs_fetched = offset
         # First request to get total count
         response = await self._make_async_request(
-            params={"offset": 0, "limit": MAX_JOBS_PER_REQUEST}
+            params={"offset": offset, "limit": MAX_JOBS_PER_REQUEST}
         )
         total_jobs = response["totalCount"]
         job_data = response["jobs"]
-        jobs_data.extend(job_data)
         jobs_fetched += len(job_data)
 
         logger.info(
             f"[Himalayas]: Fetched {jobs_fetched} of {total_jobs} jobs, "
             f"Remaining: {total_jobs - jobs_fetched}"
         )
+        self.page_checkpoint = {"offset": jobs_fetched}
+        yield job_data
 
         # Create batch tasks for remaining jobs
         while jobs_fetched < total_jobs:
@@ -165,13 +166,14 @@ class Himalayas(BasePortal):
 
             for result in task_results:
                 batch_jobs = result["jobs"]
-                jobs_data.extend(batch_jobs)
                 jobs_fetched += len(batch_jobs)
 
                 logger.info(
                     f"[Himalayas]: Fetched {jobs_fetched} of {total_jobs} jobs, "
                     f"Remaining: {total_jobs - jobs_fetched}"
                 )
+                self.page_checkpoint = {"offset": jobs_fetched}
+                yield batch_jobs
 
                 if jobs_fetched >= total_jobs:
                     break
@@ -187,14 +189,12 @@ class Himalayas(BasePortal):
                         f"[Himalayas]: No more jobs to fetch. "
                         f"{cutoff_date=}, {jobs_fetched=}"
                     )
-                    return jobs_data
-
-        return jobs_data
+                    return
 
     @retry_on_http_errors(max_attempts=10, min_wait=1.5, max_wait=20)
     async def _make_async_request(self, params: Dict[str, Any]) -> Dict[str, Any]:
-        async with async_http_client() as client:
-            response = await client.get(self.url, params=params)
+        client = http_clients.async_client(self.url)
+        response = await client.get(self.url, params=params)
         return response.json()
 
     def get_items(self, jobs_data) -> list:
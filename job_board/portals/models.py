@@ -1,12 +1,20 @@
+import uuid
 from datetime import timedelta
 from datetime import timezone
 
 import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
 
+from job_board import config
 from job_board.connection import get_session
+from job_board.exchange_rates import convert_salaries
+from job_board.known_links import KnownLinks
+from job_board.logger import logger
 from job_board.models import BaseModel
 from job_board.models import store_jobs
 from job_board.portals.base import PORTALS
+from job_board.tag_extractor import tag_extractor
+from job_board.utils import is_budget_exceeded
 from job_board.utils import utcnow_naive
 
 
@@ -15,6 +23,14 @@ class Portal(BaseModel):
 
     name = sa.Column(sa.String, nullable=False)
     last_run_at = sa.Column(sa.DateTime)
+    # set while a run is in progress, a run that failed keeps them,
+    # so that the next one resumes from the checkpoint.
+    run_id = sa.Column(sa.String)
+    checkpoint = sa.Column(JSONB)
+    # when the run first started, it becomes `last_run_at` once the run
+    # completes, even if it took a few attempts.
+    run_started_at = sa.Column(sa.DateTime)
+    run_attempts = sa.Column(sa.Integer, nullable=False, server_default="0")
 
     __table_args__ = (
         sa.Index(
@@ -44,7 +60,7 @@ class Portal(BaseModel):
         return portal
 
     @classmethod
-    def fetch_jobs(cls, name: str) -> None:
+    def fetch_jobs(cls, name: str, known_links: KnownLinks | None = None) -> None:
         if name not in PORTALS:
             raise ValueError(f"Portal {name} is not supported")
 
@@ -56,15 +72,74 @@ class Portal(BaseModel):
             # just to have a buffer
             last_run_at -= timedelta(minutes=5)
 
+        with get_session(readonly=False) as session:
+            portal = session.get(Portal, portal_id)
+            if (
+                portal.run_id is not None
+                and portal.run_attempts < config.PORTAL_RUN_MAX_ATTEMPTS
+            ):
+                checkpoint = portal.checkpoint
+                logger.info(
+                    f"Resuming run {portal.run_id} of {name} from {checkpoint=}"
+                )
+            else:
+                if portal.run_id is not None:
+                    logger.warning(
+                        f"Run {portal.run_id} of {name} failed "
+                        f"{portal.run_attempts} times, starting over"
+                    )
+                checkpoint = None
+                portal.run_id = uuid.uuid4().hex
+                portal.run_started_at = utcnow_naive()
+                portal.run_attempts = 0
+                portal.checkpoint = None
+            portal.run_attempts += 1
+            run_id = portal.run_id
+            run_started_at = portal.run_started_at
+
         portal_class = PORTALS[name]
-        portal_obj = portal_class(last_run_at=last_run_at)
-        jobs = portal_obj.fetch_jobs()
+        portal_obj = portal_class(
+            last_run_at=last_run_at,
+            known_links=known_links,
+            checkpoint=checkpoint,
+        )
+        # each batch is stored as soon as it is parsed, so the jobs
+        # already found are kept even if a later page fails.
+        try:
+            for jobs in portal_obj.iter_jobs():
+                if config.LOCAL_TAGGING:
+                    # only the jobs that aren't clear enough are left to the LLM.
+                    jobs = tag_extractor.fill_tags(jobs)
+                store_jobs(convert_salaries(jobs))
+                if known_links is not None:
+                    known_links.add(job.link for job in jobs)
+
+                if portal_obj.checkpoint != checkpoint:
+                    checkpoint = portal_obj.checkpoint
+                    with get_session(readonly=False) as session:
+                        portal = session.get(Portal, portal_id)
+                        portal.checkpoint = checkpoint
+        except Exception as exc:
+            if not is_budget_exceeded(exc):
+                raise
 
-        store_jobs(jobs)
+            # not a failure of the portal, the run stops where it had reached
+            # and the next one resumes from there, without counting an attempt.
+            logger.warning(f"Stopping run {run_id} of {name}, {exc}")
+            with get_session(readonly=False) as session:
+                portal = session.get(Portal, portal_id)
+                portal.run_attempts -= 1
+            return
 
         with get_session(readonly=False) as session:
             portal = session.get(Portal, portal_id)
-            portal.last_run_at = utcnow_naive()
+            # the next run looks back to when this one first started, so the
+            # jobs posted while it was failing and being resumed aren't missed.
+            portal.last_run_at = run_started_at
+            portal.run_id = None
+            portal.run_started_at = None
+            portal.run_attempts = 0
+            portal.checkpoint = None
 
         # we should probably start a background job to fetch tags
         # here, but using something like celery would be too much.
@@ -1,3 +1,5 @@
+import contextlib
+import hashlib
 import json
 import re
 from datetime import datetime
@@ -5,6 +7,8 @@ from datetime import timedelta
 from datetime import timezone
 from decimal import Decimal
 from functools import cached_property
+from functools import wraps
+from typing import Any
 from typing import NamedTuple
 
 import httpx
@@ -12,6 +16,7 @@ import pycountry
 from babel.numbers import format_compact_currency
 from lxml import etree
 from lxml import html
+from lxml import objectify
 from pydantic import BaseModel
 from pydantic import ConfigDict
 from pydantic import Field
@@ -20,14 +25,14 @@ from requests.structures import CaseInsensitiveDict
 from job_board import config
 from job_board.logger import logger
 from job_board.utils import get_currency_from_symbol
-from job_board.utils import get_exchange_rate
 from job_board.utils import get_iso2
 from job_board.utils import get_openai_schema
-from job_board.utils import http_client
-from job_board.utils import retry_on_http_errors
 
 
 OPENAI_RESPONSES_API_URL = "https://api.openai.com/v1/responses"
+OPENAI_TIMEOUT = httpx.Timeout(
+    config.DEFAULT_HTTP_TIMEOUT, read=config.OPENAI_READ_TIMEOUT
+)
 
 SALARY_AMOUNT_REGEX = re.compile(
     r"""
@@ -94,6 +99,9 @@ class Job(BaseModel):
     link: str
     min_salary: Decimal | None = None
     max_salary: Decimal | None = None
+    # currency of the salaries, parsers emit them in the posted currency
+    # and they are converted to the default currency later in bulk.
+    salary_currency: str | None = None
     posted_on: datetime | None = None
     tags: list[str] | None = Field(default_factory=list)
     is_remote: bool = False
@@ -102,6 +110,8 @@ class Job(BaseModel):
     extra_info: str | None = None
     portal_name: str | None = None
     company_name: str | None = None
+    # version of the parser that extracted the job.
+    parser_version: int | None = None
 
     model_config = ConfigDict(frozen=True)
 
@@ -131,12 +141,114 @@ class Job(BaseModel):
 
         return f"Up to {max_formatted}"
 
+    @property
+    def content_hash(self) -> str:
+        """
+        Digest of the fields stored for the job, normalized so that
+        only a real change in the listing changes it.
+        """
+
+        def normalize_text(value: str | None) -> str | None:
+            return value and " ".join(value.split())
+
+        def normalize_amount(value: Decimal | None) -> str | None:
+            return None if value is None else str(value.normalize())
+
+        data = [
+            normalize_text(self.title),
+            normalize_text(self.description),
+            normalize_amount(self.min_salary),
+            normalize_amount(self.max_salary),
+            self.is_remote,
+            sorted(self.locations or []),
+            normalize_text(self.company_name),
+        ]
+        return hashlib.blake2b(json.dumps(data).encode(), digest_size=16).hexdigest()
+
+    @property
+    def tagging_hash(self) -> str:
+        """
+        Digest of the content the tags are extracted from, normalized so
+        that a repost or a cross-post of the same job has the same one.
+        """
+        data = [
+            " ".join(self.title.lower().split()),
+            clean_description(self.description).lower(),
+        ]
+        return hashlib.blake2b(json.dumps(data).encode(), digest_size=16).hexdigest()
+
+
+def memoize_accessor(method):
+    """
+    Cache the result of an accessor on the parser, so that it runs
+    at most once per item with the same arguments.
+
+    Calls with unhashable arguments are not cached.
+    """
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (method.__qualname__, args, tuple(sorted(kwargs.items())))
+        cache = self.__dict__.setdefault("_accessor_cache", {})
+        try:
+            return cache[key]
+        except KeyError:
+            pass
+        except TypeError:
+            return method(self, *args, **kwargs)
+
+        result = cache[key] = method(self, *args, **kwargs)
+        return result
+
+    wrapper.is_memoized = True
+    return wrapper
+
 
 class JobParser:
+    # bump it when a fix changes what the parser extracts,
+    # so that the stored jobs are reparsed with `job-board reparse`.
+    parser_version: int = 1
+
     def __init__(self, *, item: object, api_data_format):
         self.item = item
         self.api_data_format = api_data_format
 
+    @classmethod
+    def from_payload(
+        cls, payload: str, *, api_data_format: str, extra_info: str | None = None
+    ) -> "JobParser":
+        """
+        Build the parser back from a stored payload, the stored extra info
+        is used instead of fetching the detail page again.
+        """
+        match api_data_format:
+            case "json":
+                item = json.loads(payload)
+            case "xml":
+                item = objectify.fromstring(payload)
+            case _:
+                raise ValueError(f"Unsupported data format: {api_data_format}")
+
+        parser = cls(item=item, api_data_format=api_data_format)
+        # set the cached property, so that nothing is fetched.
+        parser.__dict__["extra_info"] = extra_info and html.fromstring(extra_info)
+        return parser
+
+    @classmethod
+    def __init_subclass__(cls, *args, **kwargs):
+        super().__init_subclass__(*args, **kwargs)
+        # the same parser is used to filter and to extract an item,
+        # so the accessors shouldn't do the same work again.
+        for name, attribute in list(vars(cls).items()):
+            if (
+                name.startswith("get_")
+                and name != "get_job"
+                and callable(attribute)
+                and not isinstance(attribute, (staticmethod, classmethod))
+                and not getattr(attribute, "is_memoized", False)
+            ):
+                setattr(cls, name, memoize_accessor(attribute))
+
     @cached_property
     def extra_info(self) -> html.HtmlElement | None:
         return self.get_extra_info()
@@ -176,11 +288,13 @@ class JobParser:
             posted_on=posted_on,
             min_salary=min_salary.amount,
             max_salary=max_salary.amount,
+            salary_currency=min_salary.currency or max_salary.currency,
             is_remote=is_remote,
             locations=locations,
             payload=payload,
             extra_info=extra_info,
             company_name=company_name,
+            parser_version=self.parser_version,
         )
 
     def validate_recency(self, cutoff_date: datetime | None = None) -> bool:
@@ -279,20 +393,7 @@ class JobParser:
             min_salary = salary_range.min_salary
             max_salary = salary_range.max_salary
 
-        return SalaryRange(
-            min_salary=Money(
-                currency=config.DEFAULT_CURRENCY,
-                amount=self.get_amount_in_default_currency(
-                    min_salary.amount, min_salary.currency
-                ),
-            ),
-            max_salary=Money(
-                currency=config.DEFAULT_CURRENCY,
-                amount=self.get_amount_in_default_currency(
-                    max_salary.amount, max_salary.currency
-                ),
-            ),
-        )
+        return SalaryRange(min_salary=min_salary, max_salary=max_salary)
 
     def extract_salary_range(self, compensation: str | None) -> SalaryRange:
         compensation = compensation or ""
@@ -396,27 +497,6 @@ class JobParser:
             currency = get_currency_from_symbol(symbol)
         return currency
 
-    def get_amount_in_default_currency(
-        self, amount: Decimal | None, currency=None
-    ) -> Decimal:
-        if not amount:
-            return None
-
-        currency = currency or self.get_currency()
-        exchange_rate = get_exchange_rate(
-            from_currency=currency,
-            to_currency=config.DEFAULT_CURRENCY,
-            exchange_date=self.get_posted_on(),
-        )
-        link = self.get_link()
-        if not exchange_rate:
-            logger.warning(f"No exchange rate found for {currency=}, {link=}")
-            exchange_rate = Decimal("1")
-
-        amount = (amount / exchange_rate).quantize(Decimal("0.01"))
-
-        return amount
-
     @classmethod
     def parse_locations_from_json_ld(
         cls, document: None | html.HtmlElement
@@ -465,26 +545,25 @@ class JobParser:
         return STRING_LITERAL_REGEX.sub(escape_newlines, text)
 
 
-@retry_on_http_errors(max_attempts=10, max_wait=5)
-def extract_job_tags_using_llm(jobs: list[Job]) -> list[Job]:
-    class JobTags(BaseModel):
-        link: str
-        tags: list[str]
+class JobTags(BaseModel):
+    link: str
+    tags: list[str]
+
 
-    class JobsTags(BaseModel):
-        jobs: list[JobTags]
+class JobsTags(BaseModel):
+    jobs: list[JobTags]
 
-    job_data = [job.model_dump() for job in jobs]
-    if not job_data:
-        return []
 
+def build_job_tags_request(jobs: list[Job]) -> dict:
+    """Build the body of the OpenAI request that tags the jobs."""
+    job_data = [get_job_tagging_data(job) for job in jobs]
     input_links = [job.link for job in jobs]
     job_data_length = len(job_data)
     prompt = f"""
 You are a job analysis system. You MUST process EXACTLY {job_data_length} job postings and return EXACTLY {job_data_length} results.
 
 INPUT JOBS TO ANALYZE:
-{json.dumps(job_data, indent=2)}
+{dump_compact_json(job_data)}
 
 CRITICAL REQUIREMENTS:
 1. Process ALL {job_data_length} jobs - missing even one job is a FAILURE
@@ -524,28 +603,64 @@ CRITICAL REQUIREMENTS:
         },
         "temperature": 0,
     }
+    return data
 
-    with http_client() as client:
-        # https://platform.openai.com/docs/guides/structured-outputs?api-mode=responses&lang=curl&example=structured-data#examples  # noqa: E501
-        response = client.post(
-            OPENAI_RESPONSES_API_URL,
-            timeout=httpx.Timeout(
-                config.DEFAULT_HTTP_TIMEOUT, read=config.OPENAI_READ_TIMEOUT
-            ),
-            headers={
-                "Authorization": f"Bearer {config.OPENAI_API_KEY}",
-            },
-            json=data,
-        )
 
-    result = response.json()
+def get_job_tagging_data(job: Job) -> dict:
+    """Only the fields the tags are extracted from, the rest is just noise."""
+    return {
+        "link": job.link,
+        "title": job.title,
+        "description": clean_description(
+            job.description, max_length=config.OPENAI_TAGGING_DESCRIPTION_LENGTH
+        ),
+    }
+
+
+def clean_description(description: str | None, *, max_length: int | None = None) -> str:
+    """
+    Strip the markup and the extra whitespace off the description and
+    cut it down to `max_length` characters, at a word boundary.
+    """
+    if not description:
+        return ""
+
+    if "<" in description:
+        with contextlib.suppress(etree.ParserError):
+            description = html.fromstring(description).text_content()
+
+    description = " ".join(description.split())
+    if max_length is not None and len(description) > max_length:
+        description = description[:max_length].rsplit(" ", 1)[0]
+    return description
+
+
+def dump_compact_json(data: Any) -> str:
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+def get_openai_headers() -> dict[str, str]:
+    return {"Authorization": f"Bearer {config.OPENAI_API_KEY}"}
+
+
+def parse_job_tags_response(jobs: list[Job], result: dict) -> list[Job]:
+    """
+    Map the tags in the OpenAI response back to the jobs they were asked for.
+
+    The links the model made up or repeated are skipped, so the jobs
+    it dropped are simply missing from the result.
+    """
     logger.debug(f"OpenAI response ID: {result['id']}")
     text = json.loads(result["output"][0]["content"][0]["text"])
     job_link_map = {j.link: j for j in jobs}
 
     job_with_tags = []
     for job in text["jobs"]:
-        job_without_tag = job_link_map[job["link"]]
+        job_without_tag = job_link_map.pop(job["link"], None)
+        if job_without_tag is None:
+            logger.warning(f"Skipping the tags of an unexpected link {job['link']}")
+            continue
+
         job_with_tags.append(
             job_without_tag.model_copy(
                 update={"tags": job["tags"]},
@@ -1,16 +1,18 @@
 from datetime import datetime
 from datetime import timezone
+from email.utils import parsedate_to_datetime
 
 from lxml import html
 from lxml import objectify
 
+from job_board import config
 from job_board.portals.base import BasePortal
 from job_board.portals.parser import Job
 from job_board.portals.parser import JobParser
 from job_board.portals.parser import Money
 from job_board.portals.parser import SalaryRange
 from job_board.utils import get_iso2
-from job_board.utils import http_client
+from job_board.utils import http_clients
 
 
 class Parser(JobParser):
@@ -49,12 +51,16 @@ class Parser(JobParser):
 
     def get_extra_info(self) -> html.HtmlElement:
         link = self.get_link()
-        with http_client() as client:
-            response = client.get(link)
+        response = http_clients.client(link).get(link)
 
         return html.fromstring(response.content)
 
     def get_posted_on(self):
+        # the feed doesn't always have the date, the
+        # detail page is fetched only when it doesn't.
+        if (pub_date := self.item.find("pubDate")) is not None:
+            return parsedate_to_datetime(pub_date.text).astimezone(timezone.utc)
+
         detail_page = self.extra_info
         try:
             (time_tag,) = detail_page.cssselect("time[datetime]")
@@ -108,11 +114,11 @@ class PythonDotOrg(BasePortal):
     url = f"{base_url}/jobs/feed/rss/"
     api_data_format = "xml"
     parser_class = Parser
+    detail_page_concurrency = config.PYTHON_DOT_ORG_DETAIL_PAGE_CONCURRENCY
+    posted_on_from_detail_page = True
 
     def make_request(self):
-        with http_client() as client:
-            response = client.get(self.url)
-
+        response = http_clients.client(self.url).get(self.url)
         return objectify.fromstring(response.content)
 
     def get_items(self, data) -> list[Job]:
@@ -58,6 +58,7 @@ class Remotive(BasePortal):
     url = "https://remotive.com/api/remote-jobs?category=software-dev&limit=500"
     api_data_format = "json"
     parser_class = Parser
+    refreshes_known_jobs = True
 
     def make_request(self):
         with http_client() as client:
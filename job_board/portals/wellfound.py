@@ -3,6 +3,8 @@ import json
 from datetime import datetime
 from datetime import timezone
 from typing import Any
+from typing import AsyncIterator
+from typing import Iterator
 
 from lxml import html
 
@@ -10,8 +12,9 @@ from job_board import config
 from job_board.logger import logger
 from job_board.portals.base import BasePortal
 from job_board.portals.parser import JobParser
-from job_board.utils import make_async_scrapfly_request
-from job_board.utils import make_scrapfly_request
+from job_board.utils import http_clients
+from job_board.utils import make_async_escalating_scrapfly_request
+from job_board.utils import make_escalating_scrapfly_request
 from job_board.utils import retry_on_http_errors
 from job_board.utils import ScrapflyError
 
@@ -34,7 +37,9 @@ class Parser(JobParser):
     def _get_extra_info(self):
         link = self.get_link()
         try:
-            return make_scrapfly_request(link, asp=True)
+            return make_escalating_scrapfly_request(
+                link, page_type="detail", default_params={"asp": True}, use_cache=True
+            )
         except ScrapflyError as exception:
             if exception.response.status_code != 410:
                 raise
@@ -92,22 +97,25 @@ class Wellfound(BasePortal):
     # so we will treat it as JSON for our purposes.
     api_data_format = "json"
     parser_class = Parser
+    detail_page_concurrency = config.WELLFOUND_DETAIL_PAGE_CONCURRENCY
 
-    def make_request(self) -> list[dict[str, Any]]:
-        return asyncio.run(self._fetch_all_pages())
+    def iter_pages(self) -> Iterator[dict[str, Any]]:
+        return http_clients.iterate(self._iter_pages())
 
-    async def _fetch_all_pages(self) -> list[dict[str, Any]]:
+    async def _iter_pages(self) -> AsyncIterator[dict[str, Any]]:
+        # a failed run resumes from the page after the last stored one.
+        first_page = (self.checkpoint or {}).get("page", 0) + 1
         # First, get the first page to determine total pages
-        first_page_url = f"{self.url}?page=1"
+        first_page_url = f"{self.url}?page={first_page}"
         first_page_content = await self._make_request(first_page_url)
         graph_data = self._parse_page_content(first_page_content)
         total_pages = self._get_total_pages(graph_data)
-        logger.info(f"[Wellfound]: Fetched page=1, found {total_pages=}")
+        logger.info(f"[Wellfound]: Fetched page={first_page}, found {total_pages=}")
 
-        jobs_data = [graph_data]  # Start with first page data
-        current_page = (
-            2  # Start from the second page since the first is already fetched
-        )
+        self.page_checkpoint = {"page": first_page}
+        yield graph_data
+        # Start from the next page since the first one is already fetched
+        current_page = first_page + 1
         while current_page <= total_pages:
             # Process remaining pages in batches
             batch_end = min(
@@ -137,13 +145,12 @@ class Wellfound(BasePortal):
             for page_num, result in zip(batch_pages, task_results, strict=True):
                 graph_data = self._parse_page_content(result)
                 total_pages = self._get_total_pages(graph_data)
-                jobs_data.append(graph_data)
                 logger.info(f"[Wellfound]: Processed page {page_num}")
+                self.page_checkpoint = {"page": page_num}
+                yield graph_data
 
             current_page = batch_end + 1  # Move to the next batch
 
-        return jobs_data
-
     @retry_on_http_errors(
         additional_status_codes=[403, 422],
         max_attempts=10,
@@ -152,7 +159,9 @@ class Wellfound(BasePortal):
         max_wait=30,
     )
     async def _make_request(self, url: str) -> str:
-        return await make_async_scrapfly_request(url, asp=True)
+        return await make_async_escalating_scrapfly_request(
+            url, page_type="listing", default_params={"asp": True}
+        )
 
     def _parse_page_content(self, content: str) -> dict[str, Any]:
         element = html.fromstring(content)
@@ -167,15 +176,10 @@ class Wellfound(BasePortal):
                 return value["pageCount"]
         return 1
 
-    def get_items(self, jobs_data) -> list:
-        # data is a list of data from all pages.
-        # we need to extract the job data from each page.
-        items = []
-        for job_data in jobs_data:
-            job_results = [
-                value
-                for key, value in job_data.items()
-                if key.startswith("JobListingSearchResult:")
-            ]
-            items.extend(job_results)
-        return items
+    def get_items(self, graph_data) -> list:
+        # the job data of a page is keyed by the search results.
+        return [
+            value
+            for key, value in graph_data.items()
+            if key.startswith("JobListingSearchResult:")
+        ]
@@ -12,7 +12,7 @@ from job_board.portals.parser import Money
 from job_board.portals.parser import SALARY_AMOUNT_REGEX
 from job_board.portals.parser import SALARY_RANGE_REGEX
 from job_board.portals.parser import SalaryRange
-from job_board.utils import make_scrapfly_request
+from job_board.utils import make_escalating_scrapfly_request
 from job_board.utils import retry_on_http_errors
 
 # matches "$100,000 or more USD", "100,000 or more", "$100k+", "₹15L or more" etc.
@@ -49,7 +49,9 @@ class Parser(JobParser):
     )
     def _get_extra_info(self):
         link = self.get_link()
-        return make_scrapfly_request(link, timeout=100)
+        return make_escalating_scrapfly_request(
+            link, page_type="detail", timeout=100, use_cache=True
+        )
 
     def get_salary_range(self) -> SalaryRange:
         root = self.extra_info
@@ -93,22 +95,7 @@ class Parser(JobParser):
             if min_salary.amount is None and max_salary.amount is None:
                 continue
 
-            min_amount_in_default_currency = self.get_amount_in_default_currency(
-                amount=min_salary.amount, currency=min_salary.currency
-            )
-            max_amount_in_default_currency = self.get_amount_in_default_currency(
-                amount=max_salary.amount, currency=max_salary.currency
-            )
-            return SalaryRange(
-                min_salary=Money(
-                    currency=config.DEFAULT_CURRENCY,
-                    amount=min_amount_in_default_currency,
-                ),
-                max_salary=Money(
-                    currency=config.DEFAULT_CURRENCY,
-                    amount=max_amount_in_default_currency,
-                ),
-            )
+            return SalaryRange(min_salary=min_salary, max_salary=max_salary)
 
         return SalaryRange(
             min_salary=Money(currency=None, amount=None),
@@ -153,10 +140,13 @@ class WeWorkRemotely(BasePortal):
     url = "https://weworkremotely.com/categories/remote-programming-jobs.rss"
     api_data_format = "xml"
     parser_class = Parser
+    detail_page_concurrency = config.WEWORKREMOTELY_DETAIL_PAGE_CONCURRENCY
 
     @retry_on_http_errors()
     def make_request(self) -> str:
-        return make_scrapfly_request(self.url, timeout=100)
+        return make_escalating_scrapfly_request(
+            self.url, page_type="listing", timeout=100
+        )
 
     def get_items(self, response: bytes) -> list[objectify.ObjectifiedElement]:
         root = objectify.fromstring(response.encode())
@@ -0,0 +1,88 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import sqlalchemy as sa
+
+from job_board.connection import get_session
+from job_board.exchange_rates import convert_salaries
+from job_board.logger import logger
+from job_board.models import Job
+from job_board.models import Payload
+from job_board.models import store_jobs
+from job_board.portals import PORTALS
+from job_board.portals.parser import Job as JobListing
+
+
+@dataclass
+class ReparseStats:
+    reparsed: int = 0
+    failed: int = 0
+
+
+def reparse_jobs(
+    portals: list[str], *, workers: int | None = None, batch_size: int
+) -> ReparseStats:
+    """
+    Run the current parsers again on the stored payloads of the jobs that
+    were extracted by an older parser version, without fetching anything.
+
+    The payloads are streamed with a server-side cursor and parsed in a
+    process pool, the jobs are stored back batch by batch.
+    """
+    stats = ReparseStats()
+    # the workers are spawned rather than forked, so that they
+    # don't inherit the database connections of this process.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        for portal_name in portals:
+            portal_class = PORTALS[portal_name]
+            parser_version = portal_class.parser_class.parser_version
+            query = (
+                sa.select(Payload)
+                .join(Job, sa.func.lower(Job.link) == sa.func.lower(Payload.link))
+                .where(
+                    Job.link.startswith(portal_class.base_url),
+                    sa.or_(
+                        Job.parser_version.is_(None),
+                        Job.parser_version < parser_version,
+                    ),
+                )
+                .execution_options(yield_per=batch_size)
+            )
+            with get_session(readonly=True) as session:
+                for payloads in session.execute(query).scalars().partitions():
+                    tasks = [
+                        (portal_name, payload.get_payload(), payload.get_extra_info())
+                        for payload in payloads
+                    ]
+                    jobs = list(executor.map(_reparse_payload, tasks))
+                    stats.failed += jobs.count(None)
+                    jobs = [job for job in jobs if job is not None]
+                    # the payloads are already stored, only the jobs change.
+                    store_jobs(convert_salaries(jobs), with_payloads=False)
+                    stats.reparsed += len(jobs)
+                    logger.info(
+                        f"[{portal_class.display_name}]: Reparsed {len(jobs)} jobs "
+                        f"with {parser_version=}"
+                    )
+
+    return stats
+
+
+def _reparse_payload(task: tuple[str, str, str | None]) -> JobListing | None:
+    portal_name, payload, extra_info = task
+    portal_class = PORTALS[portal_name]
+    try:
+        parser = portal_class.parser_class.from_payload(
+            payload,
+            api_data_format=portal_class.api_data_format,
+            extra_info=extra_info,
+        )
+        job = parser.get_job()
+    except Exception:
+        logger.exception(f"[{portal_class.display_name}]: Failed to reparse payload")
+        return None
+
+    # the payloads are not sent back, they are already stored.
+    return job.model_copy(update={"payload": None, "extra_info": None})
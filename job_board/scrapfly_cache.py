@@ -0,0 +1,212 @@
+import gzip
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from job_board import config
+from job_board.logger import logger
+
+# params that don't change the content of the page,
+# the tiers(asp, render_js) only change how it is scraped.
+IGNORED_PARAMS = frozenset({"key", "debug", "asp", "render_js"})
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    credits_saved: int = 0
+
+
+class ScrapflyCache:
+    """
+    On-disk cache for the pages scraped through Scrapfly.
+
+    Every page is stored as a gzip file named after a digest of the
+    url and the request params, along with an sqlite index that keeps
+    track of when it was stored and how many credits it cost.
+    The index also keeps the Scrapfly tier that got through for each
+    host and page type, for as long as the pages.
+    A TTL of 0 disables the cache.
+    """
+
+    def __init__(self, directory: Path | str, ttl: int):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._connection: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def get(self, params: dict[str, Any]) -> str | None:
+        if not self.enabled:
+            return None
+
+        key = self._get_key(params)
+        with self._lock:
+            row = (
+                self._get_connection()
+                .execute(
+                    "SELECT path, created_at, cost FROM entries WHERE key = ?", (key,)
+                )
+                .fetchone()
+            )
+        if row is None or row[1] < time.time() - self.ttl:
+            self.stats.misses += 1
+            return None
+
+        path, _, cost = row
+        try:
+            content = gzip.decompress((self.directory / path).read_bytes())
+        except FileNotFoundError:
+            self.stats.misses += 1
+            return None
+
+        self.stats.hits += 1
+        self.stats.credits_saved += cost
+        logger.debug(f"[Scrapfly]: Cache hit for {params['url']}, {cost=}")
+        return content.decode()
+
+    def set(self, params: dict[str, Any], content: str, *, cost: int = 0) -> None:
+        if not self.enabled:
+            return
+
+        key = self._get_key(params)
+        path = Path(key[:2]) / f"{key}.gz"
+        file_path = self.directory / path
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        # write to a temporary file first, so that a crash
+        # doesn't leave a partially written page behind.
+        temp_path = file_path.with_suffix(f".{threading.get_ident()}.tmp")
+        temp_path.write_bytes(gzip.compress(content.encode()))
+        temp_path.replace(file_path)
+
+        with self._lock:
+            connection = self._get_connection()
+            connection.execute(
+                "INSERT OR REPLACE INTO entries "
+                "(key, url, path, created_at, size, cost) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    params["url"],
+                    str(path),
+                    time.time(),
+                    file_path.stat().st_size,
+                    cost,
+                ),
+            )
+            connection.commit()
+
+    def get_tier(self, host: str, page_type: str) -> int | None:
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            row = (
+                self._get_connection()
+                .execute(
+                    "SELECT tier FROM tiers WHERE host = ? AND page_type = ? "
+                    "AND updated_at >= ?",
+                    (host, page_type, time.time() - self.ttl),
+                )
+                .fetchone()
+            )
+        return row[0] if row else None
+
+    def set_tier(self, host: str, page_type: str, tier: int) -> None:
+        if not self.enabled:
+            return
+
+        with self._lock:
+            connection = self._get_connection()
+            connection.execute(
+                "INSERT OR REPLACE INTO tiers (host, page_type, tier, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (host, page_type, tier, time.time()),
+            )
+            connection.commit()
+
+    def prune(self) -> int:
+        """Remove the expired pages, returns the number of pages removed."""
+        if not self.enabled or not (self.directory / "index.sqlite3").exists():
+            return 0
+
+        with self._lock:
+            connection = self._get_connection()
+            rows = connection.execute(
+                "SELECT key, path FROM entries WHERE created_at < ?",
+                (time.time() - self.ttl,),
+            ).fetchall()
+            for _, path in rows:
+                (self.directory / path).unlink(missing_ok=True)
+            connection.executemany(
+                "DELETE FROM entries WHERE key = ?", [(key,) for key, _ in rows]
+            )
+            # the cheaper tiers are tried again once a tier expires.
+            connection.execute(
+                "DELETE FROM tiers WHERE updated_at < ?", (time.time() - self.ttl,)
+            )
+            connection.commit()
+        return len(rows)
+
+    def log_stats(self) -> None:
+        if not self.enabled:
+            return
+
+        logger.info(
+            f"[Scrapfly]: cache hits={self.stats.hits}, "
+            f"misses={self.stats.misses}, "
+            f"credits saved={self.stats.credits_saved}"
+        )
+
+    def close(self) -> None:
+        """Close the index and reset the stats, ends a run."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+            self.stats = CacheStats()
+
+    @staticmethod
+    def _get_key(params: dict[str, Any]) -> str:
+        relevant_params = {
+            name: value for name, value in params.items() if name not in IGNORED_PARAMS
+        }
+        data = json.dumps(relevant_params, sort_keys=True, default=str)
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(
+                self.directory / "index.sqlite3",
+                # access is serialized with the lock.
+                check_same_thread=False,
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, url TEXT NOT NULL, path TEXT NOT NULL, "
+                "created_at REAL NOT NULL, size INTEGER NOT NULL, "
+                "cost INTEGER NOT NULL DEFAULT 0)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS tiers ("
+                "host TEXT NOT NULL, page_type TEXT NOT NULL, "
+                "tier INTEGER NOT NULL, updated_at REAL NOT NULL, "
+                "PRIMARY KEY (host, page_type))"
+            )
+        return self._connection
+
+
+scrapfly_cache = ScrapflyCache(
+    directory=config.SCRAPFLY_CACHE_DIR,
+    ttl=config.SCRAPFLY_CACHE_TTL,
+)
@@ -0,0 +1,342 @@
+import re
+import threading
+import time
+from collections.abc import Collection
+from collections.abc import Iterable
+from collections.abc import Mapping
+
+import sqlalchemy as sa
+
+from job_board import config
+from job_board.connection import get_session
+from job_board.logger import logger
+from job_board.models import JobTag
+from job_board.models import Tag
+from job_board.portals.parser import clean_description
+from job_board.portals.parser import Job as JobListing
+from job_board.portals.parser import STANDARD_TAGS_MAPPING
+
+NON_TECH_TAG = "non-tech"
+# most tags given to a job, same as asked from the LLM.
+MAX_TAGS = 5
+TOKEN_REGEX = re.compile(r"[a-z0-9.+#]+")
+
+# tags that are known without having been seen in the tag table.
+TECH_VOCABULARY = frozenset(
+    {
+        ".net",
+        "airflow",
+        "android",
+        "angular",
+        "ansible",
+        "asp.net",
+        "aws",
+        "azure",
+        "bash",
+        "bigquery",
+        "c#",
+        "c++",
+        "cassandra",
+        "ci/cd",
+        "clojure",
+        "computer vision",
+        "css",
+        "dbt",
+        "deep learning",
+        "django",
+        "docker",
+        "dynamodb",
+        "elasticsearch",
+        "elixir",
+        "fastapi",
+        "flask",
+        "flutter",
+        "gcp",
+        "git",
+        "graphql",
+        "grpc",
+        "hadoop",
+        "haskell",
+        "html",
+        "ios",
+        "java",
+        "javascript",
+        "jenkins",
+        "jquery",
+        "kafka",
+        "kotlin",
+        "kubernetes",
+        "laravel",
+        "linux",
+        "llm",
+        "machine learning",
+        "mongodb",
+        "mysql",
+        "next.js",
+        "nlp",
+        "node.js",
+        "numpy",
+        "objective-c",
+        "pandas",
+        "php",
+        "postgresql",
+        "pyspark",
+        "python",
+        "pytorch",
+        "rabbitmq",
+        "react",
+        "react native",
+        "redis",
+        "ruby",
+        "ruby on rails",
+        "scala",
+        "scikit-learn",
+        "snowflake",
+        "spark",
+        "sql",
+        "svelte",
+        "tailwind",
+        "tensorflow",
+        "terraform",
+        "typescript",
+        "vue",
+        "webpack",
+    }
+)
+# spellings of the tags, on top of `STANDARD_TAGS_MAPPING`.
+TAG_ALIASES = {
+    "golang": "go",
+    "k8s": "kubernetes",
+    "postgres": "postgresql",
+    "rails": "ruby on rails",
+    "vue.js": "vue",
+    "vuejs": "vue",
+    "nextjs": "next.js",
+    "amazon web services": "aws",
+    "google cloud": "gcp",
+    "apache kafka": "kafka",
+    "apache spark": "spark",
+}
+# tags that are common words too, they are only trusted in the title.
+AMBIGUOUS_TAGS = frozenset(
+    {"go", "r", "c", "swift", "rust", "dart", "julia", "spring", "express", "less"}
+)
+TECH_TITLE_WORDS = frozenset(
+    {
+        "ai",
+        "analyst",
+        "architect",
+        "backend",
+        "cloud",
+        "data",
+        "developer",
+        "devops",
+        "engineer",
+        "engineering",
+        "frontend",
+        "infrastructure",
+        "it",
+        "ml",
+        "platform",
+        "programmer",
+        "qa",
+        "scientist",
+        "sdet",
+        "security",
+        "software",
+        "sre",
+        "technical",
+    }
+)
+NON_TECH_TITLE_WORDS = frozenset(
+    {
+        "account",
+        "accountant",
+        "accounting",
+        "administrative",
+        "assistant",
+        "bookkeeper",
+        "brand",
+        "copywriter",
+        "counsel",
+        "customer",
+        "finance",
+        "financial",
+        "hr",
+        "legal",
+        "marketing",
+        "office",
+        "paralegal",
+        "partnerships",
+        "people",
+        "recruiter",
+        "recruiting",
+        "recruitment",
+        "sales",
+        "talent",
+        "writer",
+    }
+)
+
+
+def tokenize(text: str) -> list[str]:
+    # a trailing dot ends a sentence, a leading one is part of names like .net
+    tokens = (token.rstrip(".") for token in TOKEN_REGEX.findall(text.lower()))
+    return [token for token in tokens if token]
+
+
+class TagMatcher:
+    """
+    Finds the tags in a text, with a trie over the tokens of the phrases,
+    so that a text is matched in a single pass, however large the
+    vocabulary is.
+
+    At every token, the longest phrase starting there is taken.
+    """
+
+    def __init__(self, phrases: Mapping[str, str]):
+        # the phrase and its tag are stored under the `None` key of its last node.
+        self._root: dict = {}
+        for phrase, tag in phrases.items():
+            node = self._root
+            for token in tokenize(phrase):
+                node = node.setdefault(token, {})
+            node[None] = (phrase, tag)
+
+    def find(self, text: str, *, ignored_phrases: Collection[str] = ()) -> list[str]:
+        """
+        The tags found in the text, in order, repeated as often as found.
+
+        The `ignored_phrases` are matched, but their tags are left out.
+        """
+        tokens = tokenize(text)
+        tags = []
+        index = 0
+        while index < len(tokens):
+            node = self._root
+            match = None
+            end = index
+            for position in range(index, len(tokens)):
+                node = node.get(tokens[position])
+                if node is None:
+                    break
+                if None in node:
+                    match, end = node[None], position
+            if match is None:
+                index += 1
+            else:
+                phrase, tag = match
+                if phrase not in ignored_phrases:
+                    tags.append(tag)
+                index = end + 1
+        return tags
+
+
+class TagExtractor:
+    """
+    Tags the jobs locally, without the LLM, when they are clearly
+    technical or clearly not, so that only the rest is sent to it.
+
+    The vocabulary is `TECH_VOCABULARY`, with the aliases, and the tags
+    already given to enough jobs. It is loaded from the tag table on
+    first use, and again once it is older than
+    `LOCAL_TAGGING_VOCABULARY_TTL`.
+    """
+
+    def __init__(self):
+        self._matcher: TagMatcher | None = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._matcher = None
+
+    def load(self) -> TagMatcher:
+        """Load the vocabulary again, along with the tags in the tag table."""
+        statement = (
+            sa.select(Tag.name)
+            .join(JobTag, JobTag.tag_id == Tag.id)
+            .where(sa.func.lower(Tag.name) != NON_TECH_TAG)
+            .group_by(Tag.name)
+            .having(sa.func.count() >= config.LOCAL_TAGGING_MIN_TAG_JOBS)
+        )
+        with get_session(readonly=True) as session:
+            names = session.execute(statement).scalars().all()
+
+        matcher = TagMatcher(get_phrases(names))
+        with self._lock:
+            self._matcher = matcher
+            self._loaded_at = time.monotonic()
+        logger.info(f"Loaded the local tag vocabulary, with {len(names)} stored tags")
+        return matcher
+
+    def extract(self, job: JobListing) -> list[str] | None:
+        """
+        The tags of the job, `["non-tech"]` for a clearly non-technical
+        job, None when the job isn't clear enough to be tagged locally.
+        """
+        matcher = self._matcher
+        expired = (
+            time.monotonic() - self._loaded_at > config.LOCAL_TAGGING_VOCABULARY_TTL
+        )
+        if matcher is None or expired:
+            matcher = self.load()
+        title_tags = matcher.find(job.title)
+        # the phrase that matched is checked rather than its tag, so that
+        # "golang" is trusted even though its tag, "go", is a common word.
+        description_tags = matcher.find(
+            clean_description(job.description), ignored_phrases=AMBIGUOUS_TAGS
+        )
+        if is_non_tech_title(job.title):
+            # a sales or recruiting job at a tech company mentions its stack
+            # too, so such a job is left to the LLM.
+            if len(set(description_tags)) < 2:
+                return [NON_TECH_TAG]
+            return None
+
+        # the tags in the title come first, then the most mentioned ones.
+        counts = {tag: 0 for tag in title_tags}
+        for tag in description_tags:
+            counts[tag] = counts.get(tag, 0) + 1
+        tags = sorted(
+            counts,
+            key=lambda tag: (tag not in title_tags, -counts[tag]),
+        )[:MAX_TAGS]
+        if len(tags) < config.LOCAL_TAGGING_MIN_TAGS:
+            return None
+        return tags
+
+    def fill_tags(self, jobs: Iterable[JobListing]) -> list[JobListing]:
+        """Tag the jobs that came without tags, where it is clear enough."""
+        filled = []
+        tagged = 0
+        for job in jobs:
+            if not job.tags and (tags := self.extract(job)) is not None:
+                job = job.model_copy(update={"tags": tags})
+                tagged += 1
+            filled.append(job)
+
+        if tagged:
+            logger.info(f"Tagged {tagged} of {len(filled)} jobs locally")
+        return filled
+
+
+def get_phrases(names: Iterable[str]) -> dict[str, str]:
+    """Map every phrase of the vocabulary to its tag."""
+    phrases = {tag: tag for tag in TECH_VOCABULARY | AMBIGUOUS_TAGS}
+    for name in names:
+        tag = name.strip().lower()
+        phrases.setdefault(tag, tag)
+    for aliases in (STANDARD_TAGS_MAPPING.lower_items(), TAG_ALIASES.items()):
+        for alias, tag in aliases:
+            phrases[alias.lower()] = tag
+    return phrases
+
+
+def is_non_tech_title(title: str) -> bool:
+    words = set(tokenize(title))
+    return bool(words & NON_TECH_TITLE_WORDS) and not words & TECH_TITLE_WORDS
+
+
+tag_extractor = TagExtractor()
@@ -0,0 +1,224 @@
+import asyncio
+import json
+from collections.abc import AsyncIterator
+from collections.abc import Iterable
+from collections.abc import Iterator
+from typing import NamedTuple
+
+import httpx
+
+from job_board import config
+from job_board.logger import logger
+from job_board.portals.parser import build_job_tags_request
+from job_board.portals.parser import dump_compact_json
+from job_board.portals.parser import get_job_tagging_data
+from job_board.portals.parser import get_openai_headers
+from job_board.portals.parser import Job as JobListing
+from job_board.portals.parser import OPENAI_RESPONSES_API_URL
+from job_board.portals.parser import OPENAI_TIMEOUT
+from job_board.portals.parser import parse_job_tags_response
+from job_board.utils import get_retry_after
+from job_board.utils import http_clients
+from job_board.utils import retry_on_http_errors
+from job_board.utils import TokenBucket
+
+# rough number of characters per token, for estimating the prompt size.
+CHARACTERS_PER_TOKEN = 4
+# tokens of the response per job, the link and up to 5 tags.
+OUTPUT_TOKENS_PER_JOB = 50
+
+
+class TaggingFailure(NamedTuple):
+    job: JobListing
+    error: str
+
+
+class TaggingEngine:
+    """
+    Tags the batches of jobs with the LLM concurrently, within the
+    rate limits of the OpenAI account.
+
+    Every request first takes one request and its estimated tokens out
+    of the token buckets, a rate limited response pauses the buckets for
+    as long as its `Retry-After` asks, so that the other requests in
+    flight back off too.
+
+    The tags the model did return are kept, while the jobs it dropped,
+    or whose batch it couldn't answer, are split in halves and sent
+    again, until a job that fails on its own is isolated, see `failures`.
+    """
+
+    def __init__(
+        self,
+        *,
+        concurrency: int = config.OPENAI_TAGGING_CONCURRENCY,
+        requests_per_minute: int = config.OPENAI_REQUESTS_PER_MINUTE,
+        tokens_per_minute: int = config.OPENAI_TOKENS_PER_MINUTE,
+    ):
+        self.concurrency = concurrency
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        # number of jobs that are left untagged.
+        self.failed = 0
+        # the jobs that failed even when sent on their own.
+        self.failures: list[TaggingFailure] = []
+
+    async def tag(
+        self, batches: Iterable[Iterable[JobListing]]
+    ) -> AsyncIterator[list[JobListing]]:
+        """
+        Yield the tagged jobs of every request as soon as it returns,
+        in the order they finish.
+
+        The batches that fail because of the service, even after the
+        retries, are logged and skipped, their jobs stay untagged until
+        the next run.
+        """
+        # the buckets are bound to the event loop running the tagging.
+        request_bucket = TokenBucket(self.requests_per_minute)
+        token_bucket = TokenBucket(self.tokens_per_minute)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def _tag(
+            batch: list[JobListing],
+        ) -> tuple[list[JobListing], list[list[JobListing]]]:
+            """Returns the tagged jobs, and the batches to send again."""
+            async with semaphore:
+                try:
+                    tagged = await self._tag_batch(
+                        batch, request_bucket=request_bucket, token_bucket=token_bucket
+                    )
+                except Exception as exc:
+                    if not is_content_error(exc):
+                        logger.exception(f"Failed to tag a batch of {len(batch)} jobs")
+                        self.failed += len(batch)
+                        return [], []
+
+                    logger.warning(
+                        f"Failed to tag a batch of {len(batch)} jobs: {exc!r}"
+                    )
+                    tagged, error = [], repr(exc)
+                else:
+                    error = "Missing from the response"
+
+            tagged_links = {job.link for job in tagged}
+            missing = [job for job in batch if job.link not in tagged_links]
+            if not missing:
+                return tagged, []
+
+            if len(batch) == 1:
+                self.failures.append(TaggingFailure(job=missing[0], error=error))
+                self.failed += 1
+                return tagged, []
+
+            logger.info(
+                f"Sending {len(missing)} jobs of a batch of {len(batch)} again, "
+                "in halves"
+            )
+            middle = (len(missing) + 1) // 2
+            return tagged, [
+                half for half in (missing[:middle], missing[middle:]) if half
+            ]
+
+        pending = {asyncio.create_task(_tag(list(batch))) for batch in batches}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    tagged, retries = task.result()
+                    pending.update(
+                        asyncio.create_task(_tag(batch)) for batch in retries
+                    )
+                    if tagged:
+                        yield tagged
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    @retry_on_http_errors(max_attempts=10, max_wait=5)
+    async def _tag_batch(
+        self,
+        jobs: list[JobListing],
+        *,
+        request_bucket: TokenBucket,
+        token_bucket: TokenBucket,
+    ) -> list[JobListing]:
+        data = build_job_tags_request(jobs)
+        await request_bucket.acquire()
+        await token_bucket.acquire(estimate_tokens(data, jobs=len(jobs)))
+
+        client = http_clients.async_client(OPENAI_RESPONSES_API_URL)
+        try:
+            response = await client.post(
+                OPENAI_RESPONSES_API_URL,
+                timeout=OPENAI_TIMEOUT,
+                headers=get_openai_headers(),
+                json=data,
+            )
+        except httpx.HTTPStatusError as exc:
+            if exc.response.status_code == 429:
+                retry_after = get_retry_after(exc.response)
+                if retry_after is not None:
+                    request_bucket.pause(retry_after)
+                    token_bucket.pause(retry_after)
+            raise
+
+        return parse_job_tags_response(jobs, response.json())
+
+
+def is_content_error(exception: Exception) -> bool:
+    """
+    Whether the request failed because of the jobs in it, rather than
+    the service, e.g. a prompt that is too long or an invalid response.
+    """
+    if isinstance(exception, httpx.HTTPStatusError):
+        return exception.response.status_code == 400
+    return not isinstance(exception, httpx.RequestError)
+
+
+def pack_batches(
+    jobs: Iterable[JobListing],
+    *,
+    token_budget: int = config.OPENAI_TAGGING_TOKEN_BUDGET,
+    max_jobs: int = config.BATCH_TAG_FILLING_SIZE,
+) -> Iterator[list[JobListing]]:
+    """
+    Pack the jobs, in order, into batches whose requests stay within
+    `token_budget` estimated tokens and `max_jobs` jobs, so that short
+    jobs share a request while a long one doesn't blow its context.
+
+    A job that doesn't fit the budget even on its own goes alone.
+    """
+    base_tokens = estimate_tokens(build_job_tags_request([]), jobs=0)
+    batch = []
+    batch_tokens = base_tokens
+    for job in jobs:
+        job_tokens = estimate_job_tokens(job)
+        if batch and (
+            batch_tokens + job_tokens > token_budget or len(batch) >= max_jobs
+        ):
+            yield batch
+            batch = []
+            batch_tokens = base_tokens
+
+        batch.append(job)
+        batch_tokens += job_tokens
+
+    if batch:
+        yield batch
+
+
+def estimate_job_tokens(job: JobListing) -> int:
+    """Estimate the tokens a job adds to a tagging request."""
+    # the link is repeated in the list of links the response must have.
+    characters = len(dump_compact_json(get_job_tagging_data(job))) + len(job.link)
+    return characters // CHARACTERS_PER_TOKEN + OUTPUT_TOKENS_PER_JOB
+
+
+def estimate_tokens(data: dict, *, jobs: int) -> int:
+    """Estimate the tokens a tagging request counts against the limit."""
+    prompt_tokens = len(json.dumps(data)) // CHARACTERS_PER_TOKEN
+    return prompt_tokens + jobs * OUTPUT_TOKENS_PER_JOB
@@ -1,11 +1,24 @@
+import asyncio
+import contextlib
+import contextvars
+import email.utils
 import pathlib
+import threading
+import time
+from collections import defaultdict
+from collections import deque
+from dataclasses import dataclass
+from datetime import date
 from datetime import datetime
 from datetime import timezone
 from decimal import Decimal
 from functools import lru_cache
 from functools import partial
 from typing import Any
+from typing import AsyncIterator
+from typing import Awaitable
 from typing import Callable
+from typing import Iterator
 from typing import NamedTuple
 from typing import Type
 
@@ -14,6 +27,7 @@ import httpx
 import pycountry
 import pydantic
 import sentry_sdk
+import sqlalchemy as sa
 from babel.numbers import get_currency_symbol
 from jinja2 import Environment
 from jinja2 import FileSystemLoader
@@ -25,6 +39,7 @@ from tenacity import wait_exponential
 
 from job_board import config
 from job_board.logger import logger
+from job_board.scrapfly_cache import scrapfly_cache
 
 EXCHANGE_RATE_API_URL = "https://cdn.jsdelivr.net/npm/@fawazahmed0/currency-api@{date}/v1/currencies/{currency}.json"
 EXCHANGE_RATE_FALLBACK_API_URL = (
@@ -64,6 +79,201 @@ async_http_client = partial(
 )
 
 
+@dataclass
+class ConnectionStats:
+    requests: int = 0
+    connections: int = 0
+
+    @property
+    def reused(self) -> int:
+        """Number of requests that were sent over an already open connection."""
+        return self.requests - self.connections
+
+
+class HTTPClientRegistry:
+    """
+    Keeps one long-lived pooled client per host, so that the connections
+    (and HTTP/2 multiplexing) are reused by all the requests of a run,
+    instead of paying for a new TCP + TLS handshake per request.
+
+    Async clients are bound to the event loop they were created in,
+    so they are kept per loop and closed along with it, see `run`.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients: dict[str, httpx.Client] = {}
+        self._async_clients: dict[
+            tuple[asyncio.AbstractEventLoop, str], httpx.AsyncClient
+        ] = {}
+        self.stats: dict[str, ConnectionStats] = defaultdict(ConnectionStats)
+
+    @staticmethod
+    def _get_limits() -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=config.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+        )
+
+    def client(self, url: str) -> httpx.Client:
+        host = httpx.URL(url).host
+        with self._lock:
+            client = self._clients.get(host)
+            if client is None or client.is_closed:
+                stats = self.stats[host]
+
+                def trace(event_name: str, info: dict) -> None:
+                    if event_name == "connection.connect_tcp.complete":
+                        stats.connections += 1
+
+                def request_hook(request: httpx.Request) -> None:
+                    stats.requests += 1
+                    request.extensions["trace"] = trace
+
+                client = http_client(
+                    limits=self._get_limits(),
+                    event_hooks={
+                        "request": [request_hook],
+                        "response": [response_hook],
+                    },
+                )
+                self._clients[host] = client
+        return client
+
+    def async_client(self, url: str) -> httpx.AsyncClient:
+        host = httpx.URL(url).host
+        key = (asyncio.get_running_loop(), host)
+        with self._lock:
+            client = self._async_clients.get(key)
+            if client is None or client.is_closed:
+                stats = self.stats[host]
+
+                async def trace(event_name: str, info: dict) -> None:
+                    if event_name == "connection.connect_tcp.complete":
+                        stats.connections += 1
+
+                async def request_hook(request: httpx.Request) -> None:
+                    stats.requests += 1
+                    request.extensions["trace"] = trace
+
+                client = async_http_client(
+                    limits=self._get_limits(),
+                    event_hooks={
+                        "request": [request_hook],
+                        "response": [async_response_hook],
+                    },
+                )
+                self._async_clients[key] = client
+        return client
+
+    def run(self, coroutine: Awaitable[Any]) -> Any:
+        """
+        Run the coroutine in a new event loop, closing the async clients
+        that were created in it once it finishes.
+        """
+
+        async def _run():
+            try:
+                return await coroutine
+            finally:
+                await self.aclose()
+
+        return asyncio.run(_run())
+
+    def iterate(self, iterator: AsyncIterator[Any]) -> Iterator[Any]:
+        """
+        Iterate over the async iterator from synchronous code, item by item,
+        in an event loop that lives as long as the iteration.
+        """
+        with asyncio.Runner() as runner:
+
+            async def _next():
+                return await anext(iterator)
+
+            try:
+                while True:
+                    try:
+                        yield runner.run(_next())
+                    except StopAsyncIteration:
+                        break
+            finally:
+                runner.run(iterator.aclose())
+                runner.run(self.aclose())
+
+    async def aclose(self) -> None:
+        """Close the async clients bound to the running event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            keys = [key for key in self._async_clients if key[0] is loop]
+            clients = [self._async_clients.pop(key) for key in keys]
+
+        for client in clients:
+            await client.aclose()
+
+    def close(self) -> None:
+        """Close all the sync clients and reset the stats, ends a run."""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+            self.stats.clear()
+
+        for client in clients:
+            client.close()
+
+    def log_stats(self) -> None:
+        for host, stats in self.stats.items():
+            logger.info(
+                f"[HTTP]: {host=}, requests={stats.requests}, "
+                f"connections={stats.connections}, reused={stats.reused}"
+            )
+
+
+http_clients = HTTPClientRegistry()
+
+
+class TokenBucket:
+    """
+    Lets `rate` units through per `period` seconds, in bursts of up to a
+    whole period's worth, the callers wait for the bucket to refill
+    otherwise, in the order they came in.
+
+    It is meant to be used from a single event loop.
+    """
+
+    def __init__(self, rate: float, *, period: float = 60):
+        self.capacity = rate
+        self.fill_rate = rate / period
+        self._level = rate
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: float = 1) -> None:
+        # more than the capacity would never fit, it waits for a full bucket.
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self._paused_until - now
+                if wait <= 0:
+                    if self._level >= amount:
+                        self._level -= amount
+                        return
+                    wait = (amount - self._level) / self.fill_rate
+                await asyncio.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Let nothing through for `seconds`, e.g. when asked by a `Retry-After`."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated_at
+        self._level = min(self.capacity, self._level + elapsed * self.fill_rate)
+        self._updated_at = now
+
+
 jinja_env = Environment(
     loader=FileSystemLoader(pathlib.Path(__file__).parent / "templates"),
 )
@@ -103,6 +313,24 @@ def _build_symbol_to_code_map(locale: str = config.DEFAULT_LOCALE) -> dict[str,
 
 
 SCRAPFLY_URL = "https://api.scrapfly.io/scrape"
+SCRAPFLY_BLOCKED_STATUS_CODES = frozenset({403, 422})
+# https://scrapfly.io/docs/scrape-api/errors
+SCRAPFLY_BLOCKED_ERROR_MARKERS = ("::ASP::", "ANTIBOT", "BLOCKED")
+# a challenge page is a block too, even though it comes with a 200.
+CHALLENGE_PAGE_MARKERS = (
+    "<title>Just a moment...</title>",
+    "<title>Attention Required! | Cloudflare</title>",
+    "cf_chl_opt",
+    "captcha-delivery.com",
+    "px-captcha",
+)
+# from the cheapest to the most expensive, each tier adds to the params
+# of the one before it.
+SCRAPFLY_TIERS = (
+    {},
+    {"render_js": True},
+    {"render_js": True, "asp": True},
+)
 
 
 class ScrapflyError(httpx.HTTPStatusError):
@@ -119,12 +347,21 @@ class ScrapflyError(httpx.HTTPStatusError):
         request: httpx.Request,
         response: httpx.Response,
         is_retryable: bool = False,
+        code: str | None = None,
     ):
         super().__init__(message=message, request=request, response=response)
         self.message = message
         self.request = request
         self.response = response
         self.is_retryable = is_retryable
+        self.code = code
+
+    @property
+    def is_blocked(self) -> bool:
+        """If the website blocked the request, a higher tier might get through."""
+        return self.response.status_code in SCRAPFLY_BLOCKED_STATUS_CODES or any(
+            marker in (self.code or "") for marker in SCRAPFLY_BLOCKED_ERROR_MARKERS
+        )
 
 
 def _raise_for_status(response: httpx.Response) -> None:
@@ -140,6 +377,17 @@ def _raise_for_status(response: httpx.Response) -> None:
     result = response.json()["result"]
     logger.debug(f"Scrapfly monitoring link: {result['log_url']}")
     if result["success"]:
+        if is_challenge_page(result["content"]):
+            actual_request = httpx.Request("GET", result["url"])
+            raise ScrapflyError(
+                message="The website returned a challenge page",
+                request=actual_request,
+                response=httpx.Response(
+                    status_code=403,
+                    request=actual_request,
+                    content=result["content"],
+                ),
+            )
         return
 
     status_code = result["status_code"]
@@ -157,17 +405,303 @@ def _raise_for_status(response: httpx.Response) -> None:
         request=actual_request,
         response=actual_response,
         is_retryable=error["retryable"],
+        code=error.get("code"),
     )
 
 
+def is_challenge_page(content: str) -> bool:
+    return any(marker in content for marker in CHALLENGE_PAGE_MARKERS)
+
+
+class ScrapflyBudgetExceeded(Exception):
+    """Raised when a run has spent its Scrapfly credit budget."""
+
+
+def is_budget_exceeded(exception: Exception) -> bool:
+    """Whether the exception, or all the ones of a group, is the spent budget."""
+    if isinstance(exception, ExceptionGroup):
+        _, rest = exception.split(ScrapflyBudgetExceeded)
+        return rest is None
+    return isinstance(exception, ScrapflyBudgetExceeded)
+
+
+@dataclass
+class ScrapflyRun:
+    """The requests made, and the credits spent, by a single run."""
+
+    # 0 means no budget.
+    credit_budget: int = 0
+    requests: int = 0
+    credits_spent: int = 0
+    # the estimated credits of the requests in flight.
+    credits_reserved: int = 0
+    # the most a request of the run has cost.
+    max_cost: int = 0
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+
+    def record(self, cost: int) -> None:
+        with self._lock:
+            self.requests += 1
+            self.credits_spent += cost
+            self.max_cost = max(self.max_cost, cost)
+
+    def check_budget(self) -> None:
+        with self._lock:
+            self._check_budget()
+
+    @contextlib.contextmanager
+    def reserve(self) -> Iterator[None]:
+        """
+        Reserve the estimated credits of a request while it is in flight,
+        so that the requests made at the same time don't overshoot the budget.
+        """
+        with self._lock:
+            self._check_budget()
+            estimate = self.max_cost or config.SCRAPFLY_REQUEST_COST_ESTIMATE
+            self.credits_reserved += estimate
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.credits_reserved -= estimate
+
+    def _check_budget(self) -> None:
+        credits = self.credits_spent + self.credits_reserved
+        if self.credit_budget and credits >= self.credit_budget:
+            raise ScrapflyBudgetExceeded(
+                f"Scrapfly credit budget of {self.credit_budget} is spent, "
+                f"credits spent: {self.credits_spent}, "
+                f"reserved: {self.credits_reserved}"
+            )
+
+    def log_stats(self) -> None:
+        logger.info(
+            f"[Scrapfly]: requests={self.requests}, "
+            f"credits spent={self.credits_spent}, budget={self.credit_budget or None}"
+        )
+
+
+# the run the current code belongs to, the threads of a run must
+# copy the context to see it, the event loops and tasks do so already.
+_scrapfly_run: contextvars.ContextVar[ScrapflyRun | None] = contextvars.ContextVar(
+    "scrapfly_run", default=None
+)
+
+
+class ScrapflyGateway:
+    """
+    All requests to Scrapfly go through here, so that the concurrency
+    allowed by the plan is respected across portals, threads and
+    event loops.
+
+    Optionally, the slots are also claimed with Postgres advisory locks,
+    so that more than one process(the scheduler and a manual run, say)
+    can share the same limit.
+    The credits spent are recorded from every response on the current
+    run, see `run`, and no more requests are made once its budget is spent.
+    """
+
+    # namespace for the advisory locks, the slot is the second key.
+    ADVISORY_LOCK_NAMESPACE = 5_325_617
+
+    def __init__(
+        self,
+        *,
+        max_concurrency: int,
+        credit_budget: int = 0,
+        use_advisory_locks: bool = False,
+    ):
+        self.max_concurrency = max_concurrency
+        # 0 means no budget.
+        self.credit_budget = credit_budget
+        self.use_advisory_locks = use_advisory_locks
+        self._available_slots = max_concurrency
+        # threads(events) and coroutines(futures) waiting for a slot,
+        # a released slot is handed over to the first one.
+        self._waiters: deque[
+            threading.Event | tuple[asyncio.AbstractEventLoop, asyncio.Future]
+        ] = deque()
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def slot(self) -> Iterator[None]:
+        self._check_budget()
+        with self._lock:
+            if self._available_slots and not self._waiters:
+                self._available_slots -= 1
+                event = None
+            else:
+                event = threading.Event()
+                self._waiters.append(event)
+        if event is not None:
+            event.wait()
+
+        connection = None
+        try:
+            # the budget might have been spent while waiting.
+            with self._reserve():
+                if self.use_advisory_locks:
+                    connection = self._acquire_advisory_lock()
+                yield
+        finally:
+            self._release(connection)
+
+    @contextlib.asynccontextmanager
+    async def async_slot(self) -> AsyncIterator[None]:
+        self._check_budget()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._available_slots and not self._waiters:
+                self._available_slots -= 1
+                waiter = None
+            else:
+                waiter = (loop, loop.create_future())
+                self._waiters.append(waiter)
+
+        if waiter is not None:
+            try:
+                await waiter[1]
+            except asyncio.CancelledError:
+                with self._lock:
+                    handed_over = waiter not in self._waiters
+                    if not handed_over:
+                        self._waiters.remove(waiter)
+                # a cancelled future passes the slot on by itself.
+                if handed_over and not waiter[1].cancelled():
+                    self._release_slot()
+                raise
+
+        connection = None
+        try:
+            with self._reserve():
+                if self.use_advisory_locks:
+                    connection = await asyncio.to_thread(self._acquire_advisory_lock)
+                yield
+        finally:
+            self._release(connection)
+
+    @contextlib.contextmanager
+    def run(self) -> Iterator[ScrapflyRun]:
+        """
+        Start a run with its own credit budget, the runs overlapping it
+        in other threads keep theirs.
+        """
+        run = ScrapflyRun(credit_budget=self.credit_budget)
+        token = _scrapfly_run.set(run)
+        try:
+            yield run
+        finally:
+            _scrapfly_run.reset(token)
+
+    def record(self, response: httpx.Response) -> None:
+        if (run := _scrapfly_run.get()) is not None:
+            run.record(get_scrapfly_cost(response))
+
+    def _check_budget(self) -> None:
+        if (run := _scrapfly_run.get()) is not None:
+            run.check_budget()
+
+    def _reserve(self) -> contextlib.AbstractContextManager:
+        if (run := _scrapfly_run.get()) is not None:
+            return run.reserve()
+        return contextlib.nullcontext()
+
+    def _release(self, connection: sa.Connection | None) -> None:
+        try:
+            if connection is not None:
+                # session locks outlive the transaction, so they
+                # are released before the connection is pooled.
+                with connection:
+                    connection.execute(
+                        sa.text("SELECT pg_advisory_unlock(:namespace, :slot)"),
+                        {
+                            "namespace": self.ADVISORY_LOCK_NAMESPACE,
+                            "slot": connection.info.pop("scrapfly_slot"),
+                        },
+                    )
+        finally:
+            self._release_slot()
+
+    def _release_slot(self) -> None:
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if isinstance(waiter, threading.Event):
+                    waiter.set()
+                    return
+
+                loop, future = waiter
+                try:
+                    loop.call_soon_threadsafe(self._hand_over, future)
+                except RuntimeError:
+                    # the event loop is already closed.
+                    continue
+                return
+
+            self._available_slots += 1
+
+    def _hand_over(self, future: asyncio.Future) -> None:
+        if future.done():
+            # cancelled while the slot was being handed over.
+            self._release_slot()
+        else:
+            future.set_result(None)
+
+    def _acquire_advisory_lock(self) -> sa.Connection:
+        from job_board.connection import get_engine
+
+        # the lock is held by the session, so the
+        # connection stays open until the request is done.
+        connection = (
+            get_engine().connect().execution_options(isolation_level="AUTOCOMMIT")
+        )
+        try:
+            while True:
+                for slot in range(self.max_concurrency):
+                    acquired = connection.execute(
+                        sa.text("SELECT pg_try_advisory_lock(:namespace, :slot)"),
+                        {"namespace": self.ADVISORY_LOCK_NAMESPACE, "slot": slot},
+                    ).scalar()
+                    if acquired:
+                        connection.info["scrapfly_slot"] = slot
+                        return connection
+
+                # every slot is taken by other processes.
+                time.sleep(config.SCRAPFLY_SLOT_POLL_INTERVAL)
+        except BaseException:
+            connection.close()
+            raise
+
+
+scrapfly_gateway = ScrapflyGateway(
+    max_concurrency=config.SCRAPFLY_MAX_CONCURRENCY,
+    credit_budget=config.SCRAPFLY_RUN_CREDIT_BUDGET,
+    use_advisory_locks=config.SCRAPFLY_ADVISORY_LOCKS,
+)
+
+
+def get_scrapfly_cost(response: httpx.Response) -> int:
+    return int(response.headers.get("X-Scrapfly-Api-Cost", 0))
+
+
 def make_scrapfly_request(
     url: str,
     *,
     timeout: int | None = None,
     asp=False,
+    use_cache=False,
     **kwargs: dict[str, Any],
 ) -> dict[str, Any]:
+    """
+    use_cache: Serve the page from the on-disk cache when it was scraped
+    recently, meant for pages that don't change often, like detail pages.
+    """
     params = _prepare_scrapfly_params(url, asp=asp, **kwargs)
+    if use_cache and (content := scrapfly_cache.get(params)) is not None:
+        return content
+
     if timeout is not None:
         _timeout = timeout
     elif asp:
@@ -176,15 +710,23 @@ def make_scrapfly_request(
     else:
         _timeout = config.DEFAULT_HTTP_TIMEOUT
 
-    with http_client(timeout=_timeout) as client:
+    client = http_clients.client(SCRAPFLY_URL)
+    with scrapfly_gateway.slot():
         # https://scrapfly.io/docs/scrape-api/getting-started#spec
         response = client.get(
             SCRAPFLY_URL,
+            timeout=_timeout,
             params=params,
         )
+        # recorded before the slot, and the credits it reserved, are released.
+        # Failed requests are charged too.
+        scrapfly_gateway.record(response)
     _raise_for_status(response)
 
-    return response.json()["result"]["content"]
+    content = response.json()["result"]["content"]
+    if use_cache:
+        scrapfly_cache.set(params, content, cost=get_scrapfly_cost(response))
+    return content
 
 
 async def make_async_scrapfly_request(
@@ -200,19 +742,129 @@ async def make_async_scrapfly_request(
     else:
         timeout = config.DEFAULT_HTTP_TIMEOUT
 
-    async with async_http_client(timeout=timeout) as client:
+    client = http_clients.async_client(SCRAPFLY_URL)
+    async with scrapfly_gateway.async_slot():
         # https://scrapfly.io/docs/scrape-api/getting-started#spec
         response = await client.get(
             SCRAPFLY_URL,
             timeout=timeout,
             params=params,
         )
-
+        # recorded before the slot, and the credits it reserved, are released.
+        # Failed requests are charged too.
+        scrapfly_gateway.record(response)
     _raise_for_status(response)
 
     return response.json()["result"]["content"]
 
 
+class ScrapflyTiers:
+    """
+    Remembers, per host and page type, the cheapest Scrapfly tier
+    that gets through, so later requests start from it.
+
+    The tiers are kept in the index of the Scrapfly cache too, so that
+    the later runs don't pay for the blocked cheaper tiers again.
+    """
+
+    def __init__(self):
+        self._tiers: dict[tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, url: str, page_type: str) -> int:
+        key = self._get_key(url, page_type)
+        with self._lock:
+            tier = self._tiers.get(key)
+        if tier is None:
+            tier = scrapfly_cache.get_tier(*key) or 0
+            with self._lock:
+                self._tiers.setdefault(key, tier)
+        return tier
+
+    def set(self, url: str, page_type: str, tier: int) -> None:
+        key = self._get_key(url, page_type)
+        with self._lock:
+            changed = self._tiers.get(key) != tier
+            self._tiers[key] = tier
+        if changed:
+            logger.info(f"[Scrapfly]: Using tier={tier} for {key}")
+            scrapfly_cache.set_tier(*key, tier)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tiers.clear()
+
+    @staticmethod
+    def _get_key(url: str, page_type: str) -> tuple[str, str]:
+        return httpx.URL(url).host, page_type
+
+
+scrapfly_tiers = ScrapflyTiers()
+
+
+def make_escalating_scrapfly_request(
+    url: str,
+    *,
+    page_type: str,
+    default_params: dict[str, Any] | None = None,
+    **kwargs: Any,
+) -> dict[str, Any]:
+    """
+    Make the request from the cheapest tier that worked for the
+    page type, moving up a tier only when the website blocks it.
+
+    With `SCRAPFLY_ASP_ESCALATION` off, the request is made once with
+    the `default_params` of the caller instead.
+    """
+    if not config.SCRAPFLY_ASP_ESCALATION:
+        return make_scrapfly_request(url, **{**kwargs, **(default_params or {})})
+
+    tier = scrapfly_tiers.get(url, page_type)
+    while True:
+        try:
+            # the params of the tier win over the ones passed.
+            content = make_scrapfly_request(url, **{**kwargs, **SCRAPFLY_TIERS[tier]})
+        except ScrapflyError as exception:
+            if not exception.is_blocked or tier == len(SCRAPFLY_TIERS) - 1:
+                raise
+            tier += 1
+            scrapfly_tiers.set(url, page_type, tier)
+            continue
+
+        scrapfly_tiers.set(url, page_type, tier)
+        return content
+
+
+async def make_async_escalating_scrapfly_request(
+    url: str,
+    *,
+    page_type: str,
+    default_params: dict[str, Any] | None = None,
+    **kwargs: Any,
+) -> dict[str, Any]:
+    """Same as `make_escalating_scrapfly_request`, but async."""
+    if not config.SCRAPFLY_ASP_ESCALATION:
+        return await make_async_scrapfly_request(
+            url, **{**kwargs, **(default_params or {})}
+        )
+
+    tier = scrapfly_tiers.get(url, page_type)
+    while True:
+        try:
+            content = await make_async_scrapfly_request(
+                url, **{**kwargs, **SCRAPFLY_TIERS[tier]}
+            )
+        except ScrapflyError as exception:
+            if not exception.is_blocked or tier == len(SCRAPFLY_TIERS) - 1:
+                raise
+            tier += 1
+            scrapfly_tiers.set(url, page_type, tier)
+            continue
+
+        scrapfly_tiers.set(url, page_type, tier)
+        return content
+
+
 def _prepare_scrapfly_params(url: str, *, asp: bool, **kwargs: Any) -> dict[str, Any]:
     params = {
         "key": config.SCRAPFLY_API_KEY,
@@ -247,12 +899,61 @@ def retry_on_http_errors(
     return retry(
         stop=stop_after_attempt(max_attempts),
         retry=retry_if_exception(lambda e: _is_retryable(e, additional_status_codes)),
-        wait=wait_exponential(min=min_wait, multiplier=wait_multiplier, max=max_wait),
+        wait=_wait_retry_after(
+            wait_exponential(min=min_wait, multiplier=wait_multiplier, max=max_wait)
+        ),
         before_sleep=_before_sleep_logging,
         reraise=True,
     )
 
 
+def get_retry_after(response: httpx.Response) -> float | None:
+    """
+    Seconds the server asked to wait before retrying, from the
+    `Retry-After` header(or `retry-after-ms`, sent by OpenAI),
+    None when it didn't ask.
+    """
+    if milliseconds := response.headers.get("retry-after-ms"):
+        with contextlib.suppress(ValueError):
+            return max(float(milliseconds) / 1000, 0)
+
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+
+    try:
+        seconds = float(value)
+    except ValueError:
+        # the header can be an HTTP date too.
+        try:
+            retry_at = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        seconds = (retry_at - datetime.now(timezone.utc)).total_seconds()
+    return max(seconds, 0)
+
+
+def _wait_retry_after(
+    fallback: Callable[[RetryCallState], float],
+) -> Callable[[RetryCallState], float]:
+    """
+    Wait as long as the failed response asked to, capped at
+    `HTTP_MAX_RETRY_AFTER`, falling back to `fallback` otherwise.
+    """
+
+    def wait(retry_state: RetryCallState) -> float:
+        exception = retry_state.outcome.exception()
+        if isinstance(exception, httpx.HTTPStatusError):
+            retry_after = get_retry_after(exception.response)
+            if retry_after is not None:
+                return min(retry_after, config.HTTP_MAX_RETRY_AFTER)
+        return fallback(retry_state)
+
+    return wait
+
+
 def _before_sleep_logging(retry_state: RetryCallState) -> None:
     """
     Logs information before retrying an operation.
@@ -301,44 +1002,38 @@ def _is_retryable(
 
 
 @retry_on_http_errors(additional_status_codes=[404])
-def get_exchange_rate(
+def fetch_exchange_rates(
     *,
-    to_currency: str = config.DEFAULT_CURRENCY,
-    from_currency: str,
-    exchange_date: datetime | None = None,
-) -> Decimal | None:
+    currency: str = config.DEFAULT_CURRENCY,
+    exchange_date: date,
+) -> dict[str, Decimal]:
     """
+    Fetch the exchange rates of all currencies against the given currency,
+    for the given date.
+
     Doc: https://github.com/fawazahmed0/exchange-api?tab=readme-ov-file
     """
-    if from_currency == to_currency:
-        return Decimal("1")
-
-    if exchange_date is None:
-        # some portals might not provide the posted date.
-        exchange_date = utcnow_naive().date()
-
     exchange_date_str = exchange_date.strftime("%Y-%m-%d")
-    from_currency = from_currency.lower()
-    to_currency = to_currency.lower()
-    url = EXCHANGE_RATE_API_URL.format(date=exchange_date_str, currency=to_currency)
+    currency = currency.lower()
+    url = EXCHANGE_RATE_API_URL.format(date=exchange_date_str, currency=currency)
 
-    with http_client() as client:
-        try:
-            response = client.get(url)
-        except (
-            httpx.RequestError,
-            httpx.HTTPStatusError,
-        ) as exc:
-            logger.warning(f"Failed to fetch exchange rate from {url}: {exc}")
-            fallback_url = EXCHANGE_RATE_FALLBACK_API_URL.format(
-                date=exchange_date_str, currency=to_currency
-            )
-            response = client.get(fallback_url)
+    try:
+        response = http_clients.client(url).get(url)
+    except (
+        httpx.RequestError,
+        httpx.HTTPStatusError,
+    ) as exc:
+        logger.warning(f"Failed to fetch exchange rate from {url}: {exc}")
+        fallback_url = EXCHANGE_RATE_FALLBACK_API_URL.format(
+            date=exchange_date_str, currency=currency
+        )
+        response = http_clients.client(fallback_url).get(fallback_url)
 
     data = response.json()
-    rate = data[to_currency].get(from_currency)
-    if rate:
-        return Decimal(str(rate))
+    return {
+        rate_currency: Decimal(str(rate))
+        for rate_currency, rate in data[currency].items()
+    }
 
 
 def log_to_sentry(exception: Exception, service_name: str, tags=None) -> str | None:
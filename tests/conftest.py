@@ -5,8 +5,12 @@ import job_board.connection as connection_module
 from job_board import config
 from job_board.connection import _test_session
 from job_board.connection import get_engine
+from job_board.exchange_rates import exchange_rates
 from job_board.init_db import init_db
+from job_board.known_links import known_links
 from job_board.models import BaseModel
+from job_board.tag_extractor import tag_extractor
+from job_board.utils import scrapfly_tiers
 
 
 @pytest.fixture(autouse=True)
@@ -14,6 +18,34 @@ def disable_real_http_requests(respx_mock):
     return
 
 
+@pytest.fixture(autouse=True)
+def clear_exchange_rates():
+    # the rates are cached in-process, clear them so
+    # that the rates mocked by one test don't leak into another.
+    exchange_rates.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_known_links():
+    # the index outlives a run, so the links stored
+    # by one test shouldn't be known to another.
+    known_links.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_scrapfly_tiers():
+    # the tier that got through is remembered per host, so the
+    # blocks mocked by one test shouldn't escalate another.
+    scrapfly_tiers.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_tag_extractor():
+    # the vocabulary is loaded from the tag table once, so the
+    # tags stored by one test shouldn't be matched in another.
+    tag_extractor.clear()
+
+
 @pytest.fixture
 def load_response():
     def _load_response(file_path: str) -> str:
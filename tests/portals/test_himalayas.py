@@ -113,3 +113,22 @@ def test_fetch_jobs(
         jobs = portal.fetch_jobs()
 
     assert len(jobs) == 40
+
+
+def test_fetch_jobs_resumes_from_checkpoint(respx_mock, load_response):
+    portal = Himalayas(checkpoint={"offset": 40}, known_links=set())
+    page_2 = load_response("himalayas-page-2.json")
+    route = respx_mock.get(portal.url).mock(
+        return_value=httpx.Response(
+            text=re.sub(r'"totalCount":\s*\d+', '"totalCount": 60', page_2),
+            status_code=200,
+        )
+    )
+
+    pages = list(portal.iter_pages())
+
+    # the jobs before the offset were stored by the failed run.
+    assert len(pages) == 1
+    assert route.call_count == 1
+    assert route.calls.last.request.url.params["offset"] == "40"
+    assert portal.page_checkpoint == {"offset": 60}
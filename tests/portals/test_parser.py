@@ -5,16 +5,18 @@ from datetime import timezone
 from decimal import Decimal
 from unittest.mock import patch
 
-import httpx
 import pytest
 from lxml import html
+from lxml import objectify
 
+from job_board.portals import PORTALS
 from job_board.portals.base import BasePortal
-from job_board.portals.parser import extract_job_tags_using_llm
+from job_board.portals.parser import build_job_tags_request
+from job_board.portals.parser import clean_description
 from job_board.portals.parser import InvalidSalary
 from job_board.portals.parser import Job
 from job_board.portals.parser import JobParser
-from job_board.portals.parser import OPENAI_RESPONSES_API_URL
+from job_board.portals.parser import parse_job_tags_response
 
 now = datetime.now(timezone.utc)
 
@@ -169,6 +171,31 @@ def test_get_payload_for_unsupported_format(parser):
         parser.get_payload()
 
 
+def test_from_payload(load_response):
+    portal_class = PORTALS["python"]
+    feed = objectify.fromstring(load_response("python_dot_org.rss").encode())
+    item = portal_class().get_items(feed)[0]
+    payload = portal_class.parser_class(item=item, api_data_format="xml").get_payload()
+
+    parser = portal_class.parser_class.from_payload(
+        payload,
+        api_data_format="xml",
+        extra_info="<html><body><p>Detail page</p></body></html>",
+    )
+
+    assert parser.get_payload() == payload
+    assert parser.get_link() == item.link.text
+    # the stored detail page is used, nothing is fetched.
+    assert parser.extra_info.text_content() == "Detail page"
+
+    parser = JobParser.from_payload('{"id": 1}', api_data_format="json")
+    assert parser.item == {"id": 1}
+    assert parser.extra_info is None
+
+    with pytest.raises(ValueError, match="Unsupported data format: something"):
+        JobParser.from_payload("", api_data_format="something")
+
+
 def test_very_old_jobs_are_skipped(db_session):
     class TestParser(JobParser):
         def get_link(self):
@@ -202,6 +229,40 @@ def test_very_old_jobs_are_skipped(db_session):
     assert fetched_job["link"] == recent_job["link"]
 
 
+def test_accessors_run_once_per_item():
+    calls = []
+
+    class TestParser(JobParser):
+        def get_link(self):
+            calls.append("get_link")
+            return self.item["link"]
+
+        def get_posted_on(self):
+            calls.append("get_posted_on")
+            return self.item["posted_on"]
+
+        def get_job(self):
+            return self.get_link()
+
+    portal = BasePortal()
+    portal.parser_class = TestParser
+    portal.api_data_format = "json"
+    portal.known_links = set()
+
+    recent_job = {
+        "link": "https://example.com/job/1",
+        "posted_on": now - timedelta(days=3),
+    }
+    with (
+        patch.object(portal, "make_request"),
+        patch.object(portal, "get_items", return_value=[recent_job]),
+    ):
+        assert portal.fetch_jobs() == [recent_job["link"]]
+
+    # the same parser is used to filter and to extract the job.
+    assert sorted(calls) == ["get_link", "get_posted_on"]
+
+
 @pytest.mark.parametrize(
     "min_salary,max_salary,expected_output",
     [
@@ -234,8 +295,7 @@ def test_salary_range_property(min_salary, max_salary, expected_output):
     assert job.salary_range == expected_output
 
 
-def test_extract_job_tags_using_llm(respx_mock, load_response):
-    assert extract_job_tags_using_llm([]) == []
+def test_parse_job_tags_response(load_response):
     jobs = [
         Job(
             title="All Round DevOps Engineer",
@@ -264,15 +324,10 @@ def test_extract_job_tags_using_llm(respx_mock, load_response):
         ),
     ]
 
-    respx_mock.post(OPENAI_RESPONSES_API_URL).mock(
-        return_value=httpx.Response(
-            status_code=200,
-            text=load_response("openai.json"),
-        )
+    tags_response = parse_job_tags_response(
+        jobs, json.loads(load_response("openai.json"))
     )
 
-    tags_response = extract_job_tags_using_llm(jobs)
-
     assert tags_response == [
         Job(
             title="All Round DevOps Engineer",
@@ -352,3 +407,60 @@ def test_parse_locations_from_jsonld_with_invalid_data(
         document = html.fromstring(data)
     locations = parser.parse_locations_from_json_ld(document)
     assert locations == expected_locations
+
+
+def test_parse_job_tags_response_skips_unexpected_links():
+    jobs = [
+        Job(title="Python Developer", link="https://example.com/jobs/1"),
+        Job(title="Go Developer", link="https://example.com/jobs/2"),
+    ]
+    tags = [
+        {"link": "https://example.com/jobs/1", "tags": ["python"]},
+        {"link": "https://example.com/jobs/1", "tags": ["django"]},
+        {"link": "https://example.com/jobs/3", "tags": ["go"]},
+    ]
+    result = {
+        "id": "resp_1",
+        "output": [{"content": [{"text": json.dumps({"jobs": tags})}]}],
+    }
+
+    # the made up and the repeated links are skipped, the dropped job is missing.
+    assert parse_job_tags_response(jobs, result) == [
+        jobs[0].model_copy(update={"tags": ["python"]})
+    ]
+
+
+@pytest.mark.parametrize(
+    "description, expected",
+    [
+        (None, ""),
+        ("", ""),
+        ("  Python\n\n and   Django ", "Python and Django"),
+        (
+            "<p>Python &amp; <b>Django</b></p>\n<ul><li>Flask</li></ul>",
+            "Python & Django",
+        ),
+        ("Python Django Flask Pyramid", "Python Django Flask"),
+    ],
+)
+def test_clean_description(description, expected):
+    assert clean_description(description, max_length=20) == expected
+
+
+def test_build_job_tags_request():
+    job = Job(
+        title="Python Developer",
+        description="<p>Python   and Django</p>",
+        link="https://example.com/jobs/1",
+        min_salary=Decimal("1000"),
+        locations=["US"],
+    )
+
+    prompt = build_job_tags_request([job])["input"][1]["content"]
+
+    # only the fields needed for tagging are sent, without indentation.
+    assert (
+        '[{"link":"https://example.com/jobs/1","title":"Python Developer",'
+        '"description":"Python and Django"}]'
+    ) in prompt
+    assert "min_salary" not in prompt
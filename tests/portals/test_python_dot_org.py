@@ -1,10 +1,14 @@
 import re
 from datetime import date
+from datetime import datetime
+from datetime import timezone
 
 import httpx
 import pytest
 from lxml import html
+from lxml import objectify
 
+from job_board.models import store_jobs
 from job_board.portals import PythonDotOrg
 
 
@@ -26,7 +30,7 @@ def test_fetch_jobs(
     detail_page_re = re.compile(
         r"https://www.python.org/jobs/\d+/",
     )
-    respx_mock.get(detail_page_re).mock(
+    detail_page_mocker = respx_mock.get(detail_page_re).mock(
         return_value=httpx.Response(text=sample_jobs_html, status_code=200)
     )
 
@@ -46,6 +50,29 @@ def test_fetch_jobs(
     assert job.is_remote is False
     assert job.locations == ["US-UT", "US"]
     assert job.company_name == "Confidential"
+    detail_page_calls = detail_page_mocker.call_count
+    assert detail_page_calls == 20
+
+    # the jobs that are already stored don't fetch the detail pages again.
+    store_jobs(jobs)
+    assert portal.fetch_jobs() == []
+    assert detail_page_mocker.call_count == detail_page_calls
+
+
+def test_get_posted_on_from_the_feed(respx_mock):
+    item = objectify.fromstring(
+        "<item>"
+        "<link>https://www.python.org/jobs/7831/</link>"
+        "<pubDate>Thu, 19 Jun 2025 10:00:14 +0530</pubDate>"
+        "</item>"
+    )
+    parser = PythonDotOrg.parser_class(item=item, api_data_format="xml")
+
+    assert parser.get_posted_on() == datetime(
+        2025, 6, 19, 4, 30, 14, tzinfo=timezone.utc
+    )
+    # the detail page is not needed for the posted date.
+    assert not respx_mock.calls
 
 
 @pytest.mark.parametrize(
@@ -5,9 +5,12 @@ from decimal import Decimal
 
 import httpx
 import pytest
+import sqlalchemy as sa
 from freezegun import freeze_time
 
+from job_board.models import Job
 from job_board.portals import Remotive
+from job_board.portals.models import Portal
 from job_board.portals.remotive import DATE_FORMAT
 
 
@@ -117,3 +120,20 @@ def test_fetch_jobs(
     assert job.is_remote is True
     assert job.tags == ["python", "django", "api"]
     assert job.company_name == "Remotive"
+
+
+def test_fetch_jobs_updates_the_known_jobs(respx_mock, sample_job, db_session):
+    route = respx_mock.get(Remotive.url).mock(
+        return_value=httpx.Response(json={"jobs": [sample_job]}, status_code=200)
+    )
+    Portal.fetch_jobs("remotive")
+
+    # the feed carries all the fields, so a known job is parsed again
+    # and stored when its content changed.
+    route.return_value = httpx.Response(
+        json={"jobs": [{**sample_job, "title": "Senior Python Developer"}]},
+        status_code=200,
+    )
+    Portal.fetch_jobs("remotive")
+
+    assert db_session.scalars(sa.select(Job.title)).all() == ["Senior Python Developer"]
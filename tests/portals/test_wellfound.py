@@ -111,7 +111,19 @@ def test_fetch_jobs(
         wellfound.parser_class.validate_recency = lambda x: True  # bypass recency check
         jobs = wellfound.fetch_jobs()
 
-    mocked_sleep.assert_called_once()
+    # the blocked page is escalated to the next tier right away instead of waiting.
+    mocked_sleep.assert_not_called()
+    list_page_requests = [
+        call.request
+        for call in respx_mock.calls
+        if not WELLFOUND_DETAIL_PAGE_RE.match(str(call.request.url))
+        and call.request.url.host == "api.scrapfly.io"
+    ]
+    assert [request.url.params.get("render_js") for request in list_page_requests] == [
+        None,
+        None,
+        "true",
+    ]
     # once each for every link
     assert detail_page_mocker.calls.call_count == len(jobs)
 
@@ -143,11 +155,34 @@ def test_fetch_jobs(
         wellfound.parser_class.validate_recency = lambda x: True  # bypass recency check
         assert wellfound.fetch_jobs() == []
 
-    mocked_sleep.assert_called_once()
+    mocked_sleep.assert_not_called()
     # no new detail pages should be fetched
     assert detail_page_mocker.calls.call_count == 52
 
 
+def test_fetch_jobs_resumes_from_checkpoint(respx_mock, load_response):
+    wellfound = Wellfound(checkpoint={"page": 1}, known_links=set())
+    route = respx_mock.get(SCRAPFLY_URL).mock(
+        return_value=httpx.Response(
+            status_code=200,
+            json={
+                "result": {
+                    "content": load_response("wellfound-page-2.html"),
+                    "success": True,
+                    "log_url": "https://scrapfly.io/dashboard/monitoring/log/01JSSJ7SNMEEJJDP0JPAACQ03D",
+                }
+            },
+        )
+    )
+
+    pages = list(wellfound.iter_pages())
+
+    # the first page was stored by the failed run, so it is not fetched again.
+    assert len(pages) == 1
+    assert route.calls.last.request.url.params["url"] == f"{wellfound.url}?page=2"
+    assert wellfound.page_checkpoint == {"page": 2}
+
+
 def test_scrapfly_api_returns_non_successful_response(wellfound, respx_mock):
     respx_mock.get(SCRAPFLY_URL).mock(
         return_value=httpx.Response(
@@ -1,4 +1,3 @@
-import re
 from datetime import datetime
 from datetime import timezone
 from decimal import Decimal
@@ -9,7 +8,6 @@ from lxml import html
 
 from job_board.portals import WeWorkRemotely
 from job_board.portals.weworkremotely import Parser
-from job_board.utils import EXCHANGE_RATE_API_URL
 from job_board.utils import SCRAPFLY_URL
 
 
@@ -235,40 +233,24 @@ def test_fetch_jobs(
 
 
 @pytest.mark.parametrize(
-    ("salary_info, min_salary, max_salary"),
+    ("salary_info, currency, min_salary, max_salary"),
     [
-        ("$80,000", Decimal("80000"), None),
-        ("$80,000 - $100,000", Decimal("80000"), Decimal("100000")),
-        ("$100K or more USD", Decimal("100000"), None),
-        ("$100,000 or more CAD", Decimal("73529.41"), None),
-        ("", None, None),  # No salary info
+        ("$80,000", "USD", Decimal("80000"), None),
+        ("$80,000 - $100,000", "USD", Decimal("80000"), Decimal("100000")),
+        ("$100K or more USD", "USD", Decimal("100000"), None),
+        ("$100,000 or more CAD", "CAD", Decimal("100000"), None),
+        ("", None, None, None),  # No salary info
     ],
 )
-def test_get_salary_range(
-    salary_info, min_salary, max_salary, respx_mock, load_response
-):
+def test_get_salary_range(salary_info, currency, min_salary, max_salary, load_response):
     parser = Parser(api_data_format="xml", item={})
     parser.get_posted_on = lambda: datetime.now(timezone.utc)
     parser.get_link = lambda: "https://weworkremotely.com/jobs/job-1"
     response = load_response("weworkremotely.html").replace("$SALARY_INFO", salary_info)
     parser.extra_info = html.fromstring(response)
-    exchange_rate_url_pattern = re.compile(
-        EXCHANGE_RATE_API_URL.format(currency="usd", date=r"\d{4}-\d{2}-\d{2}"),
-        flags=re.IGNORECASE,
-    )
-    respx_mock.get(exchange_rate_url_pattern).mock(
-        return_value=httpx.Response(
-            status_code=200,
-            json={
-                "usd": {
-                    "cad": 1.36,
-                }
-            },
-        )
-    )
 
+    # the salaries are in the posted currency, they are converted later.
     salary_range = parser.get_salary_range()
     assert salary_range.min_salary.amount == min_salary
-    if salary_range.min_salary.amount is not None:
-        assert salary_range.min_salary.currency == "USD"
+    assert salary_range.min_salary.currency == currency
     assert salary_range.max_salary.amount == max_salary
@@ -1,6 +1,15 @@
+import threading
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+
 import pytest
 
+from job_board import config
 from job_board.portals.base import BasePortal
+from job_board.portals.parser import JobParser
+
+now = datetime.now(timezone.utc)
 
 
 def test_abstract_methods():
@@ -9,3 +18,96 @@ def test_abstract_methods():
 
     with pytest.raises(NotImplementedError):
         BasePortal().get_items(response={})
+
+
+def test_prefetch_extra_info():
+    calls = []
+
+    class TestParser(JobParser):
+        def get_extra_info(self):
+            calls.append(self.item)
+            return f"extra-info-{self.item}"
+
+    portal = BasePortal()
+    portal.display_name = "Test Portal"
+    portal.detail_page_concurrency = 3
+    parsers = [TestParser(item=index, api_data_format="json") for index in range(10)]
+    portal.prefetch_extra_info(parsers)
+
+    assert sorted(calls) == list(range(10))
+    # the detail pages are not fetched again when accessed later.
+    assert [parser.extra_info for parser in parsers] == [
+        f"extra-info-{index}" for index in range(10)
+    ]
+    assert len(calls) == 10
+
+
+def test_prefetch_extra_info_raises_errors():
+    class TestParser(JobParser):
+        def get_extra_info(self):
+            raise ValueError("detail page unavailable")
+
+    portal = BasePortal()
+    portal.display_name = "Test Portal"
+    portal.detail_page_concurrency = 2
+    with pytest.raises(ValueError):
+        portal.prefetch_extra_info([TestParser(item={}, api_data_format="json")])
+
+    # nothing is fetched for portals without detail pages
+    portal.detail_page_concurrency = 0
+    portal.prefetch_extra_info([TestParser(item={}, api_data_format="json")])
+
+
+def test_iter_jobs(monkeypatch):
+    class TestParser(JobParser):
+        def get_link(self):
+            return f"https://example.com/jobs/{self.item}"
+
+        def get_posted_on(self):
+            return None
+
+        def get_job(self):
+            return self.item
+
+    portal = BasePortal()
+    portal.parser_class = TestParser
+    portal.api_data_format = "json"
+    portal.known_links = {"https://example.com/jobs/3"}
+    portal.iter_pages = lambda: iter([[1, 2, 3, 4], [5]])
+    portal.get_items = lambda page: page
+    monkeypatch.setattr(config, "INGESTION_BATCH_SIZE", 2)
+
+    # the jobs of a page are yielded in batches, skipping the known ones.
+    assert list(portal.iter_jobs()) == [[1, 2], [4], [5]]
+    assert portal.fetch_jobs() == [1, 2, 4, 5]
+
+    # the known jobs are parsed too, when the feed carries all their fields.
+    portal.refreshes_known_jobs = True
+    assert portal.fetch_jobs() == [1, 2, 3, 4, 5]
+
+
+def test_filter_parsers_prefetches_the_posted_dates():
+    threads = set()
+
+    class TestParser(JobParser):
+        def get_link(self):
+            return f"https://example.com/jobs/{self.item}"
+
+        def get_extra_info(self):
+            threads.add(threading.current_thread())
+            return now - timedelta(days=self.item)
+
+        def get_posted_on(self):
+            return self.extra_info
+
+    portal = BasePortal()
+    portal.display_name = "Test Portal"
+    portal.detail_page_concurrency = 2
+    portal.posted_on_from_detail_page = True
+    portal.known_links = {"https://example.com/jobs/0"}
+    parsers = [TestParser(item=days, api_data_format="json") for days in (0, 1, 2, 365)]
+
+    assert [parser.item for parser in portal.filter_parsers(parsers)] == [1, 2]
+    # the detail pages of the new jobs are fetched concurrently.
+    assert threading.main_thread() not in threads
+    assert "extra_info" not in vars(parsers[0])
@@ -6,11 +6,13 @@ import pytest
 from click.testing import CliRunner
 
 from job_board import config
+from job_board.cli import _shared_clients
 from job_board.cli import debugger_hook
 from job_board.cli import fetch_jobs
 from job_board.cli import main
 from job_board.portals import PORTALS
 from job_board.portals.models import Portal
+from job_board.portals.parser import Job as JobListing
 
 
 @pytest.fixture
@@ -23,7 +25,24 @@ def test_run_command_default_options(cli_runner):
         result = cli_runner.invoke(main, ["fetch"])
 
     assert result.exit_code == 0
-    mock_run.assert_called_once_with(include_portals=(), exclude_portals=())
+    mock_run.assert_called_once_with(
+        include_portals=(),
+        exclude_portals=(),
+        concurrency=config.PORTALS_FETCH_CONCURRENCY,
+    )
+
+
+def test_run_command_with_concurrency_option(cli_runner):
+    with mock.patch("job_board.cli.fetch_jobs") as mock_run:
+        result = cli_runner.invoke(main, ["fetch", "--concurrency", "3"])
+
+    assert result.exit_code == 0
+    mock_run.assert_called_once_with(
+        include_portals=(), exclude_portals=(), concurrency=3
+    )
+
+    result = cli_runner.invoke(main, ["fetch", "--concurrency", "0"])
+    assert result.exit_code != 0
 
 
 def test_run_command_exception_hook(cli_runner):
@@ -35,7 +54,11 @@ def test_run_command_exception_hook(cli_runner):
 
     assert result.exit_code == 0
     assert mock_sys.excepthook == debugger_hook
-    mock_run.assert_called_once_with(include_portals=(), exclude_portals=())
+    mock_run.assert_called_once_with(
+        include_portals=(),
+        exclude_portals=(),
+        concurrency=config.PORTALS_FETCH_CONCURRENCY,
+    )
 
     with (
         mock.patch.object(config, "ENV", "dev"),
@@ -60,10 +83,19 @@ def mock_portals(monkeypatch):
             if portal_name not in portals:
                 continue
 
-            mock_method = mock.MagicMock(return_value=[f"job-{portal_name}"])
+            mock_method = mock.MagicMock(
+                return_value=[
+                    [
+                        JobListing(
+                            title=f"job-{portal_name}",
+                            link=f"https://example.com/{portal_name}",
+                        )
+                    ]
+                ]
+            )
             monkeypatch.setattr(
                 portal_class,
-                "fetch_jobs",
+                "iter_jobs",
                 value=mock_method,
             )
             mock_methods.append(mock_method)
@@ -170,6 +202,42 @@ def test_fetch_jobs_function_specific_portal(db_session, mock_portals):
     mock_store_jobs.assert_called_once()
 
 
+def test_fetch_jobs_isolates_portal_failures(db_session, mock_portals):
+    mock_portals(portals=["weworkremotely"])
+    with (
+        mock.patch("job_board.cli.init_db"),
+        mock.patch("job_board.cli.click.echo"),
+        mock.patch.object(
+            PORTALS["remotive"], "iter_jobs", side_effect=ValueError("portal down")
+        ),
+        mock.patch("job_board.portals.models.store_jobs") as mock_store_jobs,
+        pytest.raises(ExceptionGroup) as exc_info,
+    ):
+        fetch_jobs(include_portals=["remotive", "weworkremotely"])
+
+    # the failing portal doesn't stop the other portals from being fetched.
+    mock_store_jobs.assert_called_once()
+    (exception,) = exc_info.value.exceptions
+    assert isinstance(exception, ValueError)
+
+
+def test_shared_clients_are_closed_by_the_last_run():
+    with (
+        mock.patch("job_board.cli.http_clients") as mock_http_clients,
+        mock.patch("job_board.cli.scrapfly_cache") as mock_scrapfly_cache,
+    ):
+        with _shared_clients():
+            # another portal scheduled at the same time.
+            with _shared_clients():
+                pass
+
+            mock_http_clients.close.assert_not_called()
+            mock_scrapfly_cache.close.assert_not_called()
+
+        mock_http_clients.close.assert_called_once()
+        mock_scrapfly_cache.close.assert_called_once()
+
+
 def test_scheduler_command(cli_runner):
     with (
         mock.patch("job_board.cli.scheduler") as mock_scheduler,
@@ -319,3 +387,24 @@ def test_runserver_command_dev_mode(cli_runner):
     # Verify that sys.excepthook was set to debugger_hook due to dev mode.
     assert mock_sys.excepthook == debugger_hook
     assert result.exit_code == 0
+
+
+def test_reparse_command(cli_runner):
+    with (
+        mock.patch("job_board.cli.reparse_jobs") as mock_reparse,
+        mock.patch("job_board.cli.init_db"),
+    ):
+        mock_reparse.return_value.reparsed = 2
+        mock_reparse.return_value.failed = 0
+        result = cli_runner.invoke(main, ["reparse", "-I", "Remotive", "-w", "2"])
+
+        assert result.exit_code == 0
+        assert "Reparsed 2 jobs" in result.output
+        mock_reparse.assert_called_once_with(
+            ["remotive"], workers=2, batch_size=config.REPARSE_BATCH_SIZE
+        )
+
+        result = cli_runner.invoke(main, ["reparse", "-I", "unknown"])
+
+    assert result.exit_code != 0
+    assert "Unknown portals: unknown" in result.output
@@ -0,0 +1,100 @@
+from datetime import date
+from datetime import datetime
+from datetime import timezone
+from decimal import Decimal
+
+import httpx
+import sqlalchemy as sa
+
+from job_board.exchange_rates import convert_salaries
+from job_board.exchange_rates import ExchangeRate
+from job_board.exchange_rates import ExchangeRateStore
+from job_board.portals.parser import Job as JobListing
+from job_board.utils import EXCHANGE_RATE_API_URL
+
+
+exchange_date = date(2025, 6, 10)
+
+
+def test_get_rate(respx_mock, db_session):
+    store = ExchangeRateStore()
+    assert store.get_rate(from_currency="usd", to_currency="USD") == Decimal("1")
+
+    url = EXCHANGE_RATE_API_URL.format(date="2025-06-10", currency="usd")
+    route = respx_mock.get(url).mock(
+        return_value=httpx.Response(
+            status_code=200,
+            json={"usd": {"inr": 82.899, "cad": 1.36}},
+        )
+    )
+
+    assert store.get_rate(
+        from_currency="INR", exchange_date=datetime(2025, 6, 10, 8, 30)
+    ) == Decimal("82.899")
+    assert store.get_rate(from_currency="cad", exchange_date=exchange_date) == (
+        Decimal("1.36")
+    )
+    assert store.get_rate(from_currency="xyz", exchange_date=exchange_date) is None
+    # the rates for a date are fetched only once.
+    assert route.call_count == 1
+
+    stored_rates = db_session.execute(
+        sa.select(ExchangeRate.rates).where(ExchangeRate.date == exchange_date)
+    ).scalar_one()
+    assert stored_rates == {"inr": "82.899", "cad": "1.36"}
+
+    # a new store(or a later run) reads the rates from the database.
+    store = ExchangeRateStore()
+    assert store.get_rate(from_currency="inr", exchange_date=exchange_date) == (
+        Decimal("82.899")
+    )
+    assert route.call_count == 1
+
+
+def test_convert_salaries(respx_mock, db_session):
+    jobs = [
+        JobListing(
+            title="INR job",
+            link="https://example.com/inr",
+            min_salary=Decimal("1500000"),
+            max_salary=Decimal("2500000"),
+            salary_currency="INR",
+            posted_on=datetime(2025, 6, 10, tzinfo=timezone.utc),
+        ),
+        JobListing(
+            title="CAD job",
+            link="https://example.com/cad",
+            min_salary=Decimal("100000"),
+            salary_currency="CAD",
+            posted_on=datetime(2025, 6, 10, 12, tzinfo=timezone.utc),
+        ),
+        JobListing(
+            title="USD job",
+            link="https://example.com/usd",
+            min_salary=Decimal("80000"),
+            salary_currency="USD",
+        ),
+        JobListing(
+            title="Job without salary",
+            link="https://example.com/no-salary",
+        ),
+    ]
+    url = EXCHANGE_RATE_API_URL.format(date="2025-06-10", currency="usd")
+    route = respx_mock.get(url).mock(
+        return_value=httpx.Response(
+            status_code=200,
+            json={"usd": {"inr": 80, "cad": 1.25}},
+        )
+    )
+
+    inr_job, cad_job, usd_job, job_without_salary = convert_salaries(jobs)
+
+    # both jobs were posted on the same date, so the rates are fetched once.
+    assert route.call_count == 1
+    assert inr_job.min_salary == Decimal("18750.00")
+    assert inr_job.max_salary == Decimal("31250.00")
+    assert cad_job.min_salary == Decimal("80000.00")
+    assert cad_job.max_salary is None
+    assert usd_job.min_salary == Decimal("80000.00")
+    assert {inr_job.salary_currency, cad_job.salary_currency} == {"USD"}
+    assert job_without_salary == jobs[-1]
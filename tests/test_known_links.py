@@ -0,0 +1,86 @@
+from datetime import timedelta
+
+import sqlalchemy as sa
+
+from job_board import config
+from job_board.known_links import find_stored_links
+from job_board.known_links import KnownLinks
+from job_board.models import Job
+from job_board.models import store_jobs
+from job_board.portals.parser import Job as JobListing
+from job_board.utils import utcnow_naive
+
+
+def _store_jobs(*links):
+    store_jobs([JobListing(title="Python Developer", link=link) for link in links])
+
+
+def test_known_links(db_session):
+    _store_jobs("https://example.com/jobs/1", "https://example.com/jobs/2")
+
+    known_links = KnownLinks()
+    known_links.refresh()
+    assert len(known_links) == 2
+    assert "https://example.com/jobs/1" in known_links
+    # links are compared case-insensitively.
+    assert "https://EXAMPLE.com/jobs/2" in known_links
+    assert "https://example.com/jobs/3" not in known_links
+
+    # only the jobs created since the last refresh are loaded.
+    _store_jobs("https://example.com/jobs/3")
+    known_links.refresh()
+    assert len(known_links) == 3
+    assert "https://example.com/jobs/3" in known_links
+
+    known_links.add(["https://example.com/jobs/4"])
+    assert "https://example.com/jobs/4" in known_links
+
+    known_links.clear()
+    assert len(known_links) == 0
+
+
+def test_known_links_refresh_overlap(db_session, monkeypatch):
+    _store_jobs("https://example.com/jobs/1")
+    known_links = KnownLinks()
+    known_links.refresh()
+
+    # created before the latest job loaded, but committed after the refresh.
+    db_session.add(
+        Job(
+            title="Python Developer",
+            link="https://example.com/jobs/2",
+            created_at=utcnow_naive() - timedelta(minutes=1),
+        )
+    )
+    db_session.flush()
+    known_links.refresh()
+    assert "https://example.com/jobs/2" in known_links
+
+    # all the links are loaded again after a while, the purged ones are dropped.
+    db_session.execute(sa.delete(Job).where(Job.link == "https://example.com/jobs/1"))
+    known_links.refresh()
+    assert "https://example.com/jobs/1" in known_links
+    monkeypatch.setattr(config, "KNOWN_LINKS_RELOAD_INTERVAL", -1)
+    known_links.refresh()
+    assert "https://example.com/jobs/1" not in known_links
+    assert len(known_links) == 1
+
+
+def test_find_stored_links(db_session):
+    assert find_stored_links([]) == set()
+
+    _store_jobs("https://example.com/jobs/1", "https://example.com/Jobs/2")
+
+    assert find_stored_links(
+        [
+            "https://example.com/jobs/1",
+            "https://example.com/jobs/2",
+            "https://example.com/jobs/3",
+        ]
+    ) == {"https://example.com/jobs/1", "https://example.com/jobs/2"}
+
+    known_links = KnownLinks.for_links(
+        ["https://example.com/jobs/2", "https://example.com/jobs/3"]
+    )
+    assert len(known_links) == 1
+    assert "https://example.com/jobs/2" in known_links
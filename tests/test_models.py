@@ -6,17 +6,30 @@ from unittest import mock
 
 import pytest
 import sqlalchemy as sa
+from freezegun import freeze_time
 from sqlalchemy import func
 
 from job_board import config
 from job_board.connection import get_session
+from job_board.models import archive_old_jobs
 from job_board.models import Job
+from job_board.models import JobArchive
+from job_board.models import JobTag
 from job_board.models import Payload
 from job_board.models import purge_old_jobs
+from job_board.models import purge_orphaned_payloads
 from job_board.models import store_jobs
+from job_board.models import store_tags
 from job_board.models import Tag
+from job_board.models import TagDeadLetter
+from job_board.models import TagMemo
+from job_board.payload_store import PayloadStore
+from job_board.portals import PORTALS
 from job_board.portals.models import Portal
 from job_board.portals.parser import Job as JobListing
+from job_board.tagging import TaggingEngine
+from job_board.utils import ScrapflyBudgetExceeded
+from job_board.utils import utcnow_naive
 
 
 now = datetime.now(timezone.utc)
@@ -57,6 +70,100 @@ def test_portal_fetch_with_invalid_portal_name():
     assert "invalid-portal" in str(exception)
 
 
+def test_portal_fetch_jobs_stores_batches_before_failure(db_session):
+    def iter_jobs(self):
+        yield [JobListing(title="Python Developer", link="https://example.com/1")]
+        raise ValueError("page unavailable")
+
+    with (
+        mock.patch.object(PORTALS["remotive"], "iter_jobs", iter_jobs),
+        pytest.raises(ValueError),
+    ):
+        Portal.fetch_jobs("remotive")
+
+    # the batch found before the failure is stored.
+    assert db_session.scalars(sa.select(Job.link)).all() == ["https://example.com/1"]
+
+
+def test_portal_fetch_jobs_resumes_from_checkpoint(db_session):
+    checkpoints = []
+
+    def failing_iter_jobs(self):
+        checkpoints.append(self.checkpoint)
+        self.checkpoint = {"page": 1}
+        yield [JobListing(title="Python Developer", link="https://example.com/1")]
+        raise ValueError("page unavailable")
+
+    def iter_jobs(self):
+        checkpoints.append(self.checkpoint)
+        self.checkpoint = {"page": 2}
+        yield []
+
+    with (
+        freeze_time("2025-01-01 01:00:00"),
+        mock.patch.object(PORTALS["remotive"], "iter_jobs", failing_iter_jobs),
+        pytest.raises(ValueError),
+    ):
+        Portal.fetch_jobs("remotive")
+
+    portal = Portal.get_or_create("remotive")
+    assert portal.run_id is not None
+    assert portal.checkpoint == {"page": 1}
+    assert portal.last_run_at is None
+
+    with (
+        freeze_time("2025-01-01 13:00:00"),
+        mock.patch.object(PORTALS["remotive"], "iter_jobs", iter_jobs),
+    ):
+        Portal.fetch_jobs("remotive")
+
+    # the failed run is resumed from where it had reached.
+    assert checkpoints == [None, {"page": 1}]
+    portal = Portal.get_or_create("remotive")
+    assert portal.run_id is None
+    assert portal.checkpoint is None
+    # the next run looks back to when the failed run started.
+    assert portal.last_run_at == datetime(2025, 1, 1, 1)
+
+
+def test_portal_fetch_jobs_stops_when_the_budget_is_spent(db_session):
+    def iter_jobs(self):
+        self.checkpoint = {"page": 1}
+        yield [JobListing(title="Python Developer", link="https://example.com/1")]
+        raise ScrapflyBudgetExceeded("Scrapfly credit budget of 50 is spent")
+
+    with mock.patch.object(PORTALS["remotive"], "iter_jobs", iter_jobs):
+        Portal.fetch_jobs("remotive")
+
+    # the run ends cleanly, and is resumed by the next one without
+    # counting as a failed attempt.
+    portal = Portal.get_or_create("remotive")
+    assert portal.run_id is not None
+    assert portal.checkpoint == {"page": 1}
+    assert portal.run_attempts == 0
+    assert db_session.scalars(sa.select(Job.link)).all() == ["https://example.com/1"]
+
+
+def test_portal_fetch_jobs_starts_over_after_max_attempts(db_session, monkeypatch):
+    monkeypatch.setattr(config, "PORTAL_RUN_MAX_ATTEMPTS", 2)
+    checkpoints = []
+
+    def failing_iter_jobs(self):
+        checkpoints.append(self.checkpoint)
+        self.checkpoint = {"page": 1}
+        yield []
+        raise ValueError("page unavailable")
+
+    with mock.patch.object(PORTALS["remotive"], "iter_jobs", failing_iter_jobs):
+        for _ in range(3):
+            with pytest.raises(ValueError):
+                Portal.fetch_jobs("remotive")
+
+    # the page that keeps failing is given up on, and the run starts over.
+    assert checkpoints == [None, {"page": 1}, None]
+    assert Portal.get_or_create("remotive").run_attempts == 1
+
+
 def test_store_jobs(db_session):
     # No job_listings, nothing happens
     assert store_jobs([]) is None
@@ -163,6 +270,153 @@ def test_store_jobs_with_empty_tags(db_session):
     assert len(tags) == 0
 
 
+def test_store_jobs_with_special_characters(db_session):
+    posted_on = datetime(
+        2025, 1, 1, 10, tzinfo=timezone(timedelta(hours=5, minutes=30))
+    )
+    job_listings = [
+        JobListing(
+            link="https://example.com/jobs/1",
+            title='Senior "Python", Developer',
+            description='Line one\nLine, two with "quotes" and a \\ backslash',
+            min_salary=Decimal("1000.50"),
+            posted_on=posted_on,
+            locations=["US", "IN"],
+            payload="",
+            company_name=None,
+        ),
+        # the same link in a batch is stored once.
+        JobListing(
+            link="https://EXAMPLE.com/jobs/1",
+            title="Duplicate",
+            payload="some data",
+        ),
+    ]
+
+    store_jobs(job_listings)
+
+    job = db_session.execute(sa.select(Job)).scalar_one()
+    assert job.title == 'Senior "Python", Developer'
+    assert job.description == 'Line one\nLine, two with "quotes" and a \\ backslash'
+    assert job.min_salary == Decimal("1000.50")
+    assert job.max_salary is None
+    assert job.company_name is None
+    assert job.locations == ["US", "IN"]
+    assert job.is_remote is False
+    # the dates are stored in UTC.
+    assert job.posted_on == datetime(2025, 1, 1, 4, 30)
+
+    payload = db_session.execute(sa.select(Payload)).scalar_one()
+    # an empty string isn't stored as NULL.
+    assert payload.payload == ""
+    assert payload.extra_info is None
+
+
+def test_store_jobs_updates_changed_jobs(db_session):
+    listing = JobListing(
+        link="https://example.com/jobs/1",
+        title="Python Developer",
+        posted_on=now - timedelta(days=1),
+        payload="some data",
+    )
+    with freeze_time("2025-01-01"):
+        store_jobs([listing])
+
+    job = db_session.execute(sa.select(Job)).scalar_one()
+    assert job.content_hash == listing.content_hash
+    assert job.edited_at == datetime(2025, 1, 1)
+
+    # storing the same listing again doesn't write anything,
+    # not even when only the whitespace changed.
+    with freeze_time("2025-01-02"):
+        store_jobs([listing.model_copy(update={"title": " Python  Developer "})])
+
+    db_session.refresh(job)
+    assert job.edited_at == datetime(2025, 1, 1)
+
+    changed_listing = listing.model_copy(
+        update={"min_salary": Decimal("100000"), "company_name": "Example"}
+    )
+    with freeze_time("2025-01-03"):
+        store_jobs([changed_listing])
+
+    db_session.refresh(job)
+    assert job.min_salary == Decimal("100000")
+    assert job.company_name == "Example"
+    assert job.content_hash == changed_listing.content_hash
+    assert job.edited_at == datetime(2025, 1, 3)
+    assert job.created_at < job.edited_at
+
+
+def test_store_tags_in_a_single_statement(db_session):
+    job_listings = [
+        JobListing(link=f"https://example.com/jobs/{i}", title=f"Job {i}")
+        for i in range(500)
+    ]
+    store_jobs(job_listings)
+    job_listings = [
+        job.model_copy(update={"tags": ["python", "Python", f"tag-{i % 10}"]})
+        for i, job in enumerate(job_listings)
+    ]
+
+    statements = []
+    sa.event.listen(
+        db_session.connection(),
+        "before_cursor_execute",
+        lambda *args: statements.append(args[2]),
+    )
+    store_tags(session=db_session, job_listings=job_listings)
+
+    assert len(statements) == 1
+    tags = db_session.execute(sa.select(Tag.name)).scalars().all()
+    # the tags are stored once, whatever their case.
+    assert sorted(tag.lower() for tag in tags) == [
+        "python",
+        *(f"tag-{i}" for i in range(10)),
+    ]
+    assert (
+        db_session.execute(sa.select(sa.func.count()).select_from(JobTag)).scalar_one()
+        == 1000
+    )
+
+
+def test_store_jobs_offloads_payloads(db_session, tmp_path):
+    store = PayloadStore(directory=tmp_path)
+    job_listings = [
+        JobListing(
+            link=f"https://example.com/jobs/{i}",
+            title=f"Job {i}",
+            payload="same payload",
+            extra_info=f"<html>job {i}</html>" if i else None,
+        )
+        for i in range(2)
+    ]
+
+    with (
+        mock.patch.object(config, "PAYLOAD_OFFLOAD", True),
+        mock.patch("job_board.models.payload_store", store),
+    ):
+        store_jobs(job_listings)
+
+        payloads = (
+            db_session.execute(sa.select(Payload).order_by(Payload.link))
+            .scalars()
+            .all()
+        )
+        assert [p.payload for p in payloads] == [None, None]
+        assert [p.extra_info for p in payloads] == [None, None]
+        assert payloads[0].payload_digest == payloads[1].payload_digest
+        assert payloads[0].payload_size == len("same payload")
+        assert payloads[0].extra_info_digest is None
+        assert [p.get_payload() for p in payloads] == ["same payload"] * 2
+        assert payloads[1].get_extra_info() == "<html>job 1</html>"
+        with payloads[1].open_extra_info() as stream:
+            assert stream.read() == b"<html>job 1</html>"
+
+        # identical payloads are stored once.
+        assert len(list(tmp_path.glob("*/*.zst"))) == 2
+
+
 def test_purge_old_jobs(db_session):
     job_listings = [
         JobListing(
@@ -176,6 +430,7 @@ def test_purge_old_jobs(db_session):
             link="https://example.com/old-job",
             title="Job 2",
             posted_on=now - timedelta(days=365),
+            tags=["python"],
             payload="some data",
             company_name="Old Company",
         ),
@@ -191,6 +446,57 @@ def test_purge_old_jobs(db_session):
     assert "new-job" in db_session.execute(sa.select((Job.link))).scalars().one()
     assert "new-job" in db_session.execute(sa.select(Payload.link)).scalars().one()
 
+    # the old job is kept in the archive, along with its tags.
+    archived_job = db_session.execute(sa.select(JobArchive)).scalar_one()
+    assert archived_job.link == "https://example.com/old-job"
+    assert archived_job.company_name == "Old Company"
+    assert archived_job.tags == ["python"]
+    assert (
+        db_session.execute(sa.select(func.count()).select_from(JobTag)).scalar_one()
+        == 0
+    )
+
+
+def test_archive_old_jobs_in_chunks(db_session):
+    store_jobs(
+        [
+            JobListing(
+                link=f"https://example.com/old-job-{i}",
+                title=f"Job {i}",
+                posted_on=now - timedelta(days=365 + i),
+                payload="some data",
+            )
+            for i in range(5)
+        ]
+    )
+
+    assert archive_old_jobs(utcnow_naive(), batch_size=2) == 5
+
+    assert db_session.execute(sa.select(func.count(Job.id))).scalar_one() == 0
+    assert db_session.execute(sa.select(func.count(Payload.id))).scalar_one() == 0
+    assert db_session.execute(sa.select(func.count(JobArchive.id))).scalar_one() == 5
+
+
+def test_purge_orphaned_payloads_in_chunks(db_session):
+    store_jobs(
+        [
+            JobListing(
+                link=f"https://example.com/job-{i}",
+                title=f"Job {i}",
+                posted_on=now,
+                payload="some data",
+            )
+            for i in range(5)
+        ]
+    )
+    db_session.execute(sa.delete(Job).where(Job.link != "https://example.com/job-0"))
+
+    assert purge_orphaned_payloads(batch_size=2) == 4
+
+    assert db_session.execute(sa.select(Payload.link)).scalar_one() == (
+        "https://example.com/job-0"
+    )
+
 
 def test_fill_missing_tags(db_session):
     job = Job(
@@ -201,8 +507,9 @@ def test_fill_missing_tags(db_session):
     )
     db_session.add(job)
 
-    with mock.patch(
-        "job_board.models.extract_job_tags_using_llm",
+    with mock.patch.object(
+        TaggingEngine,
+        "_tag_batch",
         return_value=[
             JobListing(
                 title=job.title,
@@ -221,6 +528,75 @@ def test_fill_missing_tags(db_session):
     Job.fill_missing_tags()
 
 
+def test_fill_missing_tags_reuses_tags_of_the_same_content(db_session):
+    reposted = JobListing(
+        title="Python Developer",
+        description="<p>Python and Django</p>",
+        link="https://example.com/1",
+    )
+    db_session.add(TagMemo(content_hash=reposted.tagging_hash, tags=["python"]))
+    db_session.add(Tag(name="python"))
+    jobs = [
+        Job(title=title, description=description, link=link, company_name="Company")
+        for title, description, link in [
+            # the same content as the memo, under another link.
+            ("Python  developer", "Python and Django", "https://example.com/1"),
+            # new content, cross-posted on two links.
+            ("Go Developer", "Go and gRPC", "https://example.com/2"),
+            ("Go Developer", "Go and gRPC", "https://example.org/2"),
+        ]
+    ]
+    db_session.add_all(jobs)
+    db_session.flush()
+
+    def tag_batch(batch, **kwargs):
+        return [job.model_copy(update={"tags": ["go"]}) for job in batch]
+
+    with mock.patch.object(
+        TaggingEngine, "_tag_batch", side_effect=tag_batch
+    ) as mocked_tag_batch:
+        Job.fill_missing_tags()
+
+    # only the new content is sent to the LLM, once.
+    (call,) = mocked_tag_batch.call_args_list
+    assert [job.link for job in call.args[0]] == ["https://example.com/2"]
+    for job in jobs:
+        db_session.refresh(job)
+    assert [[tag.name for tag in job.tags] for job in jobs] == [
+        ["python"],
+        ["go"],
+        ["go"],
+    ]
+    memos = db_session.execute(sa.select(TagMemo.tags)).scalars().all()
+    assert sorted(memos) == [["go"], ["python"]]
+
+
+def test_fill_missing_tags_dead_letters_failing_jobs(db_session, monkeypatch):
+    monkeypatch.setattr(config, "TAGGING_MAX_FAILURES", 2)
+    job = Job(
+        title="job-title",
+        description="job-description",
+        link="https://example.com/2",
+        company_name="Test Company",
+    )
+    db_session.add(job)
+    db_session.flush()
+
+    with mock.patch.object(
+        TaggingEngine, "_tag_batch", return_value=[]
+    ) as mocked_tag_batch:
+        Job.fill_missing_tags()
+        Job.fill_missing_tags()
+        # the content failed too many times, so it isn't sent anymore.
+        Job.fill_missing_tags()
+
+    assert mocked_tag_batch.call_count == 2
+    dead_letter = db_session.execute(sa.select(TagDeadLetter)).scalar_one()
+    assert dead_letter.link == job.link
+    assert dead_letter.failures == 2
+    assert dead_letter.error == "Missing from the response"
+
+
 def test_location_check_constraint(db_session):
     valid_job = Job(
         title="Valid Location Job",
@@ -0,0 +1,119 @@
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+
+import sqlalchemy as sa
+
+from job_board.models import is_job_partitioned
+from job_board.models import Job
+from job_board.models import JobTag
+from job_board.models import Payload
+from job_board.models import purge_old_jobs
+from job_board.models import store_jobs
+from job_board.partitions import ensure_job_partitions
+from job_board.partitions import partition_jobs
+from job_board.portals.parser import Job as JobListing
+
+
+now = datetime.now(timezone.utc)
+
+
+def _get_partitions(db_session):
+    return set(
+        db_session.execute(
+            sa.text(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid "
+                "WHERE pg_inherits.inhparent = to_regclass('job')"
+            )
+        ).scalars()
+    )
+
+
+def _count(db_session, model):
+    return db_session.execute(
+        sa.select(sa.func.count()).select_from(model)
+    ).scalar_one()
+
+
+def test_partition_jobs(db_session):
+    new_job = JobListing(
+        link="https://example.com/jobs/new",
+        title="New Job",
+        posted_on=now - timedelta(days=1),
+        tags=["python"],
+        payload="some data",
+    )
+    old_job = JobListing(
+        link="https://example.com/jobs/old",
+        title="Old Job",
+        posted_on=now - timedelta(days=365),
+        tags=["python"],
+        payload="some data",
+    )
+    store_jobs([new_job, old_job])
+
+    assert is_job_partitioned(db_session) is False
+    partition_jobs(db_session)
+    assert is_job_partitioned(db_session) is True
+    # converting again does nothing.
+    partition_jobs(db_session)
+    assert _count(db_session, Job) == 2
+
+    # the jobs are still merged by their links.
+    store_jobs(
+        [
+            new_job.model_copy(update={"title": "New Job (edited)"}),
+            old_job,
+            JobListing(
+                link="https://EXAMPLE.com/jobs/new", title="Duplicate", payload="x"
+            ),
+        ]
+    )
+    assert _count(db_session, Job) == 2
+    assert (
+        db_session.execute(
+            sa.select(Job.title).where(Job.link == new_job.link)
+        ).scalar_one()
+        == "New Job (edited)"
+    )
+
+    purge_old_jobs()
+
+    assert db_session.execute(sa.select(Job.link)).scalars().all() == [new_job.link]
+    assert _count(db_session, JobTag) == 1
+    assert _count(db_session, Payload) == 1
+    # the month of the old job was dropped as a whole.
+    assert f"job_p{old_job.posted_on:%Y_%m}" not in _get_partitions(db_session)
+    assert (
+        db_session.execute(
+            sa.text("SELECT to_regclass(:table)"),
+            {"table": f"job_detached_p{old_job.posted_on:%Y_%m}"},
+        ).scalar_one()
+        is None
+    )
+
+
+def test_ensure_job_partitions_moves_the_default_partition_rows(db_session):
+    future_job = JobListing(
+        link="https://example.com/jobs/future",
+        title="Future Job",
+        posted_on=now + timedelta(days=200),
+        payload="some data",
+    )
+    store_jobs([future_job])
+    partition_jobs(db_session)
+    partition = f"job_p{future_job.posted_on:%Y_%m}"
+    assert partition not in _get_partitions(db_session)
+
+    ensure_job_partitions(db_session, months_ahead=8)
+
+    assert partition in _get_partitions(db_session)
+    assert (
+        db_session.execute(sa.text(f"SELECT link FROM {partition}")).scalar_one()
+        == future_job.link
+    )
+    assert (
+        db_session.execute(sa.text("SELECT count(*) FROM job_default")).scalar_one()
+        == 0
+    )
@@ -0,0 +1,54 @@
+import os
+import time
+
+from job_board.payload_store import PayloadStore
+
+
+def test_payload_store(tmp_path):
+    store = PayloadStore(directory=tmp_path)
+    content = "<html>job</html>" * 100
+
+    blob = store.put(content)
+    assert blob.size == len(content)
+    path = tmp_path / blob.digest[:2] / f"{blob.digest}.zst"
+    # the blob is compressed.
+    assert path.stat().st_size < blob.size
+
+    # identical bodies are stored once.
+    assert store.put(content) == blob
+    assert len(list(tmp_path.glob("*/*.zst"))) == 1
+
+    assert store.get(blob.digest) == content
+    with store.open(blob.digest) as stream:
+        assert stream.read(6) == b"<html>"
+        assert stream.read() == content[6:].encode()
+
+
+def test_payload_store_collect_garbage(tmp_path):
+    store = PayloadStore(directory=tmp_path)
+    assert (
+        PayloadStore(directory=tmp_path / "missing").collect_garbage([], grace_period=0)
+        == 0
+    )
+
+    kept = store.put("kept")
+    removed = store.put("removed")
+    recent = store.put("recent")
+    an_hour_ago = time.time() - 60 * 60
+    for blob in (kept, removed):
+        path = tmp_path / blob.digest[:2] / f"{blob.digest}.zst"
+        os.utime(path, (an_hour_ago, an_hour_ago))
+
+    assert store.collect_garbage([kept.digest], grace_period=60) == 1
+    assert store.get(kept.digest) == "kept"
+    # the blobs written recently might not be committed yet.
+    assert store.get(recent.digest) == "recent"
+    assert not (tmp_path / removed.digest[:2] / f"{removed.digest}.zst").exists()
+
+    # storing the content again touches the old blob, so it isn't removed
+    # before the new payload referencing it is committed.
+    path = tmp_path / kept.digest[:2] / f"{kept.digest}.zst"
+    os.utime(path, (an_hour_ago, an_hour_ago))
+    assert store.put("kept") == kept
+    assert store.collect_garbage([], grace_period=60) == 0
+    assert store.get(kept.digest) == "kept"
@@ -0,0 +1,52 @@
+import json
+
+import sqlalchemy as sa
+
+from job_board.models import Job
+from job_board.models import store_jobs
+from job_board.portals import Remotive
+from job_board.portals.parser import Job as JobListing
+from job_board.reparse import reparse_jobs
+
+
+def test_reparse_jobs(db_session):
+    item = {
+        "url": "https://remotive.com/jobs/123",
+        "title": "Python Developer",
+        "description": "<p>We are looking for a Python developer.</p>",
+        "candidate_required_location": "Worldwide",
+        "tags": ["python"],
+        "salary": "",
+        "publication_date": "2025-01-01T10:00:00",
+        "company_name": "Remotive",
+    }
+    # stored before the parser was versioned, with a title it got wrong.
+    store_jobs(
+        [
+            JobListing(
+                link=item["url"],
+                title="Python Developer (broken)",
+                payload=json.dumps(item),
+            ),
+            JobListing(
+                link="https://remotive.com/jobs/124",
+                title="Broken payload",
+                payload="not json",
+            ),
+        ]
+    )
+
+    stats = reparse_jobs(["remotive"], workers=1, batch_size=10)
+
+    assert stats.reparsed == 1
+    assert stats.failed == 1
+    job = db_session.execute(sa.select(Job).where(Job.link == item["url"])).scalar_one()
+    assert job.title == "Python Developer"
+    assert job.company_name == "Remotive"
+    assert job.parser_version == Remotive.parser_class.parser_version
+    assert [tag.name for tag in job.tags] == ["python"]
+
+    # only the jobs of older parser versions are reparsed.
+    stats = reparse_jobs(["remotive"], workers=1, batch_size=10)
+    assert stats.reparsed == 0
+    assert stats.failed == 1
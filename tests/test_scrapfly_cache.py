@@ -0,0 +1,99 @@
+import time
+from unittest import mock
+
+import httpx
+
+from job_board import utils
+from job_board.scrapfly_cache import ScrapflyCache
+from job_board.utils import make_scrapfly_request
+from job_board.utils import SCRAPFLY_URL
+
+
+def test_scrapfly_cache(tmp_path):
+    cache = ScrapflyCache(directory=tmp_path, ttl=60)
+    params = {"key": "api-key", "url": "https://example.com/jobs/1", "asp": True}
+
+    assert cache.get(params) is None
+    cache.set(params, "<html>job</html>", cost=25)
+
+    # neither the api key nor the tier changes the page.
+    assert cache.get({**params, "key": "another-key"}) == "<html>job</html>"
+    assert cache.get({**params, "asp": False}) == "<html>job</html>"
+    assert cache.get({**params, "url": "https://example.com/jobs/2"}) is None
+    assert cache.stats.hits == 2
+    assert cache.stats.misses == 2
+    assert cache.stats.credits_saved == 50
+
+    # expired pages are not served and are removed when pruning.
+    with mock.patch.object(time, "time", return_value=time.time() + 61):
+        assert cache.get(params) is None
+        assert cache.prune() == 1
+    assert not list(tmp_path.glob("*/*.gz"))
+
+    cache.close()
+    assert cache.stats.hits == 0
+
+
+def test_scrapfly_cache_tiers(tmp_path):
+    cache = ScrapflyCache(directory=tmp_path, ttl=60)
+    assert cache.get_tier("example.com", "detail") is None
+
+    cache.set_tier("example.com", "detail", 2)
+    cache.close()
+
+    # the tiers outlive the run, for as long as the pages.
+    assert cache.get_tier("example.com", "detail") == 2
+    assert cache.get_tier("example.com", "listing") is None
+    with mock.patch.object(time, "time", return_value=time.time() + 61):
+        assert cache.get_tier("example.com", "detail") is None
+
+
+def test_scrapfly_tiers_are_kept_across_runs(tmp_path):
+    cache = ScrapflyCache(directory=tmp_path, ttl=60)
+    with mock.patch.object(utils, "scrapfly_cache", cache):
+        utils.scrapfly_tiers.set("https://example.com/jobs/1", "detail", 1)
+        utils.scrapfly_tiers.clear()
+
+        assert utils.scrapfly_tiers.get("https://example.com/jobs/2", "detail") == 1
+        assert utils.scrapfly_tiers.get("https://example.com/jobs", "listing") == 0
+
+
+def test_scrapfly_cache_disabled(tmp_path):
+    cache = ScrapflyCache(directory=tmp_path, ttl=0)
+    params = {"url": "https://example.com/jobs/1"}
+    cache.set(params, "<html>job</html>")
+
+    assert cache.get(params) is None
+    assert cache.prune() == 0
+    assert not list(tmp_path.iterdir())
+
+
+def test_make_scrapfly_request_with_cache(tmp_path, respx_mock):
+    route = respx_mock.get(SCRAPFLY_URL).mock(
+        return_value=httpx.Response(
+            status_code=200,
+            headers={"X-Scrapfly-Api-Cost": "30"},
+            json={
+                "result": {
+                    "content": "<html>job</html>",
+                    "success": True,
+                    "log_url": "https://scrapfly.io/dashboard/monitoring/log/01JSSJ7SNMEEJJDP0JPAACQ03D",
+                }
+            },
+        )
+    )
+    cache = ScrapflyCache(directory=tmp_path, ttl=60)
+    with mock.patch.object(utils, "scrapfly_cache", cache):
+        for _ in range(2):
+            content = make_scrapfly_request(
+                "https://example.com/jobs/1", asp=True, use_cache=True
+            )
+            assert content == "<html>job</html>"
+
+        # pages are cached only when asked for.
+        make_scrapfly_request("https://example.com/jobs/2", asp=True)
+        make_scrapfly_request("https://example.com/jobs/2", asp=True)
+
+    assert route.call_count == 3
+    assert cache.stats.hits == 1
+    assert cache.stats.credits_saved == 30
@@ -0,0 +1,150 @@
+import time
+
+import pytest
+
+from job_board import config
+from job_board.models import Job
+from job_board.models import store_tags
+from job_board.portals.parser import Job as JobListing
+from job_board.tag_extractor import get_phrases
+from job_board.tag_extractor import tag_extractor
+from job_board.tag_extractor import TagExtractor
+from job_board.tag_extractor import TagMatcher
+from job_board.tag_extractor import tokenize
+
+
+def test_tokenize():
+    assert tokenize("Node.js, C++ and C# (.NET). CI/CD.") == [
+        "node.js",
+        "c++",
+        "and",
+        "c#",
+        ".net",
+        "ci",
+        "cd",
+    ]
+
+
+def test_tag_matcher():
+    matcher = TagMatcher(get_phrases(["prompt engineering"]))
+
+    tags = matcher.find(
+        "Python, Django and React JS on k8s, with prompt engineering "
+        "and machine learning. Python."
+    )
+
+    # the longest phrase wins, aliases are mapped to their tags.
+    assert tags == [
+        "python",
+        "django",
+        "react",
+        "kubernetes",
+        "prompt engineering",
+        "machine learning",
+        "python",
+    ]
+
+    # the ignored phrases are left out, but not the aliases of their tags.
+    assert matcher.find("Go, Golang and Python", ignored_phrases={"go"}) == [
+        "go",
+        "python",
+    ]
+
+
+@pytest.mark.parametrize(
+    "title, description, expected",
+    [
+        (
+            "Senior Python Engineer",
+            "<p>Django, PostgreSQL, Docker and k8s. More Docker. Python.</p>",
+            ["python", "docker", "django", "postgresql", "kubernetes"],
+        ),
+        ("Account Executive", "Sell our SaaS, knowing Python is a plus.", ["non-tech"]),
+        ("Account Executive", "We're built on AWS, Kubernetes and Python", None),
+        # the common words are only trusted in the title.
+        ("Go Developer", "Go and gRPC", None),
+        ("Backend Engineer", "Golang, gRPC and Kafka", ["go", "grpc", "kafka"]),
+        (
+            "Rust Engineer",
+            "Tokio, Linux, gRPC and Kubernetes",
+            ["rust", "linux", "grpc", "kubernetes"],
+        ),
+        ("Software Engineer", "Build great things", None),
+    ],
+)
+def test_extract(db_session, title, description, expected):
+    job = JobListing(title=title, description=description, link="https://a.com/1")
+
+    assert tag_extractor.extract(job) == expected
+
+
+def test_extract_with_stored_tags(db_session, monkeypatch):
+    monkeypatch.setattr("job_board.config.LOCAL_TAGGING_MIN_TAG_JOBS", 2)
+    jobs = [
+        Job(title="Engineer", link=f"https://example.com/{i}", company_name="A")
+        for i in range(3)
+    ]
+    db_session.add_all(jobs)
+    db_session.flush()
+    store_tags(
+        session=db_session,
+        job_listings=[
+            JobListing(title="Engineer", link=jobs[0].link, tags=["langchain"]),
+            JobListing(title="Engineer", link=jobs[1].link, tags=["langchain"]),
+            JobListing(title="Engineer", link=jobs[2].link, tags=["hapi"]),
+        ],
+    )
+    job = JobListing(
+        title="AI Engineer",
+        description="LangChain, hapi, Python and FastAPI",
+        link="https://example.com/new",
+    )
+
+    # only the tags given to enough jobs join the vocabulary.
+    assert tag_extractor.extract(job) == ["langchain", "python", "fastapi"]
+
+
+def test_extract_reloads_the_vocabulary(monkeypatch):
+    extractor = TagExtractor()
+    loads = []
+
+    def load():
+        loads.append(time.monotonic())
+        extractor._matcher = TagMatcher(get_phrases([]))
+        extractor._loaded_at = loads[-1]
+        return extractor._matcher
+
+    monkeypatch.setattr(extractor, "load", load)
+    job = JobListing(title="Engineer", description="Python", link="https://a.com/1")
+
+    extractor.extract(job)
+    extractor.extract(job)
+    assert len(loads) == 1
+
+    # the tags that joined the vocabulary meanwhile are picked up.
+    extractor._loaded_at -= config.LOCAL_TAGGING_VOCABULARY_TTL + 1
+    extractor.extract(job)
+    assert len(loads) == 2
+
+
+def test_fill_tags(db_session):
+    jobs = [
+        JobListing(
+            title="Python Developer",
+            description="Python, Flask and Redis",
+            link="https://example.com/1",
+        ),
+        JobListing(
+            title="Python Developer",
+            description="Python, Flask and Redis",
+            link="https://example.com/2",
+            tags=["from the portal"],
+        ),
+        JobListing(title="Developer", link="https://example.com/3"),
+    ]
+
+    assert [job.tags for job in tag_extractor.fill_tags(jobs)] == [
+        ["python", "flask", "redis"],
+        ["from the portal"],
+        [],
+    ]
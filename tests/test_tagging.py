@@ -0,0 +1,179 @@
+import json
+import re
+from unittest import mock
+
+import httpx
+import pytest
+
+from job_board.portals.parser import build_job_tags_request
+from job_board.portals.parser import Job as JobListing
+from job_board.portals.parser import OPENAI_RESPONSES_API_URL
+from job_board.tagging import estimate_job_tokens
+from job_board.tagging import estimate_tokens
+from job_board.tagging import pack_batches
+from job_board.tagging import TaggingEngine
+from job_board.utils import http_clients
+
+LINK_REGEX = re.compile(r"https://example\.com/jobs/\d+")
+
+
+def _get_jobs(count: int) -> list[JobListing]:
+    return [
+        JobListing(
+            title=f"Python Developer {i}",
+            description="Python and Django",
+            link=f"https://example.com/jobs/{i}",
+        )
+        for i in range(count)
+    ]
+
+
+def _get_links(request: httpx.Request) -> list[str]:
+    prompt = json.loads(request.content)["input"][1]["content"]
+    return list(dict.fromkeys(LINK_REGEX.findall(prompt)))
+
+
+def _get_tags_response(links: list[str]) -> httpx.Response:
+    # tags every job with its own link number.
+    jobs = [{"link": link, "tags": [link.rsplit("/", 1)[1]]} for link in links]
+    return httpx.Response(
+        status_code=200,
+        json={
+            "id": "resp_1",
+            "output": [{"content": [{"text": json.dumps({"jobs": jobs})}]}],
+        },
+    )
+
+
+def _tag_request(request: httpx.Request) -> httpx.Response:
+    return _get_tags_response(_get_links(request))
+
+
+def test_tag_batches_concurrently(respx_mock):
+    route = respx_mock.post(OPENAI_RESPONSES_API_URL).mock(side_effect=_tag_request)
+    jobs = _get_jobs(5)
+    engine = TaggingEngine(concurrency=2)
+
+    batches = list(http_clients.iterate(engine.tag([jobs[:2], jobs[2:4], jobs[4:]])))
+
+    assert route.call_count == 3
+    assert sorted(len(batch) for batch in batches) == [1, 2, 2]
+    tags = {job.link: job.tags for batch in batches for job in batch}
+    assert tags == {job.link: [job.link.rsplit("/", 1)[1]] for job in jobs}
+    assert engine.failed == 0
+
+
+def test_tag_honours_retry_after(respx_mock):
+    respx_mock.post(OPENAI_RESPONSES_API_URL).mock(
+        side_effect=[
+            httpx.Response(status_code=429, headers={"retry-after": "7"}),
+            _tag_request,
+        ]
+    )
+    engine = TaggingEngine(concurrency=1)
+
+    with mock.patch("asyncio.sleep") as mocked_sleep:
+        (batch,) = http_clients.iterate(engine.tag([_get_jobs(1)]))
+
+    assert batch[0].tags == ["0"]
+    # the retry waits as asked, and so does the paused bucket.
+    waits = [call.args[0] for call in mocked_sleep.call_args_list]
+    assert waits[0] == 7
+    assert waits[1] == pytest.approx(7, abs=1)
+
+
+def test_tag_salvages_partial_results(respx_mock):
+    def tag_request(request):
+        links = _get_links(request)
+        if len(links) > 1:
+            # drops a job, and makes one up.
+            links = [link for link in links if not link.endswith("/1")]
+            links.append("https://example.com/jobs/99")
+        return _get_tags_response(links)
+
+    route = respx_mock.post(OPENAI_RESPONSES_API_URL).mock(side_effect=tag_request)
+    jobs = _get_jobs(4)
+    engine = TaggingEngine(concurrency=1)
+
+    batches = list(http_clients.iterate(engine.tag([jobs])))
+
+    # the dropped job is sent again, on its own.
+    assert route.call_count == 2
+    assert [[job.link for job in batch] for batch in batches] == [
+        [jobs[0].link, jobs[2].link, jobs[3].link],
+        [jobs[1].link],
+    ]
+    assert engine.failed == 0
+
+
+def test_tag_bisects_failing_batches(respx_mock):
+    def tag_request(request):
+        links = _get_links(request)
+        if "https://example.com/jobs/1" in links:
+            return httpx.Response(status_code=400)
+        return _get_tags_response(links)
+
+    route = respx_mock.post(OPENAI_RESPONSES_API_URL).mock(side_effect=tag_request)
+    jobs = _get_jobs(4)
+    engine = TaggingEngine(concurrency=1)
+
+    batches = list(http_clients.iterate(engine.tag([jobs])))
+
+    # [0, 1, 2, 3] -> [0, 1], [2, 3] -> [0], [1]
+    assert route.call_count == 5
+    assert sorted(job.link for batch in batches for job in batch) == [
+        jobs[0].link,
+        jobs[2].link,
+        jobs[3].link,
+    ]
+    assert [failure.job for failure in engine.failures] == [jobs[1]]
+    assert "400" in engine.failures[0].error
+    assert engine.failed == 1
+
+
+def test_tag_skips_batches_failed_by_the_service(respx_mock):
+    route = respx_mock.post(OPENAI_RESPONSES_API_URL).mock(
+        side_effect=[httpx.Response(status_code=401), _tag_request]
+    )
+    jobs = _get_jobs(3)
+    engine = TaggingEngine(concurrency=1)
+
+    batches = list(http_clients.iterate(engine.tag([jobs[:2], jobs[2:]])))
+
+    # the jobs aren't to blame, so the batch isn't split.
+    assert route.call_count == 2
+    assert [[job.link for job in batch] for batch in batches] == [[jobs[2].link]]
+    assert engine.failed == 2
+    assert engine.failures == []
+
+
+def test_estimate_tokens():
+    data = {"input": "x" * 400}
+
+    assert estimate_tokens(data, jobs=2) == len(json.dumps(data)) // 4 + 100
+
+
+def test_pack_batches():
+    jobs = _get_jobs(6)
+    long_job = JobListing(
+        title="Staff Engineer",
+        description="Python " * 2000,
+        link="https://example.com/jobs/long",
+    )
+    base_tokens = estimate_tokens(build_job_tags_request([]), jobs=0)
+    job_tokens = estimate_job_tokens(jobs[0])
+
+    batches = list(
+        pack_batches(
+            [*jobs[:3], long_job, *jobs[3:]],
+            token_budget=base_tokens + 3 * job_tokens,
+            max_jobs=50,
+        )
+    )
+
+    # the long job doesn't fit along with the others, so it goes alone.
+    assert batches == [jobs[:3], [long_job], jobs[3:]]
+
+    # the number of jobs in a batch is capped too.
+    batches = list(pack_batches(jobs, token_budget=10**6, max_jobs=4))
+    assert batches == [jobs[:4], jobs[4:]]
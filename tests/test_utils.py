@@ -1,3 +1,7 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from decimal import Decimal
 from unittest import mock
@@ -10,11 +14,23 @@ from pydantic import BaseModel
 from job_board import config
 from job_board.utils import EXCHANGE_RATE_API_URL
 from job_board.utils import EXCHANGE_RATE_FALLBACK_API_URL
-from job_board.utils import get_exchange_rate
+from job_board.utils import fetch_exchange_rates
 from job_board.utils import get_openai_schema
+from job_board.utils import get_retry_after
+from job_board.utils import http_clients
+from job_board.utils import HTTPClientRegistry
+from job_board.utils import is_budget_exceeded
 from job_board.utils import log_to_sentry
+from job_board.utils import make_async_escalating_scrapfly_request
+from job_board.utils import make_escalating_scrapfly_request
 from job_board.utils import make_scrapfly_request
 from job_board.utils import retry_on_http_errors
+from job_board.utils import SCRAPFLY_URL
+from job_board.utils import ScrapflyBudgetExceeded
+from job_board.utils import ScrapflyError
+from job_board.utils import ScrapflyGateway
+from job_board.utils import ScrapflyRun
+from job_board.utils import TokenBucket
 
 
 def test_retrying_with_errors(respx_mock):
@@ -41,13 +57,7 @@ today = datetime.today()
 
 
 @freeze_time(today)
-def test_get_exchange_rate(respx_mock):
-    assert get_exchange_rate(
-        from_currency="usd",
-        to_currency="usd",
-        exchange_date=today,
-    ) == Decimal("1")
-
+def test_fetch_exchange_rates(respx_mock):
     today_str = today.strftime("%Y-%m-%d")
     valid_response = httpx.Response(
         status_code=200,
@@ -69,12 +79,8 @@ def test_get_exchange_rate(respx_mock):
 
     respx_mock.get(url).mock(return_value=valid_response)
 
-    rate = get_exchange_rate(
-        from_currency="inr",
-        to_currency="usd",
-        exchange_date=today,
-    )
-    assert rate == Decimal("82.899")
+    rates = fetch_exchange_rates(currency="USD", exchange_date=today)
+    assert rates == {"inr": Decimal("82.899")}
 
     # verify for the fallback URL
     respx_mock.get(url).mock(return_value=error_response)
@@ -84,53 +90,354 @@ def test_get_exchange_rate(respx_mock):
     )
     respx_mock.get(fallback_url).mock(return_value=valid_response)
 
-    rate = get_exchange_rate(
-        from_currency="inr",
-        to_currency="usd",
-    )
-    assert rate == Decimal("82.899")
+    rates = fetch_exchange_rates(currency="usd", exchange_date=today)
+    assert rates == {"inr": Decimal("82.899")}
 
     # verify retry on error
     respx_mock.get(url).mock(side_effect=[error_response, valid_response])
     respx_mock.get(fallback_url).mock(return_value=error_response)
 
     with mock.patch("tenacity.nap.time.sleep") as mocked_sleep:
-        rate = get_exchange_rate(
-            from_currency="inr",
-            to_currency="usd",
-        )
+        rates = fetch_exchange_rates(currency="usd", exchange_date=today)
 
     mocked_sleep.assert_called_once()
 
-    assert rate == Decimal("82.899")
+    assert rates == {"inr": Decimal("82.899")}
 
-    # rate not found
-    respx_mock.get(url).mock(
+
+def test_make_scrapfly_request_timeout():
+    with (
+        mock.patch.object(http_clients, "client") as mock_client,
+        mock.patch("job_board.utils._raise_for_status"),
+    ):
+        make_scrapfly_request("https://example.com", timeout=100)
+
+    mock_client.assert_called_once_with(SCRAPFLY_URL)
+    mock_get = mock_client.return_value.get
+    mock_get.assert_called_once()
+    assert mock_get.call_args.kwargs["timeout"] == 100
+
+
+def test_scrapfly_gateway_limits_concurrency():
+    gateway = ScrapflyGateway(max_concurrency=2)
+    lock = threading.Lock()
+    in_flight = []
+    max_in_flight = 0
+
+    def track(index):
+        nonlocal max_in_flight
+        with lock:
+            in_flight.append(index)
+            max_in_flight = max(max_in_flight, len(in_flight))
+        time.sleep(0.01)
+        with lock:
+            in_flight.remove(index)
+
+    def request(index):
+        with gateway.slot():
+            track(index)
+
+    async def async_request(index):
+        async with gateway.async_slot():
+            await asyncio.to_thread(track, index)
+
+    async def async_requests():
+        async with asyncio.TaskGroup() as tg:
+            for index in range(5):
+                tg.create_task(async_request(index))
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        futures = [executor.submit(request, index) for index in range(10)]
+        # the slots are shared by the sync and the async requests.
+        asyncio.run(async_requests())
+        for future in futures:
+            future.result()
+
+    assert max_in_flight == 2
+
+
+def test_scrapfly_gateway_cancelled_waiter():
+    gateway = ScrapflyGateway(max_concurrency=1)
+
+    async def wait_for_slot():
+        async with gateway.async_slot():
+            pass  # pragma: no cover
+
+    async def cancel_waiter():
+        with gateway.slot():
+            task = asyncio.create_task(wait_for_slot())
+            await asyncio.sleep(0)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        # the cancelled waiter doesn't hold on to the slot.
+        async with gateway.async_slot():
+            pass
+
+    asyncio.run(asyncio.wait_for(cancel_waiter(), timeout=5))
+
+
+def test_scrapfly_gateway_credit_budget(respx_mock):
+    respx_mock.get(SCRAPFLY_URL).mock(
         return_value=httpx.Response(
             status_code=200,
+            headers={"X-Scrapfly-Api-Cost": "25"},
             json={
-                "usd": {},
+                "result": {
+                    "content": "<html></html>",
+                    "success": True,
+                    "log_url": "https://scrapfly.io/dashboard/monitoring/log/01JSSJ7SNMEEJJDP0JPAACQ03D",
+                }
             },
         )
     )
-    assert (
-        get_exchange_rate(
-            from_currency="inr",
-            to_currency="usd",
-            exchange_date=today,
+    gateway = ScrapflyGateway(max_concurrency=1, credit_budget=50)
+    with mock.patch("job_board.utils.scrapfly_gateway", gateway):
+        with gateway.run() as run:
+            make_scrapfly_request("https://example.com/jobs/1", asp=True)
+            # an overlapping run has a budget of its own.
+            with ThreadPoolExecutor() as executor:
+                executor.submit(
+                    _run_scrapfly_request, gateway, "https://example.com/jobs/2"
+                ).result()
+            make_scrapfly_request("https://example.com/jobs/3", asp=True)
+
+            with pytest.raises(ScrapflyBudgetExceeded):
+                make_scrapfly_request("https://example.com/jobs/4", asp=True)
+
+    assert run.requests == 2
+    assert run.credits_spent == 50
+
+    # the budget is per run.
+    with gateway.run(), gateway.slot():
+        pass
+
+
+def test_scrapfly_run_reserves_credits():
+    run = ScrapflyRun(credit_budget=50)
+    run.record(20)
+
+    with run.reserve():
+        # a request in flight is expected to cost as much as the dearest one.
+        assert run.credits_reserved == 20
+        with run.reserve(), pytest.raises(ScrapflyBudgetExceeded):
+            with run.reserve():
+                pass
+
+    assert run.credits_reserved == 0
+    assert is_budget_exceeded(ExceptionGroup("", [ScrapflyBudgetExceeded()]))
+    assert not is_budget_exceeded(
+        ExceptionGroup("", [ScrapflyBudgetExceeded(), ValueError()])
+    )
+
+
+def _run_scrapfly_request(gateway, url):
+    with gateway.run() as run:
+        make_scrapfly_request(url, asp=True)
+    assert run.credits_spent == 25
+
+
+def _scrapfly_response(content="<html></html>", *, status_code=200, error=None):
+    result = {
+        "content": content,
+        "success": error is None,
+        "status_code": status_code,
+        "url": "https://example.com/jobs",
+        "response_headers": {},
+        "log_url": "https://scrapfly.io/dashboard/monitoring/log/01JSSJ7SNMEEJJDP0JPAACQ03D",
+    }
+    if error is not None:
+        result["error"] = error
+    return httpx.Response(status_code=200, json={"result": result})
+
+
+def test_make_escalating_scrapfly_request(respx_mock):
+    blocked = _scrapfly_response(
+        status_code=403,
+        error={"message": "Forbidden", "retryable": True},
+    )
+    route = respx_mock.get(SCRAPFLY_URL).mock(
+        side_effect=[blocked, blocked, _scrapfly_response("<html>job</html>")]
+    )
+
+    content = make_escalating_scrapfly_request(
+        "https://example.com/jobs/1", page_type="detail"
+    )
+
+    assert content == "<html>job</html>"
+    params = [call.request.url.params for call in route.calls]
+    assert [(p["asp"], p.get("render_js")) for p in params] == [
+        ("false", None),
+        ("false", "true"),
+        ("true", "true"),
+    ]
+
+    # the tier that got through is remembered for the host and the page type.
+    route.side_effect = None
+    route.return_value = _scrapfly_response()
+    make_escalating_scrapfly_request("https://example.com/jobs/2", page_type="detail")
+    assert route.calls.last.request.url.params["asp"] == "true"
+
+    asyncio.run(
+        make_async_escalating_scrapfly_request(
+            "https://example.com/jobs", page_type="listing"
         )
-        is None
     )
+    assert route.calls.last.request.url.params["asp"] == "false"
 
 
-def test_make_scrapfly_request_timeout():
-    with (
-        mock.patch("job_board.utils.http_client") as mock_client,
-    ):
-        make_scrapfly_request("https://example.com", timeout=100)
+def test_make_escalating_scrapfly_request_without_escalation(respx_mock):
+    route = respx_mock.get(SCRAPFLY_URL).mock(return_value=_scrapfly_response())
+
+    with mock.patch.object(config, "SCRAPFLY_ASP_ESCALATION", False):
+        make_escalating_scrapfly_request(
+            "https://example.com/jobs/1", page_type="detail"
+        )
+        asyncio.run(
+            make_async_escalating_scrapfly_request(
+                "https://example.com/jobs",
+                page_type="listing",
+                default_params={"asp": True},
+            )
+        )
+
+    # every caller gets its own params, rather than ASP for all.
+    params = [call.request.url.params for call in route.calls]
+    assert [(p["asp"], p.get("render_js")) for p in params] == [
+        ("false", None),
+        ("true", None),
+    ]
+
+
+def test_make_escalating_scrapfly_request_with_tier_params(respx_mock):
+    route = respx_mock.get(SCRAPFLY_URL).mock(return_value=_scrapfly_response())
+
+    # the params of the tier win over the ones passed.
+    make_escalating_scrapfly_request(
+        "https://example.com/jobs/1", page_type="detail", asp=True, render_js=True
+    )
+
+    params = route.calls.last.request.url.params
+    assert (params["asp"], params["render_js"]) == ("true", "true")
+
+
+def test_make_escalating_scrapfly_request_escalates_challenge_pages(respx_mock):
+    challenge = _scrapfly_response(
+        "<html><head><title>Just a moment...</title></head></html>"
+    )
+    route = respx_mock.get(SCRAPFLY_URL).mock(
+        side_effect=[challenge, _scrapfly_response("<html>job</html>")]
+    )
+
+    content = make_escalating_scrapfly_request(
+        "https://example.com/jobs/1", page_type="detail"
+    )
+
+    # the challenge page came with a 200, but it is a block all the same.
+    assert content == "<html>job</html>"
+    assert route.calls.last.request.url.params["render_js"] == "true"
+
+
+def test_make_escalating_scrapfly_request_does_not_escalate_other_errors(
+    respx_mock,
+):
+    route = respx_mock.get(SCRAPFLY_URL).mock(
+        return_value=_scrapfly_response(
+            status_code=410,
+            error={"message": "Gone", "retryable": False},
+        )
+    )
+
+    with pytest.raises(ScrapflyError):
+        make_escalating_scrapfly_request(
+            "https://example.com/jobs/1", page_type="detail"
+        )
+
+    assert route.calls.call_count == 1
+
+    # the anti-bot errors are blocks, even without a 403.
+    route.return_value = _scrapfly_response(
+        status_code=200,
+        error={
+            "code": "ERR::ASP::SHIELD_PROTECTION_FAILED",
+            "message": "The ASP shield failed",
+            "retryable": True,
+        },
+    )
+    with pytest.raises(ScrapflyError):
+        make_escalating_scrapfly_request(
+            "https://example.com/jobs/1", page_type="detail"
+        )
+
+    assert route.calls.call_count == 4
+
+
+def test_http_client_registry(respx_mock):
+    registry = HTTPClientRegistry()
+    client = registry.client("https://example.com/jobs")
+    # the clients are shared per host
+    assert registry.client("https://example.com/other-jobs") is client
+    assert registry.client("https://example.org/jobs") is not client
+
+    respx_mock.get("https://example.com/jobs").mock(
+        return_value=httpx.Response(status_code=200)
+    )
+    client.get("https://example.com/jobs")
+    client.get("https://example.com/jobs")
 
-    mock_client.assert_called_once()
-    assert mock_client.call_args.kwargs["timeout"] == 100
+    stats = registry.stats["example.com"]
+    assert stats.requests == 2
+    # no real connections are opened while mocking.
+    assert stats.connections == 0
+    assert stats.reused == 2
+
+    registry.close()
+    assert client.is_closed
+    assert registry.client("https://example.com/jobs") is not client
+
+
+def test_http_client_registry_async_clients(respx_mock):
+    registry = HTTPClientRegistry()
+    respx_mock.get("https://example.com/jobs").mock(
+        return_value=httpx.Response(status_code=200)
+    )
+
+    async def fetch():
+        client = registry.async_client("https://example.com/jobs")
+        assert registry.async_client("https://example.com/other-jobs") is client
+        await client.get("https://example.com/jobs")
+        return client
+
+    client = registry.run(fetch())
+
+    # the async clients are closed along with their event loop.
+    assert client.is_closed
+    assert registry.stats["example.com"].requests == 1
+
+
+def test_http_client_registry_iterate(respx_mock):
+    registry = HTTPClientRegistry()
+    respx_mock.get("https://example.com/jobs").mock(
+        return_value=httpx.Response(status_code=200, json={"page": 1})
+    )
+    clients = []
+
+    async def iter_pages():
+        client = registry.async_client("https://example.com/jobs")
+        clients.append(client)
+        for _ in range(3):
+            response = await client.get("https://example.com/jobs")
+            yield response.json()
+
+    pages = registry.iterate(iter_pages())
+    assert next(pages) == {"page": 1}
+    # the pages are fetched only as they are consumed.
+    assert registry.stats["example.com"].requests == 1
+    assert list(pages) == [{"page": 1}, {"page": 1}]
+
+    (client,) = clients
+    assert client.is_closed
 
 
 def test_log_to_sentry():
@@ -204,3 +511,68 @@ def test_get_openai_schema():
     }
 
     assert schema == expected_schema
+
+
+def test_retrying_honours_retry_after(respx_mock):
+    url = "https://example.com"
+
+    @retry_on_http_errors()
+    def foo():
+        return http_clients.client(url).get(url)
+
+    respx_mock.get(url).mock(
+        side_effect=[
+            httpx.Response(status_code=429, headers={"retry-after": "3"}),
+            httpx.Response(status_code=503, headers={"retry-after": "3600"}),
+            httpx.Response(status_code=200),
+        ]
+    )
+    with mock.patch("tenacity.nap.time.sleep") as mocked_sleep:
+        foo()
+
+    assert mocked_sleep.call_args_list == [
+        mock.call(3),
+        mock.call(config.HTTP_MAX_RETRY_AFTER),
+    ]
+
+
+@freeze_time("2025-01-01 00:00:00")
+@pytest.mark.parametrize(
+    "headers, expected",
+    [
+        ({}, None),
+        ({"retry-after": "12"}, 12),
+        ({"retry-after": "1.5"}, 1.5),
+        ({"retry-after-ms": "250", "retry-after": "1"}, 0.25),
+        ({"retry-after": "Wed, 01 Jan 2025 00:00:30 GMT"}, 30),
+        ({"retry-after": "Tue, 31 Dec 2024 00:00:00 GMT"}, 0),
+        ({"retry-after": "soon"}, None),
+    ],
+)
+def test_get_retry_after(headers, expected):
+    response = httpx.Response(status_code=429, headers=headers)
+
+    assert get_retry_after(response) == expected
+
+
+def test_token_bucket():
+    async def _acquire_all():
+        bucket = TokenBucket(2, period=0.2)
+        start = time.monotonic()
+        # the burst goes through, the rest waits for the refill.
+        await bucket.acquire()
+        await bucket.acquire()
+        burst = time.monotonic() - start
+        await bucket.acquire()
+        refill = time.monotonic() - start
+
+        bucket.pause(0.2)
+        await bucket.acquire(10)
+        paused = time.monotonic() - start
+        return burst, refill, paused
+
+    burst, refill, paused = asyncio.run(_acquire_all())
+
+    assert burst < 0.05
+    assert refill >= 0.09
+    assert paused >= refill + 0.19